@@ -9,8 +9,17 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TattooAppointment.settings')
 
 application = get_asgi_application()
+
+# Each ASGI request runs its sync code on a fresh thread, so a persistent
+# connection would be left open per request. Closed after every request,
+# for this server only (the environment and WSGI are left alone), unless
+# DJANGO_CONN_MAX_AGE asks otherwise.
+if 'DJANGO_CONN_MAX_AGE' not in os.environ:
+    for database in settings.DATABASES.values():
+        database['CONN_MAX_AGE'] = 0
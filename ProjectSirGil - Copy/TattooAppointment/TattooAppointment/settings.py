@@ -1,4 +1,4 @@
-"""
+﻿"""
 Django settings for TattooAppointment project.
 
 Generated by 'django-admin startproject' using Django 5.2.7.
@@ -10,9 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import sys
 
 from pathlib import Path
 
+from .db_profiles import sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'appointments.middleware.ConcurrencyLimitMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -59,13 +63,21 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
          'DIRS': [BASE_DIR / 'templates'], 
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Parse each template (and every atom/molecule it includes) once
+            # per process; runserver's autoreloader still resets the cache
+            # when a template changes
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -76,14 +88,148 @@ WSGI_APPLICATION = 'TattooAppointment.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DJANGO_DB_PROFILE=production turns on WAL, busy timeouts, IMMEDIATE write
+# transactions and persistent connections (see db_profiles.py)
+DB_PROFILE = os.environ.get('DJANGO_DB_PROFILE', 'development')
+
 DATABASES = {
+    'default': sqlite_database(
+        os.environ.get('DJANGO_DB_PATH', BASE_DIR / 'db.sqlite3'),
+        DB_PROFILE,
+        conn_max_age=int(os.environ.get('DJANGO_CONN_MAX_AGE', 600)),
+    ),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # LocMemCache that also feeds cache hit/miss counts to /appointments/metrics/
+        'BACKEND': 'appointments.cache_backends.InstrumentedLocMemCache',
+        'LOCATION': 'tattoo-appointments',
+    },
+    # Rendered appointment cards. Keys contain every input of the card
+    # (row id, updated_at, ...) so entries never go stale, only cold; a
+    # separate store keeps them from evicting the landing cache.
+    'template_fragments': {
+        'BACKEND': 'appointments.cache_backends.InstrumentedLocMemCache',
+        'LOCATION': 'tattoo-fragments',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Landing page catalogue cache lifetime (seconds); edits invalidate it early
+LANDING_CACHE_TIMEOUT = 60 * 60 * 24
+
+# How long the admin date drilldown (years, months, days) is cached (seconds)
+ADMIN_DATE_HIERARCHY_TIMEOUT = 60 * 5
+
+
+# Structured request logs (see appointments/request_logging.py). Off by
+# default and always off under `manage.py test`; when on, a sample of
+# ordinary requests is logged, plus every slow request and server error.
+REQUEST_LOGGING = {
+    'ENABLED': os.environ.get('DJANGO_REQUEST_LOGGING') == '1' and sys.argv[1:2] != ['test'],
+    'SAMPLE_RATE': float(os.environ.get('DJANGO_REQUEST_LOG_SAMPLE_RATE', 0.1)),
+    'SLOW_REQUEST_MS': 500,
+    # Log file path; unset writes to stdout
+    'FILE': os.environ.get('DJANGO_REQUEST_LOG_FILE'),
+}
+
+
+# Bearer token that lets a Prometheus scraper read /appointments/metrics/
+# without a staff session (None = staff login only)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+
+# Token buckets for the POST endpoints bots hammer (see appointments/ratelimit.py):
+# {scope: {key: (tokens per minute, burst)}}. Keys are the client IP and,
+# for login, the submitted username.
+RATE_LIMITS = {
+    'login': {'ip': (30, 10), 'username': (10, 5)},
+    'register': {'ip': (5, 5)},
+    'enquiry': {'ip': (10, 5)},
+}
+# Cache alias holding the buckets. The LocMem default keeps them per
+# process, so each worker enforces the limits on its own; use a cache all
+# workers share (Redis, Memcached) for studio-wide limits.
+RATE_LIMIT_CACHE = 'default'
+
+# Requests one process works on at once; more are answered 503 straight
+# away (0 = no cap)
+MAX_CONCURRENT_REQUESTS = int(os.environ.get('DJANGO_MAX_CONCURRENT_REQUESTS', 64))
+
+
+# Dashboard counters: read appointment totals from the denormalized
+# AppointmentStats table instead of counting rows on every page load
+APPOINTMENT_STATS_TABLE = True
+
+
+# Sessions older than this many days are moved to the appointment archive
+# by `manage.py archive_appointments` (run it daily from cron)
+ARCHIVE_AFTER_DAYS = 365
+
+
+# Outgoing mail. Client notifications go through the outbox table and
+# `manage.py send_notifications` (see appointments/outbox.py), never inline.
+EMAIL_HOST = os.environ.get('DJANGO_EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('DJANGO_EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.environ.get('DJANGO_EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('DJANGO_EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('DJANGO_EMAIL_USE_TLS') == '1'
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = os.environ.get('DJANGO_DEFAULT_FROM_EMAIL', "J'ink Studio <bookings@jink-studio.local>")
+
+# Outbox worker: messages per batch (one SMTP connection each), attempts
+# before a message is dead-lettered, first retry delay in seconds (doubles
+# per attempt) and how long a worker holds a batch it is sending
+OUTBOX = {
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 6,
+    'RETRY_DELAY': 60,
+    'LEASE': 300,
+}
+
+
+# Session reminders (appointments/reminders.py, `manage.py send_reminders`):
+# sessions starting within LEAD_TIME hours get an email, BATCH_SIZE per
+# transaction; the scheduler wakes every INTERVAL seconds.
+REMINDERS = {
+    'LEAD_TIME': 24,
+    'BATCH_SIZE': 500,
+    'INTERVAL': 300,
+}
+
+
+# Background job queue (appointments/jobs.py, `manage.py run_workers`):
+# worker threads per process, seconds a worker holds a job before others
+# may take it, first retry delay (doubles per attempt), idle poll
+# interval, and days finished jobs are kept for the latency stats
+JOBS = {
+    'THREADS': 2,
+    'VISIBILITY_TIMEOUT': 300,
+    'RETRY_DELAY': 30,
+    'POLL_INTERVAL': 1.0,
+    'KEEP_FINISHED_DAYS': 7,
 }
 
 
+# Artist booking index: slot granularity, daily opening hours (local time),
+# the longest session the booking form accepts and how long a process may
+# trust its in-memory schedules
+BOOKING_SLOT_MINUTES = 30
+STUDIO_OPENING_HOURS = (10, 20)
+MAX_SESSION_MINUTES = 600
+SCHEDULE_INDEX_TTL = 60
+
+
+# Use the SQLite FTS5 indexes (migration 0007) for admin and site search;
+# False, or a database without them, falls back to LIKE lookups
+FULL_TEXT_SEARCH = True
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -117,9 +263,27 @@ USE_TZ = True
 
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
+# appointments/static is picked up by the app directories finder; the
+# site-wide static/ tree is mapped folder by folder so its component
+# examples (static/templates) are not published
 STATICFILES_DIRS = [
-    BASE_DIR / 'appointments' / 'static',
+    (folder, BASE_DIR / 'static' / folder) for folder in ('css', 'js', 'images', 'fonts')
 ]
+STATIC_ROOT = os.environ.get('DJANGO_STATIC_ROOT', BASE_DIR / 'staticfiles')
+
+# Production collectstatic writes content-hashed names plus .gz/.br copies,
+# served with far-future immutable caching (see static_assets.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'TattooAppointment.static_assets.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
 
 
 # Media files (User uploaded content)
@@ -0,0 +1,140 @@
+"""
+Static asset pipeline for production.
+
+collectstatic stores every file under a content-hashed name
+(css/main.3f2a1c9e.css) and records the mapping in staticfiles.json.
+CompressedManifestStaticFilesStorage also writes .gz and, if the
+optional `brotli` package is installed, .br copies of each text asset.
+serve_static() serves STATIC_ROOT. It picks the smallest variant the
+client accepts and marks hashed files as immutable for a year. Their
+name changes whenever their content does.
+"""
+import functools
+import gzip
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.json', '.svg', '.txt', '.xml', '.html', '.ico')
+# Below this the encoding overhead outweighs the saving
+MIN_COMPRESS_BYTES = 200
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+# Unhashed names (e.g. referenced from outside the templates) may change in place
+UNHASHED_MAX_AGE = 60 * 60
+
+# Preferred first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def compress(data):
+    """{suffix: bytes} for every encoding that actually shrinks `data`"""
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return {suffix: body for suffix, body in variants.items() if len(body) < len(data) * 0.95}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest-hashed static files with precompressed .gz/.br siblings"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Both names are served: the unhashed copy for anything outside the templates
+        for name in sorted({*self.hashed_files, *self.hashed_files.values()}):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self._write_compressed(name)
+
+    def _write_compressed(self, name):
+        with self.open(name) as handle:
+            data = handle.read()
+        if len(data) < MIN_COMPRESS_BYTES:
+            return
+        for suffix, body in compress(data).items():
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(body))
+
+
+@functools.cache
+def hashed_names():
+    """Every content-hashed name in the loaded manifest"""
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def accepted_encodings(header):
+    """
+    {coding: q} from an Accept-Encoding header. A coding with q=0 is
+    refused, and '*' stands for every coding the header does not name.
+    """
+    weights = {}
+    for part in header.split(','):
+        coding, *params = (piece.strip() for piece in part.split(';'))
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.lower()] = q
+    return weights
+
+
+def _negotiate(header, available):
+    """The acceptable coding in `available` (server preference order) with the highest q, or None"""
+    weights = accepted_encodings(header)
+    wildcard = weights.get('*', 0.0)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def serve_static(request, path):
+    """Serve a file from STATIC_ROOT, precompressed when the client allows"""
+    if not settings.STATIC_ROOT:
+        raise Http404('STATIC_ROOT is not configured.')
+    full_path = safe_join(settings.STATIC_ROOT, path)
+    if not os.path.isfile(full_path):
+        raise Http404(f'"{path}" does not exist')
+
+    stat = os.stat(full_path)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    suffixes = {coding: suffix for coding, suffix in ENCODINGS if os.path.isfile(full_path + suffix)}
+    encoding = _negotiate(request.headers.get('Accept-Encoding', ''), suffixes)
+    served_path = full_path + suffixes[encoding] if encoding else full_path
+
+    response = FileResponse(open(served_path, 'rb'), content_type=content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if path in hashed_names():
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=UNHASHED_MAX_AGE)
+    return response
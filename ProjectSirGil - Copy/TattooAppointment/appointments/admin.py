@@ -1,16 +1,81 @@
-﻿from django.contrib import admin
-from django.utils.html import format_html
+﻿from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import PermissionDenied
+from django.db.models import BooleanField, Case, Value, When
+from django.db.models.functions import Now
+from django.http import Http404
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils import timezone
-from django.http import HttpResponse
-import csv
-from .models import Appointment, TattooStyle, Artist, Studio, Review, Enquiry
+from django.utils.html import format_html
+from . import jobs, outbox
+from .exports import EXPORT_FORMATS, stream_appointments
+from .models import (
+    Appointment, AppointmentStats, ArchivedAppointment, TattooStyle, Artist, Studio, Review, Enquiry, OutboxMessage, Job,
+)
+from .pagination import EstimatedCountPaginator
+from .search import filter_queryset, fts_enabled
+
+
+# Badges are the same for every row with a given value; build them once
+STATUS_BADGES = {
+    status: format_html(
+        '<span style="background-color: {}; color: white; padding: 3px 10px; '
+        'border-radius: 3px; font-weight: bold; font-size: 11px;">{}</span>',
+        color,
+        label
+    )
+    for status, color, label in [
+        ('pending', '#FFA500', '⏳ PENDING'),  # Orange
+        ('approved', '#28A745', '✅ APPROVED'),  # Green
+        ('rejected', '#DC3545', '❌ REJECTED'),  # Red
+    ]
+}
+TIME_BADGES = {
+    True: format_html('<span style="color: #28A745; font-weight: bold;">✓ UPCOMING</span>'),
+    False: format_html('<span style="color: #6C757D; font-weight: bold;">✓ COMPLETED</span>'),
+}
+
+
+class LargeChangelistMixin:
+    """
+    Changelist settings for tables with up to millions of rows: estimated
+    or capped page counts, no second COUNT(*) for the unfiltered total,
+    and the cached date drilldown of admin/appointments/change_list.html.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return EstimatedCountChangeList
+
+
+class EstimatedCountChangeList(ChangeList):
+    """Re-reads the count after the page, which may have raised a lower bound"""
+
+    def get_results(self, request):
+        super().get_results(request)
+        if self.multi_page and self.paginator.count_is_lower_bound:
+            self.result_count = self.paginator.count
+
+
+class FullTextSearchMixin:
+    """Answer the changelist search box from the FTS index when it exists"""
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term.strip() and fts_enabled(queryset):
+            return filter_queryset(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
 
 # ============================================================
 # APPOINTMENT ADMIN (YOUR EXISTING CODE - KEEP IT!)
 # ============================================================
 
 @admin.register(Appointment)
-class AppointmentAdmin(admin.ModelAdmin):
+class AppointmentAdmin(LargeChangelistMixin, FullTextSearchMixin, admin.ModelAdmin):
     """
     Enhanced Admin interface for managing tattoo appointments with approval system
     """
@@ -23,13 +88,15 @@ class AppointmentAdmin(admin.ModelAdmin):
         'email', 
         'phone',
         'tattoo_design_short',
+        'artist',
         'appointment_date',
         'created_at',
         'status_badge',
         'appointment_status_badge'
     ]
     
-    list_filter = ['status', 'appointment_date', 'created_at']
+    list_filter = ['status', ('artist', admin.RelatedOnlyFieldListFilter), 'appointment_date', 'created_at']
+    list_select_related = ['artist']
     search_fields = ['client_name', 'email', 'phone', 'tattoo_design']
     date_hierarchy = 'appointment_date'
     list_per_page = 25
@@ -40,12 +107,17 @@ class AppointmentAdmin(admin.ModelAdmin):
         'email',
         'phone',
         'tattoo_design',
+        'artist',
         'appointment_date',
+        'duration_minutes',
         'status',
-        'created_at'
+        'created_at',
+        'approved_at',
+        'rejected_at',
+        'reminder_sent_at',
     ]
     
-    readonly_fields = ['created_at']
+    readonly_fields = ['created_at', 'approved_at', 'rejected_at', 'reminder_sent_at']
     
     # ============================================================
     # CUSTOM ACTIONS
@@ -55,6 +127,7 @@ class AppointmentAdmin(admin.ModelAdmin):
         'reject_appointments', 
         'mark_as_pending',
         'export_to_csv',
+        'export_to_jsonl',
         'mark_as_contacted'
     ]
     
@@ -86,29 +159,41 @@ class AppointmentAdmin(admin.ModelAdmin):
     mark_as_pending.short_description = '⏳ Mark as pending review'
     
     def export_to_csv(self, request, queryset):
-        """Export selected appointments to CSV file"""
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="appointments_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Client Name', 'Email', 'Phone', 'Tattoo Design',
-            'Appointment Date', 'Status', 'Created At'
-        ])
-        
-        for appointment in queryset:
-            writer.writerow([
-                appointment.client_name,
-                appointment.email,
-                appointment.phone,
-                appointment.tattoo_design,
-                appointment.appointment_date.strftime('%Y-%m-%d %H:%M'),
-                appointment.get_status_display(),
-                appointment.created_at.strftime('%Y-%m-%d %H:%M')
-            ])
-        
-        return response
+        """Export selected appointments to CSV file (streamed)"""
+        return stream_appointments(queryset, 'csv')
     export_to_csv.short_description = '📥 Export selected to CSV'
+
+    def export_to_jsonl(self, request, queryset):
+        """Export selected appointments as JSON Lines (streamed)"""
+        return stream_appointments(queryset, 'jsonl')
+    export_to_jsonl.short_description = '📥 Export selected to JSONL'
+
+    # ============================================================
+    # EXPORT ALL MATCHING THE CURRENT FILTER
+    # ============================================================
+
+    def get_urls(self):
+        urls = [
+            path(
+                'export/<str:fmt>/',
+                self.admin_site.admin_view(self.export_filtered_view),
+                name='appointments_appointment_export',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def export_filtered_view(self, request, fmt):
+        """Stream every appointment matching the changelist filters and search"""
+        if fmt not in EXPORT_FORMATS:
+            raise Http404(f'Unknown export format: {fmt}')
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            changelist = self.get_changelist_instance(request)
+        except IncorrectLookupParameters:
+            messages.error(request, 'Invalid filter; nothing was exported.')
+            return redirect('admin:appointments_appointment_changelist')
+        return stream_appointments(changelist.get_queryset(request), fmt)
     
     def mark_as_contacted(self, request, queryset):
         """Mark appointments as contacted"""
@@ -133,40 +218,31 @@ class AppointmentAdmin(admin.ModelAdmin):
     tattoo_design_short.short_description = '🎨 Tattoo Design'
     tattoo_design_short.admin_order_field = 'tattoo_design'
     
+    def get_queryset(self, request):
+        # Upcoming vs completed is decided by the database, against one clock for the whole page
+        return super().get_queryset(request).annotate(
+            is_upcoming=Case(
+                When(appointment_date__gt=Now(), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+        )
+
     def status_badge(self, obj):
         """Display colored status badge"""
-        status_colors = {
-            'pending': '#FFA500',  # Orange
-            'approved': '#28A745',  # Green
-            'rejected': '#DC3545'   # Red
-        }
-        status_labels = {
-            'pending': '⏳ PENDING',
-            'approved': '✅ APPROVED',
-            'rejected': '❌ REJECTED'
-        }
-        
-        color = status_colors.get(obj.status, '#6C757D')
-        label = status_labels.get(obj.status, obj.status.upper())
-        
-        return format_html(
-            '<span style="background-color: {}; color: white; padding: 3px 10px; '
-            'border-radius: 3px; font-weight: bold; font-size: 11px;">{}</span>',
-            color,
-            label
-        )
+        badge = STATUS_BADGES.get(obj.status)
+        if badge is None:
+            badge = format_html(
+                '<span style="background-color: #6C757D; color: white; padding: 3px 10px; '
+                'border-radius: 3px; font-weight: bold; font-size: 11px;">{}</span>',
+                obj.status.upper()
+            )
+        return badge
     status_badge.short_description = '📊 Approval Status'
     
     def appointment_status_badge(self, obj):
         """Display if appointment is upcoming or completed"""
-        now = timezone.now()
-        if obj.appointment_date > now:
-            return format_html(
-                '<span style="color: #28A745; font-weight: bold;">✓ UPCOMING</span>'
-            )
-        return format_html(
-            '<span style="color: #6C757D; font-weight: bold;">✓ COMPLETED</span>'
-        )
+        return TIME_BADGES[obj.is_upcoming]
     appointment_status_badge.short_description = '📅 Time Status'
     
     # ============================================================
@@ -197,6 +273,23 @@ class AppointmentAdmin(admin.ModelAdmin):
         )
 
 
+@admin.register(ArchivedAppointment)
+class ArchivedAppointmentAdmin(LargeChangelistMixin, admin.ModelAdmin):
+    """Read-only view of past sessions moved out of the live table"""
+    list_display = ['client_name', 'email', 'artist', 'appointment_date', 'status', 'archived_at']
+    list_filter = ['status', 'appointment_date']
+    list_select_related = ['artist']
+    search_fields = ['client_name', 'email', 'phone']
+    date_hierarchy = 'appointment_date'
+    list_per_page = 25
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # ============================================================
 # NEW MODELS ADMIN (ADD THESE - FOR LANDING PAGE)
 # ============================================================
@@ -238,7 +331,7 @@ class ReviewAdmin(admin.ModelAdmin):
 
 
 @admin.register(Enquiry)
-class EnquiryAdmin(admin.ModelAdmin):
+class EnquiryAdmin(LargeChangelistMixin, FullTextSearchMixin, admin.ModelAdmin):
     list_display = ['name', 'email', 'phone', 'preferred_date', 'is_contacted', 'created_at']
     list_filter = ['is_contacted', 'created_at', 'preferred_date']
     list_editable = ['is_contacted']
@@ -246,6 +339,92 @@ class EnquiryAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
     date_hierarchy = 'created_at'
     readonly_fields = ['created_at']
+    # Every row renders an is_contacted form field; Django's default of 100 doubles the page time
+    list_per_page = 25
+
+
+@admin.register(AppointmentStats)
+class AppointmentStatsAdmin(admin.ModelAdmin):
+    """Read-only view of the dashboard counter table"""
+    list_display = ['__str__', 'total', 'pending', 'approved', 'rejected', 'updated_at']
+    list_select_related = ['user']
+    search_fields = ['user__username']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(LargeChangelistMixin, admin.ModelAdmin):
+    """Queued, sent and dead-lettered client emails"""
+    list_display = ['topic', 'recipient', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'topic']
+    search_fields = ['recipient']
+    readonly_fields = ['topic', 'recipient', 'payload', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    fields = ['topic', 'recipient', 'payload', 'status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    list_per_page = 25
+    actions = ['requeue_messages']
+
+    def has_add_permission(self, request):
+        return False
+
+    def requeue_messages(self, request, queryset):
+        """Send selected dead or failing messages again with fresh attempts"""
+        requeued = outbox.requeue(queryset)
+        self.message_user(request, f'📨 Re-queued {requeued} message(s).')
+    requeue_messages.short_description = '📨 Re-queue selected messages'
+
+
+@admin.register(Job)
+class JobAdmin(LargeChangelistMixin, admin.ModelAdmin):
+    """Background jobs; the changelist links to per-task latency"""
+    list_display = ['task', 'status', 'priority', 'attempts', 'run_at', 'started_at', 'finished_at', 'locked_by']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'locked_by']
+    readonly_fields = [
+        'task', 'kwargs', 'attempts', 'locked_by', 'locked_until', 'last_error', 'created_at', 'started_at',
+        'finished_at',
+    ]
+    fields = [
+        'task', 'kwargs', 'status', 'priority', 'run_at', 'max_attempts', 'attempts', 'locked_by', 'locked_until',
+        'last_error', 'created_at', 'started_at', 'finished_at',
+    ]
+    list_per_page = 25
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry_jobs(self, request, queryset):
+        """Queue failed jobs again with a fresh set of attempts"""
+        retried = queryset.filter(status=Job.FAILED).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f'🔁 Queued {retried} failed job(s) again.')
+    retry_jobs.short_description = '🔁 Retry selected failed jobs'
+
+    def get_urls(self):
+        urls = [
+            path('latency/', self.admin_site.admin_view(self.latency_view), name='appointments_job_latency'),
+        ]
+        return urls + super().get_urls()
+
+    def latency_view(self, request):
+        """Queue wait and run time per task over the last 24 hours"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Job latency (last 24 hours)',
+            'opts': self.model._meta,
+            'stats': jobs.latency_stats(),
+            'queued': Job.objects.filter(status=Job.QUEUED).count(),
+            'running': Job.objects.filter(status=Job.RUNNING).count(),
+        }
+        return TemplateResponse(request, 'admin/appointments/job_latency.html', context)
 
 
 # ============================================================
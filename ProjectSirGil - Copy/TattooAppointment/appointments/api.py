@@ -0,0 +1,325 @@
+"""
+Versioned JSON API (v1) for the booking kiosk and the mobile app.
+
+Plain Django views over the same forms and permission rules as the HTML
+pages: clients see and change their own appointments, staff see
+everything (views.staff_check). Sessions and CSRF work as on the site.
+
+Booking and enquiry POSTs share the site enquiry form's rate limit.
+Lists are keyset paginated (?cursor=, ?limit=) and take ?fields=a,b to
+load and return only those columns. Appointments also filter on
+?status=, ?date_from= and ?date_to=. Bodies are JSON; responses are
+gzipped when the client accepts it.
+"""
+import json
+from functools import wraps
+
+from django.db import transaction
+from django.forms.models import model_to_dict
+from django.db.models.fields.files import FieldFile
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_http_methods
+
+from .forms import AppointmentFilterForm, AppointmentForm, AppointmentStatusForm, EnquiryForm
+from .models import Appointment, Artist, Enquiry, Review, Studio, TattooStyle
+from .pagination import InvalidCursor, paginate_keyset
+from .ratelimit import rate_limit
+from .views import staff_check
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_BULK_IDS = 1000
+
+APPOINTMENT_FIELDS = (
+    'id', 'client_name', 'email', 'phone', 'tattoo_design', 'reference_image', 'artist',
+    'appointment_date', 'duration_minutes', 'status', 'user', 'created_at', 'updated_at',
+)
+ENQUIRY_FIELDS = ('id', 'name', 'email', 'phone', 'message', 'preferred_date', 'created_at', 'is_contacted')
+
+# Public display lists: (queryset, fields, keyset field). The short ones
+# come back whole; reviews keep growing, so they are paged newest first.
+CATALOGUE = {
+    'styles': (
+        lambda: TattooStyle.objects.filter(is_active=True),
+        ('id', 'name', 'description', 'image', 'image_url', 'order'),
+        None,
+    ),
+    'artists': (
+        lambda: Artist.objects.filter(is_active=True),
+        ('id', 'name', 'role', 'bio', 'image', 'image_url', 'portfolio_url', 'instagram', 'order'),
+        None,
+    ),
+    'studios': (
+        lambda: Studio.objects.filter(is_active=True),
+        ('id', 'name', 'city', 'country', 'address', 'phone', 'email', 'image', 'image_url', 'order'),
+        None,
+    ),
+    'reviews': (
+        lambda: Review.objects.filter(is_approved=True),
+        ('id', 'client_name', 'rating', 'review_text', 'date', 'is_featured', 'image'),
+        # review_date_idx (-date, -id)
+        'date',
+    ),
+}
+
+
+class BadRequest(ValueError):
+    """Invalid query parameters or request body; becomes a 400"""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors
+
+
+def _error(message, status, errors=None):
+    body = {'error': message}
+    if errors:
+        body['errors'] = errors
+    return JsonResponse(body, status=status)
+
+
+def _form_errors(form):
+    return {field: list(messages) for field, messages in form.errors.items()}
+
+
+def api_view(methods):
+    """JSON errors instead of login redirects, method check and gzip for an API view"""
+    def decorator(view):
+        @gzip_page
+        @require_http_methods(methods)
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return _error('Authentication required.', 401)
+            try:
+                return view(request, *args, **kwargs)
+            except BadRequest as exc:
+                return _error(str(exc), 400, exc.errors)
+        return wrapper
+    return decorator
+
+
+def _json_body(request):
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        raise BadRequest('Request body must be JSON.')
+    if not isinstance(body, dict):
+        raise BadRequest('Request body must be a JSON object.')
+    return body
+
+
+def _requested_fields(request, allowed):
+    """?fields=a,b checked against `allowed`; the id always comes back"""
+    raw = request.GET.get('fields', '')
+    if not raw.strip():
+        return list(allowed)
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise BadRequest(f"Unknown field(s): {', '.join(unknown)}.")
+    return ['id', *dict.fromkeys(name for name in fields if name != 'id')]
+
+
+def _serialize(obj, fields):
+    data = {}
+    for name in fields:
+        # attname: foreign keys come back as ids without loading the row
+        value = getattr(obj, obj._meta.get_field(name).attname)
+        if isinstance(value, FieldFile):
+            value = value.url if value else None
+        data[name] = value
+    return data
+
+
+def _page(request, queryset, fields, field='created_at'):
+    """One keyset page of `queryset` on `field`, loading only the requested columns"""
+    try:
+        limit = min(max(int(request.GET.get('limit', PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise BadRequest('limit must be a number.')
+    try:
+        # `field` is the cursor; keep it loaded so the last row needs no extra query
+        page = paginate_keyset(queryset.only(*fields, field), request.GET.get('cursor'), limit, field)
+    except InvalidCursor:
+        raise BadRequest('Invalid page cursor.')
+
+    next_url = None
+    if page.next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = page.next_cursor
+        next_url = f'{request.path}?{params.urlencode()}'
+    return JsonResponse({
+        'results': [_serialize(obj, fields) for obj in page],
+        'next_cursor': page.next_cursor,
+        'next': next_url,
+    })
+
+
+def _appointment_scope(user):
+    if staff_check(user):
+        return Appointment.objects.all()
+    return Appointment.objects.filter(user=user)
+
+
+# ============================================
+# APPOINTMENTS
+# ============================================
+
+@api_view(['GET', 'POST'])
+@rate_limit('enquiry')
+def appointments(request):
+    """List the visitor's appointments (all of them for staff) or book one"""
+    if request.method == 'POST':
+        return _create_appointment(request)
+
+    fields = _requested_fields(request, APPOINTMENT_FIELDS)
+    filter_form = AppointmentFilterForm(request.GET)
+    if not filter_form.is_valid():
+        raise BadRequest('Invalid filters.', _form_errors(filter_form))
+    return _page(request, filter_form.filter_queryset(_appointment_scope(request.user)), fields)
+
+
+def _create_appointment(request):
+    form = AppointmentForm(_json_body(request))
+    if not form.is_valid():
+        return _error('Invalid appointment.', 400, _form_errors(form))
+    # Staff book on a client's behalf (kiosk); those bookings have no account
+    appointment = form.book(user=None if staff_check(request.user) else request.user, status='pending')
+    if appointment is None:
+        return _error('Invalid appointment.', 400, _form_errors(form))
+    return JsonResponse(_serialize(appointment, APPOINTMENT_FIELDS), status=201)
+
+
+@api_view(['GET', 'PATCH', 'DELETE'])
+def appointment_detail(request, pk):
+    """Read, change or cancel one appointment; only staff change its status"""
+    # Someone else's appointment is "not found", not "forbidden"
+    appointment = _appointment_scope(request.user).filter(pk=pk).first()
+    if appointment is None:
+        return _error('Not found.', 404)
+
+    if request.method == 'DELETE':
+        appointment.delete()
+        return HttpResponse(status=204)
+    if request.method == 'PATCH':
+        return _update_appointment(request, appointment)
+    return JsonResponse(_serialize(appointment, _requested_fields(request, APPOINTMENT_FIELDS)))
+
+
+def _update_appointment(request, appointment):
+    changes = _json_body(request)
+    booking_fields = AppointmentForm._meta.fields
+    unknown = changes.keys() - {*booking_fields, 'status'}
+    if unknown:
+        return _error(f"Read-only or unknown field(s): {', '.join(sorted(unknown))}.", 400)
+    if 'status' in changes and not staff_check(request.user):
+        return _error('Only staff can change the status.', 403)
+
+    bound_forms = []
+    booking_changes = {name: value for name, value in changes.items() if name != 'status'}
+    if booking_changes:
+        # The form validates the whole booking; start from what is stored
+        data = {**model_to_dict(appointment, fields=booking_fields), **booking_changes}
+        bound_forms.append(AppointmentForm(data, instance=appointment))
+    if 'status' in changes:
+        bound_forms.append(AppointmentStatusForm({'status': changes['status']}, instance=appointment))
+
+    errors = {}
+    for form in bound_forms:
+        if not form.is_valid():
+            errors.update(_form_errors(form))
+    if errors:
+        return _error('Invalid appointment.', 400, errors)
+    for form in bound_forms:
+        form.save(commit=False)
+    # A status change queues the client's email in the same transaction
+    with transaction.atomic():
+        if booking_changes and not bound_forms[0].confirm_slot():
+            return _error('Invalid appointment.', 400, _form_errors(bound_forms[0]))
+        appointment.save()
+    return JsonResponse(_serialize(appointment, APPOINTMENT_FIELDS))
+
+
+@api_view(['POST'])
+def appointments_bulk_status(request):
+    """Set one status on many appointments in a single UPDATE (staff only)"""
+    if not staff_check(request.user):
+        return _error('Staff only.', 403)
+    body = _json_body(request)
+    ids, status = body.get('ids'), body.get('status')
+    if status not in dict(Appointment.STATUS_CHOICES):
+        return _error('Unknown status.', 400)
+    if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+        return _error('ids must be a list of appointment ids.', 400)
+    if len(ids) > MAX_BULK_IDS:
+        return _error(f'At most {MAX_BULK_IDS} ids per request.', 400)
+
+    # Rows already in that status keep their updated_at (and cached cards)
+    updated = Appointment.objects.filter(pk__in=ids).exclude(status=status).update(status=status)
+    return JsonResponse({'status': status, 'updated': updated})
+
+
+# ============================================
+# ENQUIRIES
+# ============================================
+
+@api_view(['GET', 'POST'])
+@rate_limit('enquiry')
+def enquiries(request):
+    """Send an enquiry; staff can also list them"""
+    if request.method == 'POST':
+        form = EnquiryForm(_json_body(request))
+        if not form.is_valid():
+            return _error('Invalid enquiry.', 400, _form_errors(form))
+        return JsonResponse(_serialize(form.save(), ENQUIRY_FIELDS), status=201)
+
+    if not staff_check(request.user):
+        return _error('Staff only.', 403)
+    queryset = Enquiry.objects.all()
+    contacted = request.GET.get('is_contacted')
+    if contacted:
+        if contacted not in ('true', 'false'):
+            raise BadRequest('is_contacted must be true or false.')
+        queryset = queryset.filter(is_contacted=contacted == 'true')
+    return _page(request, queryset, _requested_fields(request, ENQUIRY_FIELDS))
+
+
+@api_view(['GET', 'PATCH', 'DELETE'])
+def enquiry_detail(request, pk):
+    """Read, mark as contacted or delete one enquiry (staff only)"""
+    if not staff_check(request.user):
+        return _error('Staff only.', 403)
+    enquiry = Enquiry.objects.filter(pk=pk).first()
+    if enquiry is None:
+        return _error('Not found.', 404)
+
+    if request.method == 'DELETE':
+        enquiry.delete()
+        return HttpResponse(status=204)
+    if request.method == 'PATCH':
+        changes = _json_body(request)
+        if changes.keys() != {'is_contacted'} or not isinstance(changes['is_contacted'], bool):
+            return _error('Only is_contacted (true or false) can be changed.', 400)
+        enquiry.is_contacted = changes['is_contacted']
+        enquiry.save(update_fields=['is_contacted'])
+    return JsonResponse(_serialize(enquiry, _requested_fields(request, ENQUIRY_FIELDS)))
+
+
+# ============================================
+# PUBLIC CATALOGUE
+# ============================================
+
+@gzip_page
+@require_http_methods(['GET'])
+def catalogue(request, kind):
+    """Active styles, artists and studios and approved reviews (paged); no login needed"""
+    queryset, allowed, keyset_field = CATALOGUE[kind]
+    try:
+        fields = _requested_fields(request, allowed)
+        if keyset_field:
+            return _page(request, queryset(), fields, keyset_field)
+    except BadRequest as exc:
+        return _error(str(exc), 400)
+    return JsonResponse({'results': [_serialize(obj, fields) for obj in queryset().only(*fields)]})
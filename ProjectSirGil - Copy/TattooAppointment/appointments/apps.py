@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class AppointmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'appointments'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .instrumentation import install_query_timer
+        from .request_logging import configure_request_logging
+
+        connection_created.connect(install_query_timer, dispatch_uid='appointments_query_timer')
+        configure_request_logging()
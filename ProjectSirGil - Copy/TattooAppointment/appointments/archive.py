@@ -0,0 +1,72 @@
+"""
+Hot/archive split for appointments.
+
+Sessions that are long over are moved from the live Appointment table
+into ArchivedAppointment, a batch per transaction, so the live table and
+its indexes only hold recent and upcoming work. A move is not a deletion:
+the rows keep their ids and stay counted in AppointmentStats, and the
+appointment lists still show them (appointment_history). Archived rows
+leave the full-text index with the live row.
+"""
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Appointment, ArchivedAppointment
+from .pagination import KeysetPage, encode_cursor, paginate_keyset
+
+# Copied column for column; archived_at is stamped on the way in
+ARCHIVE_FIELDS = [
+    field.attname for field in ArchivedAppointment._meta.concrete_fields if field.name != 'archived_at'
+]
+
+
+def archive_cutoff(days=None):
+    """Sessions before this are archived (settings.ARCHIVE_AFTER_DAYS by default)"""
+    if days is None:
+        days = getattr(settings, 'ARCHIVE_AFTER_DAYS', 365)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable(cutoff):
+    return Appointment.objects.filter(appointment_date__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size=1000):
+    """Move the oldest `batch_size` appointments before `cutoff` in one transaction; returns how many"""
+    with transaction.atomic():
+        rows = list(
+            archivable(cutoff).order_by('appointment_date', 'id').values(*ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        ArchivedAppointment.objects.bulk_create([ArchivedAppointment(**row) for row in rows])
+        # _raw_delete skips the post_delete handlers on purpose: the counters
+        # still include these appointments, and past sessions hold no slots
+        Appointment.objects.filter(pk__in=[row['id'] for row in rows])._raw_delete(Appointment.objects.db)
+    return len(rows)
+
+
+def appointment_history(user=None, cursor=None, per_page=20):
+    """
+    One keyset page of a client's appointments (everyone's for None), live
+    and archived together, latest session first on (appointment_date, id).
+
+    Each table gives its own first per_page + 1 rows past the cursor, a
+    range scan of its (user,) appointment_date index, and the two are
+    merged. Archived rows keep their ids, so (appointment_date, id) is
+    unique across both tables and one cursor serves both.
+    """
+    querysets = [Appointment.objects.all(), ArchivedAppointment.objects.all()]
+    if user is not None:
+        querysets = [queryset.filter(user=user) for queryset in querysets]
+    pages = [paginate_keyset(queryset, cursor, per_page, field='appointment_date') for queryset in querysets]
+    rows = sorted(chain(*pages), key=lambda row: (row.appointment_date, row.pk), reverse=True)
+    next_cursor = None
+    if len(rows) > per_page or any(page.has_next for page in pages):
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1].appointment_date, rows[-1].pk)
+    return KeysetPage(rows, next_cursor)
@@ -0,0 +1,332 @@
+"""
+Route latency harness behind the `benchmark` management command.
+
+Every URL in appointments/urls.py plus every admin changelist is requested
+through Django's test Client from several threads at once. Each thread
+has its own database connection and counts its own SQL statements.
+Results are plain dicts so they can be stored as JSON and compared with a
+saved baseline.
+
+run_interface() backs `benchmark_asgi`. It calls the real WSGI or ASGI
+handler in-process, with many connections open at once, to compare the
+two deployment paths.
+"""
+import asyncio
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from time import perf_counter
+from urllib.parse import urlencode
+
+from django.contrib import admin
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+Route = namedtuple('Route', 'name role url method data')
+
+# Routes that cannot share a session with the rest of the run
+SKIPPED_ROUTES = {
+    'logout': 'ends the session every other request relies on',
+    'api-appointments-bulk-status': 'takes a JSON body; the harness only sends form data',
+}
+
+# How to call a route: roles to request it as (default staff), HTTP method
+# and query/form data. Data may be a callable taking the seeded context.
+ROUTE_PLAN = {
+    'landing': {'roles': ['anonymous']},
+    'login': {'roles': ['anonymous']},
+    'register': {'roles': ['anonymous']},
+    'enquiry_submit': {
+        'roles': ['client'],
+        'method': 'post',
+        'data': {'name': 'Bench', 'email': 'bench@example.com', 'phone': '555-0100', 'message': 'Koi sleeve'},
+    },
+    'index': {'roles': ['client', 'staff']},
+    'create': {'roles': ['client']},
+    'slots': {'roles': ['client'], 'data': lambda context: {'artist': context['artist'], 'duration': 90}},
+    'update-status': {'method': 'post', 'data': {'status': 'approved'}},
+    'list-fbv': {'roles': ['client', 'staff']},
+    'list-cbv': {'roles': ['client', 'staff']},
+    'search': {'roles': ['client', 'staff'], 'data': {'q': 'koi sleeve'}},
+    'api-appointments': {'roles': ['client', 'staff'], 'data': {'limit': 50}},
+    'api-appointment': {'roles': ['client', 'staff']},
+    'api-styles': {'roles': ['anonymous']},
+    'api-artists': {'roles': ['anonymous']},
+    'api-studios': {'roles': ['anonymous']},
+    'api-reviews': {'roles': ['anonymous']},
+}
+
+# Changelist searches worth timing on their own
+ADMIN_SEARCHES = {
+    'appointments.appointment': 'koi',
+    'appointments.enquiry': 'dragon',
+}
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted list (None if empty)"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (None if unknown)"""
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def discover_routes(context):
+    """Route tuples for every appointments URL and admin changelist"""
+    from . import urls
+
+    routes = []
+    for pattern in urls.urlpatterns:
+        if pattern.name in SKIPPED_ROUTES:
+            continue
+        plan = ROUTE_PLAN.get(pattern.name, {})
+        kwargs = {key: context['appointment'] for key in pattern.pattern.converters}
+        url = reverse(f'{urls.app_name}:{pattern.name}', kwargs=kwargs)
+        data = plan.get('data', {})
+        if callable(data):
+            data = data(context)
+        for role in plan.get('roles', ['staff']):
+            routes.append(Route(f'{urls.app_name}:{pattern.name}', role, url, plan.get('method', 'get'), data))
+
+    for model in admin.site._registry:
+        opts = model._meta
+        name = f'admin:{opts.app_label}_{opts.model_name}_changelist'
+        routes.append(Route(name, 'staff', reverse(name), 'get', {}))
+        if opts.label_lower in ADMIN_SEARCHES:
+            routes.append(Route(f'{name}?q', 'staff', reverse(name), 'get', {'q': ADMIN_SEARCHES[opts.label_lower]}))
+    return routes
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _client_requests(route, user, count):
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    counter = _QueryCounter()
+    samples = []
+    try:
+        with connection.execute_wrapper(counter):
+            for _ in range(count):
+                counter.count = 0
+                start = perf_counter()
+                response = getattr(client, route.method)(route.url, route.data)
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                samples.append((perf_counter() - start, counter.count, response.status_code))
+    finally:
+        connection.close()
+    return samples
+
+
+def run_route(route, users, clients=4, requests=40, warmup=2):
+    """Hit one route `requests` times from `clients` threads; returns a summary"""
+    user = users.get(route.role)
+    _client_requests(route, user, warmup)
+
+    shares = [requests // clients + (i < requests % clients) for i in range(clients)]
+    started = perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        batches = list(pool.map(lambda share: _client_requests(route, user, share), [s for s in shares if s]))
+    elapsed = perf_counter() - started
+
+    samples = [sample for batch in batches for sample in batch]
+    latencies = [duration for duration, _, _ in samples]
+    queries = [count for _, count, _ in samples]
+    statuses = sorted({status for _, _, status in samples})
+    return {
+        'url': route.url,
+        'role': route.role,
+        'method': route.method.upper(),
+        'requests': len(samples),
+        'errors': sum(status >= 500 for _, _, status in samples),
+        'statuses': statuses,
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'queries': max(queries),
+    }
+
+
+def route_key(route):
+    return f'{route.name} [{route.role}]'
+
+
+def compare(results, baseline, threshold=0.25, floor_ms=2.0):
+    """Regressions of `results` against `baseline` as readable strings"""
+    regressions = []
+    for size, dataset in results['datasets'].items():
+        base_routes = baseline.get('datasets', {}).get(size, {}).get('routes', {})
+        for key, row in dataset['routes'].items():
+            base = base_routes.get(key)
+            if base is None:
+                continue
+            # Ignore sub-millisecond jitter on very fast routes
+            if row['p95_ms'] > base['p95_ms'] * (1 + threshold) and row['p95_ms'] - base['p95_ms'] > floor_ms:
+                regressions.append(f"{size} {key}: p95 {base['p95_ms']}ms -> {row['p95_ms']}ms")
+            if row['queries'] > base['queries']:
+                regressions.append(f"{size} {key}: queries {base['queries']} -> {row['queries']}")
+            if row['errors'] > base['errors']:
+                regressions.append(f"{size} {key}: 5xx {base['errors']} -> {row['errors']}")
+    return regressions
+
+
+def session_cookie(user):
+    """Cookie header of a logged-in session for `user` ('' for anonymous)"""
+    if user is None:
+        return ''
+    client = Client()
+    client.force_login(user)
+    return '; '.join(f'{name}={morsel.value}' for name, morsel in client.cookies.items())
+
+
+def _wsgi_environ(route, cookie):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': route.url,
+        'QUERY_STRING': urlencode(route.data, doseq=True),
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': 'testserver',
+        'HTTP_COOKIE': cookie,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def _wsgi_connection(application, route, cookie, count):
+    """One keep-alive connection of a threaded WSGI server"""
+    samples = []
+    try:
+        for _ in range(count):
+            status = []
+            start = perf_counter()
+            body = application(_wsgi_environ(route, cookie), lambda line, headers, exc_info=None: status.append(line))
+            for _ in body:
+                pass
+            body.close()  # sends request_finished, like a real server
+            samples.append((perf_counter() - start, int(status[0].split()[0])))
+    finally:
+        connection.close()
+    return samples
+
+
+def _asgi_scope(route, cookie):
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': route.url,
+        'raw_path': route.url.encode(),
+        'query_string': urlencode(route.data, doseq=True).encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+
+
+async def _asgi_connection(application, route, cookie, count):
+    """One keep-alive connection of an ASGI server"""
+    samples = []
+    for _ in range(count):
+        status = []
+        received = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Django listens for a disconnect and cancels this once it has answered
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        start = perf_counter()
+        await application(_asgi_scope(route, cookie), receive, send)
+        samples.append((perf_counter() - start, status[0]))
+    return samples
+
+
+def run_interface(route, cookie, interface, connections=200, requests=2000, warmup=5):
+    """
+    Serve a GET route through the real WSGI or ASGI handler from
+    `connections` concurrent connections; returns a summary.
+    WSGI connections are threads, as in a threaded server; ASGI connections
+    are tasks on one event loop.
+    """
+    shares = [share for share in (
+        requests // connections + (i < requests % connections) for i in range(connections)
+    ) if share]
+    if interface == 'wsgi':
+        from django.core.wsgi import get_wsgi_application
+
+        application = get_wsgi_application()
+        _wsgi_connection(application, route, cookie, warmup)
+        started = perf_counter()
+        with ThreadPoolExecutor(max_workers=len(shares)) as pool:
+            batches = list(pool.map(lambda share: _wsgi_connection(application, route, cookie, share), shares))
+        elapsed = perf_counter() - started
+    else:
+        from django.core.asgi import get_asgi_application
+
+        application = get_asgi_application()
+
+        async def serve():
+            await _asgi_connection(application, route, cookie, warmup)
+            started = perf_counter()
+            batches = await asyncio.gather(*(_asgi_connection(application, route, cookie, share) for share in shares))
+            return batches, perf_counter() - started
+
+        batches, elapsed = asyncio.run(serve())
+
+    samples = [sample for batch in batches for sample in batch]
+    latencies = [duration for duration, _ in samples]
+    return {
+        'url': route.url,
+        'role': route.role,
+        'interface': interface,
+        'connections': len(shares),
+        'requests': len(samples),
+        'errors': sum(status >= 500 for _, status in samples),
+        'statuses': sorted({status for _, status in samples}),
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
@@ -0,0 +1,14 @@
+from django.core.cache.backends.locmem import LocMemCache
+
+from .instrumentation import record_cache_lookup
+
+_MISSING = object()
+
+
+class InstrumentedLocMemCache(LocMemCache):
+    """LocMemCache that counts hits and misses for the request metrics"""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        record_cache_lookup(value is not _MISSING)
+        return default if value is _MISSING else value
@@ -0,0 +1,64 @@
+"""
+Versioned caching for the public landing page.
+
+Everything cached for the landing page lives under a key that contains the
+current "landing version". Changing any catalogue row bumps the version,
+which orphans every old entry at once instead of hunting keys down one by
+one; stale entries simply expire.
+
+The caches are per process, so the version is a CacheVersion row, read by
+primary key: a bump in the worker that saved the change is seen by every
+other worker on its next request.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+LANDING_VERSION_KEY = 'landing'
+
+
+def landing_timeout():
+    return getattr(settings, 'LANDING_CACHE_TIMEOUT', 60 * 60)
+
+
+def _fresh_version():
+    # Time based so a recreated row never hands out a version some process
+    # still has entries cached under
+    return time.time_ns()
+
+
+def landing_version():
+    """Current landing cache version"""
+    from .models import CacheVersion
+
+    row, _ = CacheVersion.objects.get_or_create(name=LANDING_VERSION_KEY, defaults={'version': _fresh_version()})
+    return row.version
+
+
+def bump_landing_version():
+    """Invalidate every cached landing entry"""
+    from .models import CacheVersion
+
+    # Part of the caller's transaction, so a rolled back edit bumps nothing
+    if not CacheVersion.objects.filter(name=LANDING_VERSION_KEY).update(version=F('version') + 1):
+        CacheVersion.objects.get_or_create(name=LANDING_VERSION_KEY, defaults={'version': _fresh_version()})
+
+
+def get_landing_data(version=None):
+    """Catalogue rows shown on the landing page, cached per version"""
+    from .models import TattooStyle, Artist, Studio, Review
+
+    key = f'landing:data:{version or landing_version()}'
+    data = cache.get(key)
+    if data is None:
+        data = {
+            'styles': list(TattooStyle.objects.filter(is_active=True)[:4]),
+            'artists': list(Artist.objects.filter(is_active=True)[:8]),
+            'studios': list(Studio.objects.filter(is_active=True)[:2]),
+            'reviews': list(Review.objects.filter(is_approved=True, is_featured=True)[:4]),
+        }
+        cache.set(key, data, landing_timeout())
+    return data
+
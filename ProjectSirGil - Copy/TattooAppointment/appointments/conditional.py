@@ -0,0 +1,108 @@
+"""
+Validators for conditional GET on the dashboard, lists and landing page.
+
+Staff keep these pages open and reload them all day. Each page's ETag is
+built from a few indexed lookups. For appointment pages these are the
+newest updated_at in the visitor's scope and the row count from the
+stats table (the count catches deletions, which MAX(updated_at) cannot).
+For the landing page it is the landing cache version. The visitor's
+identity, CSRF cookie and static manifest are always part of it.
+django.views.decorators.http.condition answers 304 from these before the
+view runs its own queries or renders anything.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db.models import Max
+from django.utils import timezone
+
+from .caching import landing_version
+from .models import Appointment, ArchivedAppointment
+from .stats import get_dashboard_stats
+
+
+def _etag(parts):
+    return '"%s"' % hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def _visitor(request):
+    """What every page renders per visitor: the navbar user, CSRF token and asset URLs"""
+    user = request.user
+    return [
+        user.pk,
+        user.is_staff,
+        user.get_username(),
+        getattr(user, 'first_name', ''),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        getattr(staticfiles_storage, 'manifest_hash', ''),
+    ]
+
+
+def _has_messages(request):
+    # Flash messages are shown once; a 304 would leave them unseen
+    return len(get_messages(request)) > 0
+
+
+def _scope(request):
+    """Appointments the visitor's pages show: all for staff, otherwise their own"""
+    if request.user.is_staff:
+        return Appointment.objects.all()
+    return Appointment.objects.filter(user=request.user)
+
+
+def visitor_stats(request):
+    """Dashboard counters for the visitor's scope, read once per request"""
+    if not hasattr(request, '_appointment_stats'):
+        request._appointment_stats = get_dashboard_stats(None if request.user.is_staff else request.user)
+    return request._appointment_stats
+
+
+def _appointment_validators(request):
+    """(ETag parts, newest change) for the visitor's appointments, computed once per request"""
+    if not hasattr(request, '_appointment_validators'):
+        last_modified = _scope(request).aggregate(last=Max('updated_at'))['last']
+        request._appointment_validators = ([visitor_stats(request)['total'], last_modified], last_modified)
+    return request._appointment_validators
+
+
+def appointment_list_etag(request, *args, **kwargs):
+    if _has_messages(request):
+        return None
+    parts, _ = _appointment_validators(request)
+    # Archiving changes no counter or updated_at, but archived cards lose their actions
+    archived = ArchivedAppointment.objects.aggregate(last=Max('archived_at'))['last']
+    return _etag(['appointments', request.GET.get('cursor'), *parts, archived, *_visitor(request)])
+
+
+def appointment_list_last_modified(request, *args, **kwargs):
+    # Deletions do not move it; browsers send If-None-Match too, which wins
+    if _has_messages(request):
+        return None
+    return _appointment_validators(request)[1]
+
+
+def dashboard_etag(request, *args, **kwargs):
+    """
+    The dashboard also changes with time: the next session drops off
+    "upcoming" once it starts. Hence no Last-Modified, only an ETag that
+    includes when that happens.
+    """
+    if _has_messages(request):
+        return None
+    parts, _ = _appointment_validators(request)
+    next_session = (
+        _scope(request).filter(appointment_date__gte=timezone.now())
+        .order_by('appointment_date')
+        .values_list('appointment_date', flat=True)
+        .first()
+    )
+    return _etag(['dashboard', *parts, next_session, *_visitor(request)])
+
+
+def landing_etag(request, *args, **kwargs):
+    if _has_messages(request):
+        return None
+    return _etag(['landing', landing_version(), *_visitor(request)])
+
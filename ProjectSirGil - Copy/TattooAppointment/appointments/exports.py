@@ -0,0 +1,80 @@
+"""
+Streaming appointment exports (CSV and JSON Lines).
+
+Rows are read with values_list() in server-side chunks and written to the
+client as they are produced, so memory use stays flat however many
+appointments are exported.
+"""
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+
+from .models import Appointment
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (CSV header, JSON key, model field)
+EXPORT_COLUMNS = [
+    ('Client Name', 'client_name', 'client_name'),
+    ('Email', 'email', 'email'),
+    ('Phone', 'phone', 'phone'),
+    ('Tattoo Design', 'tattoo_design', 'tattoo_design'),
+    ('Appointment Date', 'appointment_date', 'appointment_date'),
+    ('Status', 'status', 'status'),
+    ('Created At', 'created_at', 'created_at'),
+]
+DATE_FORMAT = '%Y-%m-%d %H:%M'
+STATUS_LABELS = dict(Appointment.STATUS_CHOICES)
+
+
+class Echo:
+    """File-like object whose write() hands the line straight back"""
+
+    def write(self, value):
+        return value
+
+
+def _export_rows(queryset):
+    fields = [field for _, _, field in EXPORT_COLUMNS]
+    return queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _csv_lines(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for header, _, _ in EXPORT_COLUMNS])
+    labels = STATUS_LABELS
+    for name, email, phone, design, appointment_date, status, created_at in _export_rows(queryset):
+        yield writer.writerow([
+            name,
+            email,
+            phone,
+            design,
+            appointment_date.strftime(DATE_FORMAT),
+            labels.get(status, status),
+            created_at.strftime(DATE_FORMAT),
+        ])
+
+
+def _json_default(value):
+    return value.isoformat()
+
+
+def _jsonl_lines(queryset):
+    keys = [key for _, key, _ in EXPORT_COLUMNS]
+    for row in _export_rows(queryset):
+        yield json.dumps(dict(zip(keys, row)), default=_json_default, ensure_ascii=False) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', _csv_lines),
+    'jsonl': ('application/x-ndjson', _jsonl_lines),
+}
+
+
+def stream_appointments(queryset, fmt='csv', filename='appointments_export'):
+    """StreamingHttpResponse exporting `queryset` as CSV or JSON Lines"""
+    content_type, lines = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(lines(queryset), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
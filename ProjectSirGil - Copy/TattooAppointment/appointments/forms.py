@@ -1,8 +1,14 @@
-﻿from django import forms
+﻿from datetime import datetime, time, timedelta
+
+from django import forms
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
+from django.db import transaction
+from django.utils import timezone
 
-from .models import Enquiry, Appointment  # ← NEW IMPORT
+from .models import Enquiry, Appointment, Artist  # ← NEW IMPORT
+from .scheduling import booking_interval, conflicting_bookings, get_schedule
 
 class RegisterForm(UserCreationForm):
     """Custom registration form with additional fields"""
@@ -126,10 +132,19 @@ class AppointmentForm(forms.ModelForm):
         )
     )
 
+    artist = forms.ModelChoiceField(
+        queryset=Artist.objects.filter(is_active=True).order_by('order', 'name'),
+        required=False,
+        empty_label='Any artist',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+
     class Meta:
         model = Appointment
-        fields = ['client_name', 'email', 'phone', 'tattoo_design', 'appointment_date', 'reference_image']
+        fields = ['client_name', 'email', 'phone', 'tattoo_design', 'artist', 'appointment_date',
+                  'duration_minutes', 'reference_image']
         widgets = {
+            'duration_minutes': forms.NumberInput(attrs={'class': 'form-control', 'min': 30, 'step': 30}),
             'client_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Full Name'}),
             'email': forms.EmailInput(attrs={'class': 'form-control', 'placeholder': 'Email'}),
             'phone': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Phone Number'}),
@@ -137,10 +152,128 @@ class AppointmentForm(forms.ModelForm):
             'reference_image': forms.ClearableFileInput(attrs={'class': 'form-control'}),
         }
 
+    def clean_duration_minutes(self):
+        duration = self.cleaned_data['duration_minutes']
+        longest = getattr(settings, 'MAX_SESSION_MINUTES', 600)
+        if duration is not None and duration > longest:
+            raise forms.ValidationError(f'Sessions can be at most {longest} minutes long.')
+        return duration
+
+    def clean(self):
+        cleaned_data = super().clean()
+        artist = cleaned_data.get('artist')
+        start = cleaned_data.get('appointment_date')
+        duration = cleaned_data.get('duration_minutes')
+        # Fast pre-check against this process's index; confirm_slot() has the last word
+        if artist and start and duration:
+            start, end = booking_interval(start, duration)
+            if not get_schedule(artist.pk).is_free(start, end, exclude=self.instance.pk):
+                self._add_clash_error(artist, start, end)
+        return cleaned_data
+
+    def _add_clash_error(self, artist, start, end):
+        message = f'{artist.name} is already booked at that time.'
+        suggestion = get_schedule(artist.pk).free_slots(start, start + timedelta(days=14), end - start, limit=1)
+        if suggestion:
+            local = timezone.localtime(suggestion[0][0])
+            message += f' Next free slot: {local:%d %b %Y, %H:%M}.'
+        self.add_error('appointment_date', message)
+
+    def confirm_slot(self):
+        """
+        Check the validated booking against the table, which other processes
+        and concurrent submits may have changed since clean() asked the
+        index. Call it inside the transaction that saves the booking; it
+        locks the artist row first, so bookings of one artist are
+        serialised (on SQLite, BEGIN IMMEDIATE does that for the whole
+        database). Returns False, with a form error, on a clash.
+        """
+        appointment = self.instance
+        if appointment.artist_id is None:
+            return True
+        Artist.objects.select_for_update().filter(pk=appointment.artist_id).exists()
+        start, end = booking_interval(appointment.appointment_date, appointment.duration_minutes)
+        if conflicting_bookings(appointment.artist_id, start, end, exclude=appointment.pk):
+            self._add_clash_error(appointment.artist, start, end)
+            return False
+        return True
+
+    def book(self, **fields):
+        """
+        Save the validated booking with `fields` set on it, unless its slot
+        was taken in the meantime. Returns the appointment, or None with a
+        form error on appointment_date.
+        """
+        appointment = self.save(commit=False)
+        for name, value in fields.items():
+            setattr(appointment, name, value)
+        if timezone.is_naive(appointment.appointment_date):
+            appointment.appointment_date = timezone.make_aware(
+                appointment.appointment_date, timezone.get_current_timezone(),
+            )
+        with transaction.atomic():
+            if not self.confirm_slot():
+                return None
+            appointment.save()
+        return appointment
+
+
+class FreeSlotsForm(forms.Form):
+    """Query string of the free-slots lookup; limit is clamped rather than refused"""
+
+    artist = forms.IntegerField(min_value=1)
+    duration = forms.IntegerField(required=False, min_value=1, max_value=24 * 60)
+    limit = forms.IntegerField(required=False)
+    start = forms.DateTimeField(required=False)
+
+    def clean_duration(self):
+        return timedelta(minutes=self.cleaned_data['duration'] or 60)
+
+    def clean_limit(self):
+        return min(max(self.cleaned_data['limit'] or 10, 1), 50)
+
+    def clean_start(self):
+        now = timezone.now()
+        return max(self.cleaned_data['start'] or now, now)
+
 
 class AppointmentStatusForm(forms.ModelForm):
     """Admin status update form"""
 
     class Meta:
         model = Appointment
-        fields = ['status']
\ No newline at end of file
+        fields = ['status']
+
+class AppointmentFilterForm(forms.Form):
+    """Staff queue filters (status and preferred session date range)"""
+
+    status = forms.ChoiceField(
+        required=False,
+        choices=[('', 'All statuses')] + Appointment.STATUS_CHOICES,
+    )
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+    )
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+    )
+
+    def filter_queryset(self, queryset):
+        """Apply the cleaned filters; invalid input leaves the queryset unfiltered"""
+        if not self.is_valid():
+            return queryset
+
+        data = self.cleaned_data
+        tz = timezone.get_current_timezone()
+        if data.get('status'):
+            queryset = queryset.filter(status=data['status'])
+        if data.get('date_from'):
+            start = datetime.combine(data['date_from'], time.min)
+            queryset = queryset.filter(appointment_date__gte=timezone.make_aware(start, tz))
+        if data.get('date_to'):
+            # Half-open range keeps the lookup a plain index range scan
+            end = datetime.combine(data['date_to'] + timedelta(days=1), time.min)
+            queryset = queryset.filter(appointment_date__lt=timezone.make_aware(end, tz))
+        return queryset
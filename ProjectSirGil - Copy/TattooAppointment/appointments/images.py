@@ -0,0 +1,96 @@
+"""
+Downscaled renditions of appointment reference images.
+
+Clients upload full-size phone photos. For each upload we store a few
+smaller copies next to the original, e.g. for appointments/designs/koi.jpg:
+
+    appointments/designs/koi_200w.webp   appointments/designs/koi_200w.jpg
+    appointments/designs/koi_600w.webp   appointments/designs/koi_600w.jpg
+    ...
+
+The widths that were actually generated are recorded on the appointment
+(reference_image_renditions) so templates can build a srcset without
+touching storage.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = [200, 600, 1200]
+
+# (file extension, Pillow format, save options)
+FORMATS = [
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+]
+
+
+def rendition_widths():
+    return sorted(getattr(settings, 'APPOINTMENT_IMAGE_RENDITIONS', DEFAULT_WIDTHS))
+
+
+def rendition_formats():
+    """Output formats this Pillow build can write (JPEG is always there)"""
+    return [fmt for fmt in FORMATS if fmt[1] != 'WEBP' or features.check('webp')]
+
+
+def rendition_name(name, width, ext):
+    stem, _ = os.path.splitext(name)
+    return f'{stem}_{width}w.{ext}'
+
+
+def rendition_url(name, width, ext, storage=default_storage):
+    return storage.url(rendition_name(name, width, ext))
+
+
+def generate_renditions(name, storage=default_storage):
+    """
+    Write every rendition of the stored image `name` and return the widths
+    produced. Widths wider than the original are skipped (never upscale);
+    an original narrower than every width gets one copy at its own width,
+    so the srcset never claims pixels the file does not have. Unreadable
+    images give [].
+    """
+    try:
+        with storage.open(name, 'rb') as original:
+            image = Image.open(original)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, Image.DecompressionBombError) as exc:
+        logger.warning('Cannot create renditions for %s: %s', name, exc)
+        return []
+
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    widths = rendition_widths()
+    targets = [w for w in widths if w < image.width] or [image.width]
+    produced = []
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS) if width < image.width else image
+        for ext, pil_format, options in rendition_formats():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            target = rendition_name(name, width, ext)
+            # save() would pick a new name instead of replacing an old file
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+        produced.append(width)
+    return produced
+
+
+def delete_renditions(name, widths, storage=default_storage):
+    for width in widths:
+        for ext, _, _ in FORMATS:
+            target = rendition_name(name, width, ext)
+            if storage.exists(target):
+                storage.delete(target)
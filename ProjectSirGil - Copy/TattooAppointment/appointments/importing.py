@@ -0,0 +1,170 @@
+"""
+Streaming CSV / JSON Lines import for appointments and enquiries.
+
+Rows are read lazily, validated in chunks with the same ModelForms the
+site uses, and handed back as database-ready tuples for
+seeding.bulk_insert(), so the conversion happens in the workers too.
+validate_chunk() runs in worker processes. This module therefore imports
+models and forms lazily, so spawned workers can unpickle it before
+django.setup() has run.
+"""
+import csv
+import json
+from itertools import islice
+
+import django
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+# Export headers (see exports.EXPORT_COLUMNS) and friendlier aliases
+HEADER_ALIASES = {
+    'client name': 'client_name',
+    'tattoo design': 'tattoo_design',
+    'appointment date': 'appointment_date',
+    'preferred date': 'preferred_date',
+    'duration': 'duration_minutes',
+    'user': 'username',
+}
+
+
+def setup_worker():
+    # Spawned workers start without Django configured
+    django.setup()
+
+
+def detect_format(path):
+    suffix = str(path).rsplit('.', 1)[-1].lower()
+    return 'jsonl' if suffix in ('jsonl', 'ndjson', 'json') else 'csv'
+
+
+def _normalise(row):
+    normalised = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        key = key.strip().lower()
+        key = HEADER_ALIASES.get(key, key.replace(' ', '_'))
+        normalised[key] = '' if value is None else value
+    return normalised
+
+
+def read_rows(path, fmt, start_after=0):
+    """Yield (line number, row dict), skipping rows up to `start_after`"""
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        if fmt == 'csv':
+            reader = csv.DictReader(handle)
+            for row in reader:
+                if reader.line_num > start_after:
+                    yield reader.line_num, _normalise(row)
+        else:
+            for line_no, line in enumerate(handle, start=1):
+                if line_no > start_after and line.strip():
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        row = {'__error__': 'Not valid JSON'}
+                    if not isinstance(row, dict):
+                        row = {'__error__': 'Each line must be a JSON object'}
+                    yield line_no, _normalise(row)
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _appointment_extras(rows, now):
+    """
+    Status and owner columns the booking form does not cover. Decided rows
+    get their approved_at / rejected_at stamp (`now`), as the pre_save
+    handler would have given them.
+    """
+    from django.contrib.auth.models import User
+    from .models import DECISION_FIELDS, Appointment
+
+    labels = {label.lower(): value for value, label in Appointment.STATUS_CHOICES}
+    usernames = {row.get('username') for _, row in rows if row.get('username')}
+    user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+
+    def extras(row):
+        values, errors = {}, {}
+        status = str(row.get('status') or 'pending').strip().lower()
+        if status in labels.values():
+            values['status'] = status
+        elif status in labels:
+            values['status'] = labels[status]
+        else:
+            errors['status'] = [f'Unknown status {row["status"]!r}.']
+        if values.get('status') in DECISION_FIELDS:
+            values[DECISION_FIELDS[values['status']]] = now
+        if row.get('username'):
+            if row['username'] in user_ids:
+                values['user_id'] = user_ids[row['username']]
+            else:
+                errors['username'] = [f'No user named {row["username"]!r}.']
+        return values, errors
+    return extras
+
+
+def _form_class(kind):
+    from .forms import AppointmentForm, EnquiryForm
+
+    return {'appointments': AppointmentForm, 'enquiries': EnquiryForm}[kind]
+
+
+def _import_fields(model):
+    return [field for field in model._meta.concrete_fields if not field.primary_key]
+
+
+def import_columns(kind):
+    """Attnames of the values validate_chunk() returns for `kind`, in order"""
+    return [field.attname for field in _import_fields(_form_class(kind)._meta.model)]
+
+
+def validate_chunk(kind, rows):
+    """
+    Validate (line, row) pairs with the site's form for `kind`.
+
+    Returns (valid, rejected): valid is a list of (line, values), values
+    being a tuple matching import_columns(kind) already adapted for the
+    database; rejected a list of (line, {field: [messages]}).
+    """
+    from django.db import connection
+    from django.utils import timezone
+
+    now = timezone.now()
+    form_class = _form_class(kind)
+    model = form_class._meta.model
+    extras = _appointment_extras(rows, now) if kind == 'appointments' else (lambda row: ({}, {}))
+    concrete = _import_fields(model)
+    # pre_save would set these; one reading of the clock keeps the decision stamps in step
+    timestamps = {
+        field.attname: now for field in concrete
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    }
+    # Columns missing from the file fall back to the model defaults
+    defaults = {
+        field.name: field.get_default()
+        for field in concrete
+        if field.name in form_class.base_fields and field.has_default()
+    }
+
+    valid, rejected = [], []
+    for line, row in rows:
+        if '__error__' in row:
+            rejected.append((line, {'__all__': [row['__error__']]}))
+            continue
+        form = form_class(data={**defaults, **row})
+        extra_values, extra_errors = extras(row)
+        if not form.is_valid() or extra_errors:
+            errors = {field: list(messages) for field, messages in form.errors.items()}
+            rejected.append((line, {**errors, **extra_errors}))
+            continue
+        instance = form.save(commit=False)
+        for attname, value in {**timestamps, **extra_values}.items():
+            setattr(instance, attname, value)
+        valid.append((line, tuple(
+            field.get_db_prep_save(getattr(instance, field.attname), connection) for field in concrete
+        )))
+    return valid, rejected
@@ -0,0 +1,65 @@
+"""
+Per-request counters shared by the logging and metrics middleware.
+
+The current request's RequestStats lives in a ContextVar. asgiref copies
+the context into the threads that run sync code for async views, so
+queries are counted for WSGI and ASGI requests alike. The SQL timer is
+installed on every database connection as it opens.
+"""
+from contextvars import ContextVar
+from time import perf_counter
+
+_current_stats = ContextVar('appointments_request_stats', default=None)
+
+
+class RequestStats:
+    """Mutable counters for one request"""
+    __slots__ = ('queries', 'query_time', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def begin_request():
+    """Start counting for a new request; pass the token to end_request()"""
+    stats = RequestStats()
+    return stats, _current_stats.set(stats)
+
+
+def end_request(token):
+    _current_stats.reset(token)
+
+
+def current_stats():
+    return _current_stats.get()
+
+
+def record_cache_lookup(hit):
+    stats = _current_stats.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+def time_query(execute, sql, params, many, context):
+    """connection.execute_wrappers hook: count and time every SQL statement"""
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_time += perf_counter() - start
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver"""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
@@ -0,0 +1,244 @@
+"""
+Background jobs stored in the database, run by `manage.py run_workers`.
+
+Register a function with @task (see tasks.py) and enqueue it with
+keyword arguments that serialize to JSON:
+
+    render_reference_image.enqueue(appointment_id=7, name='designs/koi.jpg')
+    render_reference_image.enqueue_on_commit(...)   # once the caller's transaction commits
+
+Enqueueing is one INSERT, so views never wait on the work itself.
+
+Claiming: on databases with SELECT ... FOR UPDATE SKIP LOCKED a worker
+locks the next due row and skips rows other workers hold. SQLite has no
+row locks, so a worker reads a few candidates and takes one with an
+UPDATE that re-checks it is still queued; SQLite runs writes one at a
+time, so exactly one worker's UPDATE matches. Either way a claimed job
+is held until locked_until (the visibility timeout). A worker that dies
+lets it expire and the job is queued again, so delivery is at least once.
+
+Failures are retried after RETRY_DELAY seconds, doubling per attempt,
+until the task's max_attempts; then the job is marked failed.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'THREADS': 2,
+    'VISIBILITY_TIMEOUT': 300,
+    'RETRY_DELAY': 30,
+    'POLL_INTERVAL': 1.0,
+    'KEEP_FINISHED_DAYS': 7,
+}
+
+# Candidates a SQLite worker tries before concluding others took them all
+CLAIM_CANDIDATES = 5
+
+TASKS = {}
+
+
+def get_setting(name):
+    return getattr(settings, 'JOBS', {}).get(name, DEFAULTS[name])
+
+
+class Task:
+    """A registered job function; call it directly to run it inline"""
+
+    def __init__(self, func, name, priority, max_attempts, timeout):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.__doc__ = func.__doc__
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def enqueue(self, priority=None, run_at=None, unique=False, **kwargs):
+        """
+        Queue a run with `kwargs`. `priority` and `run_at` override the
+        task's defaults; `unique` skips it if an identical run is already waiting.
+        """
+        return enqueue(self, kwargs, priority=priority, run_at=run_at, unique=unique)
+
+    def enqueue_on_commit(self, **options):
+        transaction.on_commit(lambda: self.enqueue(**options))
+
+
+def task(name, priority=0, max_attempts=3, timeout=None):
+    """Register a function as a job; `timeout` overrides VISIBILITY_TIMEOUT (seconds)"""
+    def decorator(func):
+        TASKS[name] = Task(func, name, priority, max_attempts, timeout)
+        return TASKS[name]
+    return decorator
+
+
+def enqueue(task, kwargs=None, priority=None, run_at=None, unique=False):
+    """Queue a run of `task` (a Task or its name); returns the Job, or None if `unique` found one"""
+    task = TASKS[task] if isinstance(task, str) else task
+    kwargs = kwargs or {}
+    if unique and Job.objects.filter(task=task.name, status=Job.QUEUED, kwargs=kwargs).exists():
+        return None
+    return Job.objects.create(
+        task=task.name,
+        kwargs=kwargs,
+        priority=task.priority if priority is None else priority,
+        run_at=run_at or timezone.now(),
+        max_attempts=task.max_attempts,
+    )
+
+
+# ============================================
+# CLAIMING
+# ============================================
+
+def _timeout(task_name):
+    task = TASKS.get(task_name)
+    return timedelta(seconds=(task and task.timeout) or get_setting('VISIBILITY_TIMEOUT'))
+
+
+def _take(queryset, pk, task_name, worker_id, now):
+    """Mark one job running for `worker_id` if `queryset` still matches it; True if it did"""
+    return bool(queryset.filter(pk=pk).update(
+        status=Job.RUNNING,
+        locked_by=worker_id,
+        locked_until=now + _timeout(task_name),
+        attempts=F('attempts') + 1,
+        started_at=now,
+    ))
+
+
+def release_expired():
+    """Queue again (or fail, if out of attempts) running jobs whose worker went quiet"""
+    now = timezone.now()
+    expired = Job.objects.filter(status=Job.RUNNING, locked_until__lt=now)
+    # A cheap indexed read first: most polls find nothing and need no write lock
+    if not expired.exists():
+        return 0
+    failed = expired.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=now, locked_by='', last_error='Visibility timeout expired',
+    )
+    return failed + expired.update(status=Job.QUEUED, run_at=now, locked_by='', locked_until=None)
+
+
+def claim(worker_id):
+    """Take the most urgent due job for `worker_id`, or None if nothing is due"""
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('-priority', 'run_at', 'id')
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            row = due.select_for_update(skip_locked=True).values_list('pk', 'task').first()
+            if row is None or not _take(Job.objects.all(), *row, worker_id, now):
+                return None
+    else:
+        for row in due.values_list('pk', 'task')[:CLAIM_CANDIDATES]:
+            if _take(due, *row, worker_id, now):
+                break
+        else:
+            return None
+    return Job.objects.get(pk=row[0])
+
+
+# ============================================
+# RUNNING
+# ============================================
+
+def _fail(job, worker_id, error):
+    now = timezone.now()
+    changes = {'locked_by': '', 'locked_until': None, 'last_error': f'{type(error).__name__}: {error}'[:2000]}
+    if job.attempts >= job.max_attempts:
+        changes.update(status=Job.FAILED, finished_at=now)
+    else:
+        changes.update(status=Job.QUEUED, run_at=now + timedelta(
+            seconds=get_setting('RETRY_DELAY') * 2 ** (job.attempts - 1),
+        ))
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=worker_id).update(**changes)
+
+
+def run_job(job, worker_id):
+    """Run a claimed job and record the outcome; True if it succeeded"""
+    task = TASKS.get(job.task)
+    try:
+        if task is None:
+            raise LookupError(f'No task registered as {job.task!r}')
+        task.func(**job.kwargs)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.task, job.attempts)
+        _fail(job, worker_id, exc)
+        return False
+    # Guarded: a worker that overran its lease must not overwrite the new holder's state
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=worker_id).update(
+        status=Job.DONE, finished_at=timezone.now(), locked_by='', locked_until=None, last_error='',
+    )
+    return True
+
+
+def run_pending(worker_id='inline'):
+    """Run every due job in this thread until none is left; returns how many ran"""
+    ran = 0
+    release_expired()
+    while job := claim(worker_id):
+        run_job(job, worker_id)
+        ran += 1
+    return ran
+
+
+def purge_finished(days=None):
+    """Delete jobs that succeeded more than `days` ago (failed ones stay for inspection)"""
+    days = get_setting('KEEP_FINISHED_DAYS') if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    return Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff)._raw_delete(Job.objects.db)
+
+
+# ============================================
+# LATENCY STATS
+# ============================================
+
+def latency_stats(since=None):
+    """
+    Per task, over jobs finished since `since` (default: the last 24 hours):
+    how many succeeded and failed, and p50/p95 queue wait and run time in ms.
+    """
+    from .benchmarking import percentile
+
+    since = since or timezone.now() - timedelta(days=1)
+    rows = (
+        Job.objects.filter(status__in=[Job.DONE, Job.FAILED], finished_at__gte=since)
+        .values_list('task', 'status', 'run_at', 'started_at', 'finished_at')
+        .iterator()
+    )
+    samples = {}
+    for name, status, run_at, started_at, finished_at in rows:
+        entry = samples.setdefault(name, {'done': 0, 'failed': 0, 'wait': [], 'run': []})
+        entry[status] += 1
+        if started_at:
+            # Waiting starts when the job became due, not when it was queued
+            entry['wait'].append(max((started_at - run_at).total_seconds(), 0))
+            entry['run'].append((finished_at - started_at).total_seconds())
+
+    def ms(values, fraction):
+        value = percentile(values, fraction)
+        return None if value is None else round(value * 1000, 1)
+
+    return {
+        name: {
+            'done': entry['done'],
+            'failed': entry['failed'],
+            'wait_p50_ms': ms(entry['wait'], 0.5),
+            'wait_p95_ms': ms(entry['wait'], 0.95),
+            'run_p50_ms': ms(entry['run'], 0.5),
+            'run_p95_ms': ms(entry['run'], 0.95),
+        }
+        for name, entry in sorted(samples.items())
+    }
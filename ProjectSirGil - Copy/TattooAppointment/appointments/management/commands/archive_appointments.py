@@ -0,0 +1,41 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.archive import archivable, archive_batch, archive_cutoff
+from appointments.models import Appointment, ArchivedAppointment
+from appointments.pagination import refresh_row_estimates
+
+
+class Command(BaseCommand):
+    help = 'Move appointments whose session is long past into the archive table (schedule daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, metavar='DAYS',
+                            help='Archive sessions older than this many days (default: ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Appointments moved per transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many appointments would be archived')
+
+    def handle(self, *args, **options):
+        if options['older_than'] is not None and options['older_than'] < 0:
+            raise CommandError('--older-than must not be negative.')
+        cutoff = archive_cutoff(options['older_than'])
+        if options['dry_run']:
+            count = archivable(cutoff).count()
+            self.stdout.write(f'{count:,} appointment(s) before {cutoff:%Y-%m-%d} would be archived.')
+            return
+
+        started = perf_counter()
+        moved = 0
+        # Short transactions keep writers waiting for one batch at most
+        while batch := archive_batch(cutoff, options['batch_size']):
+            moved += batch
+            self.stdout.write(f'  {moved:,} archived')
+        if moved:
+            # The admin changelists page by these row estimates
+            refresh_row_estimates(Appointment, ArchivedAppointment)
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved:,} appointment(s) before {cutoff:%Y-%m-%d} in {perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,54 @@
+import os
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from appointments.models import Appointment, Job
+from appointments.tasks import render_reference_image
+
+# Below live uploads (priority 10), so a backfill never delays them
+BACKFILL_PRIORITY = -10
+
+
+class Command(BaseCommand):
+    help = 'Queue rendition jobs for existing appointment reference images and optionally run them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes to run the queue with until it is empty '
+                                 '(default: one per CPU; 0 only queues the jobs for run_workers)')
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate renditions that already exist')
+
+    def handle(self, *args, **options):
+        queryset = Appointment.objects.exclude(reference_image='').exclude(reference_image=None)
+        if not options['force']:
+            queryset = queryset.filter(reference_image_renditions=[])
+        items = list(queryset.order_by('pk').values_list('pk', 'reference_image'))
+        if not items:
+            self.stdout.write('No reference images need renditions.')
+            return
+
+        Job.objects.bulk_create([
+            Job(
+                task=render_reference_image.name,
+                kwargs={'appointment_id': pk, 'name': name},
+                priority=BACKFILL_PRIORITY,
+                max_attempts=render_reference_image.max_attempts,
+            )
+            for pk, name in items
+        ], batch_size=1000)
+        self.stdout.write(f'Queued {len(items)} rendition job(s).')
+
+        if options['workers'] > 0:
+            # Image work is CPU bound: one thread per process, one process per core
+            call_command('run_workers', processes=options['workers'], threads=1, burst=True, stdout=self.stdout)
+            remaining = Job.objects.filter(task=render_reference_image.name).exclude(
+                status__in=[Job.DONE, Job.FAILED],
+            ).count()
+            # Unreadable images finish with no renditions
+            failed = queryset.filter(reference_image_renditions=[]).count()
+            self.stdout.write(self.style.SUCCESS(
+                f'Rendered {len(items) - failed} image(s); {failed} could not be rendered'
+                + (f', {remaining} job(s) still queued.' if remaining else '.')
+            ))
@@ -0,0 +1,138 @@
+import json
+import logging
+import platform
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from django.utils import timezone
+
+from appointments import seeding
+from appointments.benchmarking import compare, discover_routes, peak_rss_mb, route_key, run_route
+from appointments.models import Appointment, Artist
+from appointments.request_logging import REQUEST_LOGGER
+
+
+def parse_size(value):
+    try:
+        return seeding.parse_size(value)
+    except ValueError:
+        raise CommandError(f'Invalid dataset size {value!r}; use e.g. 10000, 10k or 1M.')
+
+
+class Command(BaseCommand):
+    help = 'Seed scratch datasets and measure latency, throughput and queries of every route'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', default=['10k'],
+                            help='Dataset sizes in appointments, e.g. 10k 100k 1M (default: 10k)')
+        parser.add_argument('--clients', type=int, default=4,
+                            help='Concurrent client threads per route')
+        parser.add_argument('--requests', type=int, default=40,
+                            help='Measured requests per route')
+        parser.add_argument('--routes', nargs='+', default=[],
+                            help='Only run routes whose name contains one of these strings')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='Compare against a previous results file')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Relative p95 growth counted as a regression (default 0.25)')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error if the baseline comparison finds regressions')
+
+    def handle(self, *args, **options):
+        sizes = [parse_size(value) for value in options['sizes']]
+        baseline = None
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text())
+
+        results = {
+            'meta': {
+                'started': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'db_profile': getattr(settings, 'DB_PROFILE', 'development'),
+                'clients': options['clients'],
+                'requests': options['requests'],
+            },
+            'datasets': {},
+        }
+
+        # One JSON line per request would drown the report
+        request_logger = logging.getLogger(REQUEST_LOGGER)
+        request_logger.disabled = True
+        setup_test_environment()
+        try:
+            # Measure the views, not the 429/503 answers a burst of test requests would get
+            with override_settings(RATE_LIMITS={}, MAX_CONCURRENT_REQUESTS=0):
+                for size in sizes:
+                    results['datasets'][str(size)] = self._run_dataset(size, options)
+        finally:
+            teardown_test_environment()
+            request_logger.disabled = False
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options['threshold'])
+            for line in regressions:
+                self.stdout.write(self.style.WARNING(f'  regression: {line}'))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+            elif options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}.')
+
+    def _run_dataset(self, size, options):
+        with tempfile.TemporaryDirectory() as directory:
+            # A file (not :memory:) so every client thread sees the same data
+            connections['default'].settings_dict['TEST']['NAME'] = str(Path(directory) / 'benchmark.sqlite3')
+            old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'}, serialized_aliases=set())
+            try:
+                cache.clear()
+                self.stdout.write(f'Seeding {size:,} appointments...')
+                started = perf_counter()
+                counts = seeding.seed(size, progress=self.stdout.write)
+                seed_seconds = perf_counter() - started
+
+                users = {
+                    'anonymous': None,
+                    'staff': User.objects.get(pk=counts['staff']),
+                    'client': User.objects.get(pk=counts['client']),
+                }
+                context = {
+                    'appointment': Appointment.objects.filter(user=users['client']).values_list('pk', flat=True)[0],
+                    'artist': Artist.objects.values_list('pk', flat=True)[0],
+                }
+                routes = [
+                    route for route in discover_routes(context)
+                    if not options['routes'] or any(part in route.name for part in options['routes'])
+                ]
+
+                self.stdout.write(f"{'route':<58} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>7} {'SQL':>4}")
+                rows = {}
+                for route in routes:
+                    row = run_route(route, users, options['clients'], options['requests'])
+                    rows[route_key(route)] = row
+                    self.stdout.write(
+                        f"{route_key(route):<58} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} "
+                        f"{row['throughput_rps']:>7} {row['queries']:>4}"
+                        + (self.style.ERROR(f"  {row['errors']} 5xx") if row['errors'] else '')
+                    )
+                return {
+                    'rows': counts,
+                    'seed_seconds': round(seed_seconds, 1),
+                    'peak_rss_mb': peak_rss_mb(),
+                    'routes': rows,
+                }
+            finally:
+                teardown_databases(old_config, verbosity=0)
@@ -0,0 +1,102 @@
+import json
+import logging
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from appointments import seeding
+from appointments.benchmarking import discover_routes, route_key, run_interface, session_cookie
+from appointments.management.commands.benchmark import parse_size
+from appointments.models import Appointment, Artist
+from appointments.request_logging import REQUEST_LOGGER
+
+INTERFACES = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = 'Compare throughput and tail latency of GET routes served through WSGI and ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', default='10k', help='Seeded appointments (default: 10k)')
+        parser.add_argument('--connections', type=int, default=200,
+                            help='Concurrent connections per route and interface')
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Measured requests per route and interface')
+        parser.add_argument('--routes', nargs='+', default=['landing', 'index'],
+                            help='Only run routes whose name contains one of these strings')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        request_logger = logging.getLogger(REQUEST_LOGGER)
+        request_logger.disabled = True
+        setup_test_environment()
+        try:
+            # Several hundred connections would otherwise be mostly shed with 503
+            with override_settings(RATE_LIMITS={}, MAX_CONCURRENT_REQUESTS=0):
+                results = self._run(parse_size(options['size']), options)
+        finally:
+            teardown_test_environment()
+            request_logger.disabled = False
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def _run(self, size, options):
+        with tempfile.TemporaryDirectory() as directory:
+            # A file (not :memory:) so every connection sees the same data
+            connections['default'].settings_dict['TEST']['NAME'] = str(Path(directory) / 'benchmark.sqlite3')
+            old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'}, serialized_aliases=set())
+            try:
+                cache.clear()
+                self.stdout.write(f'Seeding {size:,} appointments...')
+                counts = seeding.seed(size, progress=self.stdout.write)
+                cookies = {
+                    'anonymous': '',
+                    'staff': session_cookie(User.objects.get(pk=counts['staff'])),
+                    'client': session_cookie(User.objects.get(pk=counts['client'])),
+                }
+                context = {
+                    'appointment': Appointment.objects.filter(user_id=counts['client']).values_list('pk', flat=True)[0],
+                    'artist': Artist.objects.values_list('pk', flat=True)[0],
+                }
+                routes = [
+                    route for route in discover_routes(context)
+                    if route.method == 'get' and any(part in route.name for part in options['routes'])
+                ]
+                # Handlers run in this process; let every thread open its own connection
+                connections.close_all()
+
+                self.stdout.write(
+                    f"{'route':<40} {'interface':<9} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'vs wsgi':>8}"
+                )
+                rows = {}
+                for route in routes:
+                    key = route_key(route)
+                    rows[key] = {}
+                    for interface in INTERFACES:
+                        row = run_interface(
+                            route, cookies[route.role], interface, options['connections'], options['requests'],
+                        )
+                        rows[key][interface] = row
+                        ratio = row['throughput_rps'] / rows[key]['wsgi']['throughput_rps']
+                        self.stdout.write(
+                            f"{key:<40} {interface:<9} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} "
+                            f"{row['throughput_rps']:>8} {ratio:>7.2f}x"
+                            + (self.style.ERROR(f"  {row['errors']} 5xx") if row['errors'] else '')
+                        )
+                return {
+                    'size': size,
+                    'connections': options['connections'],
+                    'requests': options['requests'],
+                    'routes': rows,
+                }
+            finally:
+                teardown_databases(old_config, verbosity=0)
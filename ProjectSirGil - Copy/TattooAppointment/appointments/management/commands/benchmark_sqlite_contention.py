@@ -0,0 +1,194 @@
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from time import perf_counter
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from TattooAppointment.db_profiles import PROFILES
+from appointments.benchmarking import percentile
+
+BENCH_ALIAS = 'contention_benchmark'
+
+
+def _setup_worker(db_path, profile):
+    # Workers are spawned so the settings below are read fresh, pointing the
+    # default database (and every signal handler that writes) at the copy
+    os.environ['DJANGO_DB_PATH'] = db_path
+    os.environ['DJANGO_DB_PROFILE'] = profile
+    django.setup()
+
+
+def _read():
+    from appointments.models import Appointment
+
+    list(Appointment.objects.filter(status='pending').order_by('-created_at', '-id')[:20])
+    Appointment.objects.status_counts()
+
+
+def _write(rng):
+    from django.db import transaction
+    from django.utils import timezone
+    from appointments.models import Appointment
+
+    # Read-then-write, like a booking checking the queue before inserting
+    with transaction.atomic():
+        Appointment.objects.filter(status='pending').order_by('appointment_date').first()
+        Appointment.objects.create(
+            client_name=f'Bench {rng.randrange(10**6)}',
+            email='bench@example.com',
+            phone='555-0100',
+            tattoo_design='Contention benchmark',
+            appointment_date=timezone.now() + timedelta(days=rng.randrange(1, 90)),
+        )
+
+
+def _hammer(start_at, stop_at, write_ratio, seed):
+    """One simulated worker process: requests back to back until stop_at"""
+    from django.core.signals import request_finished, request_started
+    from django.db import OperationalError
+
+    rng = random.Random(seed)
+    latencies = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    time.sleep(max(0.0, start_at - time.time()))
+    while time.time() < stop_at:
+        kind = 'write' if rng.random() < write_ratio else 'read'
+        # Same connection handling as a real request (close or keep alive)
+        request_started.send(sender=None)
+        began = perf_counter()
+        try:
+            _read() if kind == 'read' else _write(rng)
+        except OperationalError:
+            errors[kind] += 1
+        else:
+            latencies[kind].append(perf_counter() - began)
+        finally:
+            request_finished.send(sender=None)
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    help = 'Compare SQLite database profiles under concurrent multi-process reads and writes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+        parser.add_argument('--processes', type=int, default=8,
+                            help='Concurrent worker processes')
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help='Seconds of load per profile')
+        parser.add_argument('--write-ratio', type=float, default=0.2,
+                            help='Fraction of requests that write (0.0 - 1.0)')
+        parser.add_argument('--rows', type=int, default=5000,
+                            help='Appointments to seed before the run')
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['write_ratio'] <= 1:
+            raise CommandError('--write-ratio must be between 0 and 1.')
+
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in options['profiles']:
+                db_path = str(Path(directory) / f'{profile}.sqlite3')
+                self._prepare(db_path, options['rows'])
+                self.stdout.write(
+                    f"{profile}: {options['processes']} process(es) for {options['duration']:g}s..."
+                )
+                results[profile] = self._run(db_path, profile, options)
+                self._report(results[profile])
+
+        if {'development', 'production'} <= results.keys():
+            before, after = results['development'], results['production']
+            speedup = after['throughput'] / before['throughput'] if before['throughput'] else float('inf')
+            self.stdout.write(self.style.SUCCESS(
+                f"production: {speedup:.2f}x throughput, "
+                f"{before['errors']} -> {after['errors']} locked-database errors"
+            ))
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def _prepare(self, db_path, rows):
+        """Migrate and seed a scratch database file"""
+        from appointments.models import Appointment
+        from django.utils import timezone
+
+        connections.settings[BENCH_ALIAS] = {**connections.settings['default'], 'NAME': db_path}
+        try:
+            call_command('migrate', database=BENCH_ALIAS, verbosity=0)
+            now = timezone.now()
+            Appointment.objects.using(BENCH_ALIAS).bulk_create(
+                (
+                    Appointment(
+                        client_name=f'Seed {i}',
+                        email='seed@example.com',
+                        phone='555-0100',
+                        tattoo_design='Seeded booking',
+                        appointment_date=now + timedelta(hours=i % 2000),
+                        status=('pending', 'approved', 'rejected')[i % 3],
+                    )
+                    for i in range(rows)
+                ),
+                batch_size=1000,
+            )
+        finally:
+            connections[BENCH_ALIAS].close()
+            del connections[BENCH_ALIAS]
+            del connections.settings[BENCH_ALIAS]
+
+    def _run(self, db_path, profile, options):
+        processes = options['processes']
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                 initializer=_setup_worker, initargs=(db_path, profile)) as pool:
+            # Leave time for every interpreter to start before the clock runs
+            start_at = time.time() + 2 + processes * 0.25
+            stop_at = start_at + options['duration']
+            futures = [
+                pool.submit(_hammer, start_at, stop_at, options['write_ratio'], seed)
+                for seed in range(processes)
+            ]
+            outcomes = [future.result() for future in futures]
+
+        latencies = {'read': [], 'write': []}
+        errors = {'read': 0, 'write': 0}
+        for worker_latencies, worker_errors in outcomes:
+            for kind in latencies:
+                latencies[kind].extend(worker_latencies[kind])
+                errors[kind] += worker_errors[kind]
+
+        summary = {
+            'processes': processes,
+            'duration': options['duration'],
+            'throughput': sum(map(len, latencies.values())) / options['duration'],
+            'errors': sum(errors.values()),
+        }
+        for kind, values in latencies.items():
+            summary[kind] = {
+                'ok': len(values),
+                'errors': errors[kind],
+                **{
+                    f'p{int(q * 100)}_ms': round(percentile(values, q) * 1000, 2) if values else None
+                    for q in (0.5, 0.95, 0.99)
+                },
+            }
+        return summary
+
+    def _report(self, summary):
+        self.stdout.write(f"  {summary['throughput']:.1f} ok requests/s, {summary['errors']} error(s)")
+        for kind in ('read', 'write'):
+            row = summary[kind]
+            self.stdout.write(
+                f"  {kind:<5} ok={row['ok']:<6} errors={row['errors']:<5} "
+                f"p50={row['p50_ms']}ms p95={row['p95_ms']}ms p99={row['p99_ms']}ms"
+            )
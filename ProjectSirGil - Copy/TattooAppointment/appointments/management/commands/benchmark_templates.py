@@ -0,0 +1,121 @@
+import json
+from datetime import timedelta
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine
+from django.template.backends.django import get_installed_libraries
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from appointments.benchmarking import percentile
+from appointments.models import Appointment
+
+FRAGMENT_CACHE = 'template_fragments'
+
+# The atomic-design organism, included once per card like a page would
+CARD_LOOP = (
+    "{% for appointment in appointments %}"
+    "{% url 'appointments:edit' appointment.pk as edit_url %}"
+    "{% url 'appointments:delete' appointment.pk as delete_url %}"
+    "{% include 'organisms/appointment-card.html' with show_actions=True %}"
+    "{% endfor %}"
+)
+
+TEMPLATES = {
+    'atomic cards': 'bench/appointment-cards.html',
+    'staff queue cards': 'appointments/partials/manage_cards.html',
+}
+
+BASE_LOADERS = [
+    ('django.template.loaders.locmem.Loader', {TEMPLATES['atomic cards']: CARD_LOOP}),
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+# (label, wrap loaders in the cached loader, fragment cache on)
+MODES = [
+    ('uncached loaders', False, False),
+    ('cached loaders', True, False),
+    ('cached loaders + fragments', True, True),
+]
+
+
+def _engine(cached):
+    loaders = [('django.template.loaders.cached.Loader', BASE_LOADERS)] if cached else BASE_LOADERS
+    return Engine(dirs=[settings.BASE_DIR / 'templates'], loaders=loaders, libraries=get_installed_libraries())
+
+
+def _appointments(count):
+    now = timezone.now()
+    return [
+        Appointment(
+            pk=i,
+            client_name=f'Client {i}',
+            email=f'client{i}@example.com',
+            phone='555-0100',
+            tattoo_design='Japanese koi with lotus on the forearm, about 20 cm',
+            appointment_date=now + timedelta(days=i % 30),
+            created_at=now,
+            updated_at=now,
+            status=['pending', 'approved', 'rejected'][i % 3],
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Time rendering appointment cards with and without cached loaders and fragment caching'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=100, help='Cards per render')
+        parser.add_argument('--repeat', type=int, default=50, help='Measured renders per mode')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        context = {
+            'appointments': _appointments(options['cards']),
+            'user': User(username='bench_staff', is_staff=True),
+            'csrf_token': 'x' * 64,
+        }
+        results = {}
+        self.stdout.write(f"{'template':<20} {'mode':<28} {'mean ms':>8} {'p95 ms':>8} {'speed-up':>8}")
+        for label, name in TEMPLATES.items():
+            results[label] = {}
+            for mode, cached, fragments in MODES:
+                row = self._measure(name, context, cached, fragments, options['repeat'])
+                results[label][mode] = row
+                baseline = results[label][MODES[0][0]]['mean_ms']
+                self.stdout.write(
+                    f"{label:<20} {mode:<28} {row['mean_ms']:>8} {row['p95_ms']:>8} "
+                    f"{baseline / row['mean_ms']:>7.1f}x"
+                )
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps({'cards': options['cards'], 'results': results}, indent=2))
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def _measure(self, name, context, cached, fragments, repeat):
+        backend = 'django.core.cache.backends.locmem.LocMemCache' if fragments else 'django.core.cache.backends.dummy.DummyCache'
+        with override_settings(CACHES={**settings.CACHES, FRAGMENT_CACHE: {'BACKEND': backend, 'LOCATION': 'benchmark'}}):
+            caches[FRAGMENT_CACHE].clear()
+            engine = _engine(cached)
+            # The first render parses (cached loaders) and fills the fragments
+            started = perf_counter()
+            engine.get_template(name).render(Context(context))
+            first_ms = (perf_counter() - started) * 1000
+
+            samples = []
+            for _ in range(repeat):
+                started = perf_counter()
+                engine.get_template(name).render(Context(context))
+                samples.append(perf_counter() - started)
+        return {
+            'first_ms': round(first_ms, 2),
+            'mean_ms': round(sum(samples) / len(samples) * 1000, 2),
+            'p95_ms': round(percentile(samples, 0.95) * 1000, 2),
+        }
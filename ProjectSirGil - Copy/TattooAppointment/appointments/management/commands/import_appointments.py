@@ -0,0 +1,128 @@
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from appointments import scheduling
+from appointments.importing import (
+    IMPORT_FORMATS, chunked, detect_format, import_columns, read_rows, setup_worker, validate_chunk,
+)
+from appointments.models import Appointment, Enquiry
+from appointments.search import deferred_index
+from appointments.seeding import bulk_insert
+
+MODELS = {'appointments': Appointment, 'enquiries': Enquiry}
+
+
+class Command(BaseCommand):
+    help = 'Import appointments or enquiries from a CSV or JSON Lines file, validated with the site forms'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with a header row) or JSON Lines file')
+        parser.add_argument('--model', choices=MODELS, default='appointments')
+        parser.add_argument('--format', choices=IMPORT_FORMATS,
+                            help='Input format (default: guessed from the file extension)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Validation processes; 0 validates in this process')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows validated and committed together')
+        parser.add_argument('--checkpoint',
+                            help='Progress file (default: <path>.checkpoint.json)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue after the last committed chunk in the checkpoint')
+        parser.add_argument('--rejects',
+                            help='Write rejected rows and their errors to this JSON Lines file')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'{path} does not exist.')
+        kind = options['model']
+        fmt = options['format'] or detect_format(path)
+        checkpoint_path = Path(options['checkpoint'] or f'{path}.checkpoint.json')
+
+        progress = {'path': str(path.resolve()), 'model': kind, 'line': 0, 'imported': 0, 'rejected': 0}
+        if options['resume'] and checkpoint_path.exists():
+            saved = json.loads(checkpoint_path.read_text())
+            if (saved['path'], saved['model']) != (progress['path'], kind):
+                raise CommandError(f'{checkpoint_path} belongs to a different import.')
+            progress = saved
+            self.stdout.write(f"Resuming after line {progress['line']:,}.")
+
+        rejects = open(options['rejects'], 'a', encoding='utf-8') if options['rejects'] else None
+        chunks = chunked(read_rows(path, fmt, start_after=progress['line']), options['chunk_size'])
+        imported_before = progress['imported']
+        try:
+            with deferred_index(MODELS[kind]):
+                self._import(kind, chunks, options, progress, checkpoint_path, rejects)
+        finally:
+            if rejects:
+                rejects.close()
+
+        if kind == 'appointments' and progress['imported'] > imported_before:
+            # bulk_insert skips the signal handlers that maintain these
+            call_command('rebuild_appointment_stats', stdout=self.stdout)
+            scheduling.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {progress['imported']:,} {kind}; {progress['rejected']:,} row(s) rejected."
+        ))
+
+    def _import(self, kind, chunks, options, progress, checkpoint_path, rejects):
+        started = perf_counter()
+        imported_before = progress['imported']
+        for valid, rejected, last_line in self._validated(kind, chunks, options['workers']):
+            self._commit(kind, valid)
+            progress['line'] = last_line
+            progress['imported'] += len(valid)
+            progress['rejected'] += len(rejected)
+            # Written only after the chunk committed: a crash re-imports
+            # at most the chunk that was in flight
+            self._save_checkpoint(checkpoint_path, progress)
+            if rejects:
+                for line, errors in rejected:
+                    rejects.write(json.dumps({'line': line, 'errors': errors}) + '\n')
+            elapsed = perf_counter() - started
+            rate = (progress['imported'] - imported_before) / elapsed * 60 if elapsed else 0
+            self.stdout.write(
+                f"  line {last_line:,}: {progress['imported']:,} imported, "
+                f"{progress['rejected']:,} rejected ({rate:,.0f} rows/min)"
+            )
+
+    def _validated(self, kind, chunks, workers):
+        """(valid, rejected, last line) per chunk, in file order"""
+        if workers <= 0:
+            for chunk in chunks:
+                yield (*validate_chunk(kind, chunk), chunk[-1][0])
+            return
+
+        # Workers open their own connections; don't hand them ours
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=setup_worker) as pool:
+            # Only a few chunks in flight keeps memory flat on huge files
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append((pool.submit(validate_chunk, kind, chunk), chunk[-1][0]))
+                if len(in_flight) >= workers * 2:
+                    future, last_line = in_flight.popleft()
+                    yield (*future.result(), last_line)
+            while in_flight:
+                future, last_line = in_flight.popleft()
+                yield (*future.result(), last_line)
+
+    def _commit(self, kind, valid):
+        # One transaction per chunk, so the checkpoint never runs ahead of the table
+        with transaction.atomic():
+            bulk_insert(MODELS[kind], import_columns(kind), (values for _, values in valid), batch_size=1000)
+
+    def _save_checkpoint(self, checkpoint_path, progress):
+        temporary = checkpoint_path.with_name(checkpoint_path.name + '.tmp')
+        temporary.write_text(json.dumps(progress))
+        os.replace(temporary, checkpoint_path)
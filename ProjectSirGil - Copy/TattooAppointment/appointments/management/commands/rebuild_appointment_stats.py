@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from appointments.models import AppointmentStats
+from appointments.stats import rebuild_all_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the AppointmentStats counter table from the appointments table'
+
+    def handle(self, *args, **options):
+        clients = rebuild_all_stats()
+        totals = AppointmentStats.objects.get(user=None)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stats for {clients} client(s) and {totals.total} appointment(s) studio-wide."
+        ))
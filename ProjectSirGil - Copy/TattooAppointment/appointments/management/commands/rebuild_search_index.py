@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from appointments.models import Appointment, Enquiry
+from appointments.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Reindex the full-text search tables and restore their sync triggers'
+
+    def handle(self, *args, **options):
+        for model in (Appointment, Enquiry):
+            if rebuild_index(model):
+                self.stdout.write(f'Reindexed {model._meta.verbose_name_plural}.')
+            else:
+                self.stdout.write(f'No full-text index for {model._meta.verbose_name_plural}; skipped.')
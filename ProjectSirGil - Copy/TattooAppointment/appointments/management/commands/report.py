@@ -0,0 +1,52 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from appointments import reports
+
+
+class Command(BaseCommand):
+    help = 'Print booking analytics: lead time, decision latency, daily volume, funnel and weekday load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14,
+                            help='Days of daily volume to print (default: 14)')
+        parser.add_argument('--output', help='Also write the full report to this JSON file')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        columns = reports.load_columns()
+        loaded = time.perf_counter()
+        report = reports.build_report(columns=columns)
+        self.stdout.write(
+            f"{report['appointments']:,} appointment(s): columns loaded in {loaded - started:.2f}s, "
+            f"analysed in {time.perf_counter() - loaded:.3f}s."
+        )
+
+        self.stdout.write('\nStatus funnel')
+        for row in report['funnel']:
+            self.stdout.write(f"  {row['stage']:<12} {row['count']:>10,} {row['share']:>6}%")
+        for title, key in (('Lead time', 'lead_time'), ('Approval latency', 'approval_latency'),
+                           ('Rejection latency', 'rejection_latency')):
+            histogram = report[key]
+            summary = (
+                f"median {histogram['median']:.1f}, p90 {histogram['p90']:.1f}" if histogram['count'] else 'no data'
+            )
+            self.stdout.write(f'\n{title} ({summary})')
+            for bucket in histogram['buckets']:
+                self.stdout.write(f"  {bucket['label']:<14} {bucket['count']:>10,}")
+        self.stdout.write('\nLoad per weekday (approved sessions)')
+        for row in report['weekday_load']:
+            self.stdout.write(f"  {row['weekday']:<10} {row['sessions']:>10,} {row['hours']:>12,} h")
+        self.stdout.write(f"\nDaily volume (last {options['days']} days): booked / approved / rejected")
+        for day in report['daily_volume'][-options['days']:]:
+            self.stdout.write(
+                f"  {day['date']:%a %Y-%m-%d} {day['booked']:>8,} {day['approved']:>8,} {day['rejected']:>8,}"
+            )
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2, cls=DjangoJSONEncoder))
+            self.stdout.write(f"\nReport written to {options['output']}")
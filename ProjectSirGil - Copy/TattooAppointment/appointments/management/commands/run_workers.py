@@ -0,0 +1,93 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments import jobs, workers
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue with a pool of worker threads or processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int,
+                            help='Worker threads (per process with --processes; default: JOBS["THREADS"])')
+        parser.add_argument('--processes', type=int, default=0,
+                            help='Spawn this many worker processes (default: 0, threads in this process)')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no job is due instead of waiting for more')
+        parser.add_argument('--poll-interval', type=float,
+                            help='Seconds an idle worker waits before looking again (default: JOBS["POLL_INTERVAL"])')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print per-task latency over the last 24 hours and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self._print_stats(jobs.latency_stats())
+            return
+
+        threads = options['threads'] or jobs.get_setting('THREADS')
+        if threads < 1 or options['processes'] < 0:
+            raise CommandError('--threads must be at least 1 and --processes not negative.')
+        purged = jobs.purge_finished()
+        if purged:
+            self.stdout.write(f'Removed {purged:,} finished job(s).')
+
+        processes = options['processes']
+        self.stdout.write(
+            f'Running {processes or 1} process(es) x {threads} thread(s)'
+            + (' until the queue is empty.' if options['burst'] else '. Ctrl+C to stop.')
+        )
+        if processes:
+            self._run_processes(processes, threads, options)
+        else:
+            self._run_threads(threads, options)
+        self.stdout.write(self.style.SUCCESS('Workers stopped.'))
+
+    def _run_threads(self, threads, options):
+        stop = threading.Event()
+        previous = signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        try:
+            workers.run_threads(threads, stop, options['burst'], options['poll_interval'])
+        except KeyboardInterrupt:
+            stop.set()
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+
+    def _run_processes(self, processes, threads, options):
+        # Spawn, not fork: children must not inherit open database connections or threads
+        context = multiprocessing.get_context('spawn')
+        pool = [
+            context.Process(
+                target=workers.process_main,
+                args=(threads, options['burst'], options['poll_interval']),
+                name=f'job-worker-{i}',
+            )
+            for i in range(processes)
+        ]
+        for process in pool:
+            process.start()
+        try:
+            for process in pool:
+                process.join()
+        except KeyboardInterrupt:
+            # Children finish the job in hand, then exit
+            for process in pool:
+                process.terminate()
+            for process in pool:
+                process.join()
+
+    def _print_stats(self, stats):
+        if not stats:
+            self.stdout.write('No jobs finished in the last 24 hours.')
+            return
+        self.stdout.write(
+            f"{'task':<40} {'done':>6} {'failed':>6} {'wait p50':>9} {'wait p95':>9} {'run p50':>9} {'run p95':>9}"
+        )
+        for name, row in stats.items():
+            cells = [row[key] for key in ('wait_p50_ms', 'wait_p95_ms', 'run_p50_ms', 'run_p95_ms')]
+            self.stdout.write(
+                f"{name:<40} {row['done']:>6} {row['failed']:>6} "
+                + ' '.join(f"{'-' if value is None else value:>9}" for value in cells)
+            )
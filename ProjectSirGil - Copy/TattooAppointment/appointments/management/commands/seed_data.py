@@ -0,0 +1,48 @@
+from time import perf_counter
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments import scheduling, seeding
+from appointments.caching import bump_landing_version
+from appointments.models import Appointment, Enquiry
+from appointments.pagination import refresh_row_estimates
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic appointments, enquiries, reviews and users for local load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('size', help='Appointments to create, e.g. 50000, 100k or 1M')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows per INSERT transaction')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed; the same seed and size give the same data')
+
+    def handle(self, *args, **options):
+        try:
+            size = seeding.parse_size(options['size'])
+        except ValueError:
+            raise CommandError(f"Invalid size {options['size']!r}; use e.g. 10000, 10k or 1M.")
+
+        self.stdout.write(f'Seeding {size:,} appointments...')
+        started = perf_counter()
+        counts = seeding.seed(
+            size,
+            batch_size=options['batch_size'],
+            random_seed=options['seed'],
+            progress=self.stdout.write,
+        )
+        elapsed = perf_counter() - started
+
+        # bulk_create skips the signal handlers that keep these in step
+        call_command('rebuild_appointment_stats', stdout=self.stdout)
+        scheduling.invalidate()
+        refresh_row_estimates(Appointment, Enquiry)
+        bump_landing_version()
+
+        rows = counts['appointments'] + counts['enquiries'] + counts['reviews'] + counts['users']
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {rows:,} rows in {elapsed:.1f}s ({rows / elapsed * 60:,.0f} rows/min). '
+            f"Log in as {seeding.STAFF_USERNAME} / {seeding.BENCH_PASSWORD}."
+        ))
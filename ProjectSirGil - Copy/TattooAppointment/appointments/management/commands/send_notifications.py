@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from appointments import outbox
+
+
+class Command(BaseCommand):
+    help = 'Send queued client emails from the outbox in batches over one SMTP connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            help='Messages per batch (default: OUTBOX["BATCH_SIZE"])')
+        parser.add_argument('--once', action='store_true',
+                            help='Send what is due now and exit (for cron) instead of polling')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to wait when nothing is due (default: 5)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        while True:
+            sent, failed = outbox.drain(options['batch_size'])
+            if sent or failed or options['once']:
+                style = self.style.WARNING if failed else self.style.SUCCESS
+                self.stdout.write(style(f'Sent {sent:,} message(s), {failed:,} failed.'))
+            if options['once']:
+                return
+            # Long-running worker: do not sit on a connection the database dropped
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from appointments import reminders
+
+
+class Command(BaseCommand):
+    help = 'Queue reminder emails for approved sessions coming up within REMINDERS["LEAD_TIME"] hours'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            help='Appointments per transaction (default: REMINDERS["BATCH_SIZE"])')
+        parser.add_argument('--once', action='store_true',
+                            help='Queue what is due now and exit (for cron) instead of waking at intervals')
+        parser.add_argument('--interval', type=float,
+                            help='Seconds between runs (default: REMINDERS["INTERVAL"])')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print reminder delivery over the last 24 hours and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self._print_stats(reminders.reminder_stats())
+            return
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        interval = options['interval'] or reminders.get_setting('INTERVAL')
+        while True:
+            started = time.monotonic()
+            run = reminders.send_due(options['batch_size'])
+            if run['reminded'] or options['once']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Queued {run['reminded']:,} reminder(s) in {run['batches']} batch(es), "
+                    f"{run['seconds']}s ({run['per_second']:,}/s)."
+                ))
+            if run['reminded']:
+                self.stdout.write(
+                    f"Lag behind due time: p50 {run['lag_p50']:.1f}s, p95 {run['lag_p95']:.1f}s, "
+                    f"max {run['lag_max']:.1f}s."
+                )
+            if options['once']:
+                return
+            # Long-running scheduler: do not sit on a connection the database dropped
+            close_old_connections()
+            # Wake on a fixed cadence, however long the run took
+            time.sleep(max(interval - (time.monotonic() - started), 0))
+
+    def _print_stats(self, stats):
+        self.stdout.write(
+            f"Reminders in the last 24 hours: {stats['sent']:,} sent, {stats['pending']:,} pending, "
+            f"{stats['dead']:,} dead."
+        )
+        if stats['lag_p50'] is not None:
+            self.stdout.write(
+                f"Delivery lag behind due time: p50 {stats['lag_p50']:.1f}s, p95 {stats['lag_p95']:.1f}s."
+            )
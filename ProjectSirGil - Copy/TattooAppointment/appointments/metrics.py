@@ -0,0 +1,183 @@
+"""
+In-process request metrics exposed in Prometheus text format.
+
+Recording must be nearly free, so there are no locks on the hot path:
+every thread writes to its own private shard (a plain dict), and the
+shards are only merged when the metrics endpoint is scraped. A lock is
+taken once per thread, when its shard is registered, and once more when
+the thread ends: its shard is then folded into one shared total for
+finished threads, so servers that keep starting new threads do not pile
+up shards.
+
+Numbers are per process. With several worker processes, scrape each one
+or put a Prometheus agent in front that sums the series.
+"""
+import threading
+import weakref
+from bisect import bisect_left
+
+# Upper bounds (seconds / bytes / queries) of the histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+HISTOGRAMS = {
+    'request_duration_seconds': ('Request latency by view', LATENCY_BUCKETS),
+    'response_size_bytes': ('Response body size by view', SIZE_BUCKETS),
+    'db_queries_per_request': ('SQL queries per request by view', QUERY_BUCKETS),
+}
+COUNTERS = {
+    'requests_total': 'Requests by view and status class',
+    'db_query_seconds_total': 'Time spent in SQL by view',
+    'cache_hits_total': 'Cache hits by view',
+    'cache_misses_total': 'Cache misses by view',
+    'rate_limit_allowed_total': 'Rate-limited POSTs let through, by scope',
+    'rate_limited_total': 'POSTs refused with 429, by scope and the key whose bucket was empty',
+    'requests_shed_total': 'Requests refused with 503 by the concurrency cap',
+}
+PREFIX = 'tattoo_'
+
+_shards = []
+# What threads that have ended recorded, summed
+_retired = {'histograms': {}, 'counters': {}}
+_shards_lock = threading.Lock()
+_local = threading.local()
+
+
+class _ThreadSentinel:
+    """Lives in a thread's locals only, so it is collected when the thread ends"""
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = {'histograms': {}, 'counters': {}}
+        with _shards_lock:
+            _shards.append(shard)
+        _local.shard = shard
+        _local.sentinel = _ThreadSentinel()
+        weakref.finalize(_local.sentinel, _retire, shard)
+    return shard
+
+
+def _retire(shard):
+    with _shards_lock:
+        _shards[:] = [live for live in _shards if live is not shard]
+        _fold(_retired, shard)
+
+
+def observe(name, labels, value):
+    """Add one observation to a histogram (labels must be a hashable tuple)"""
+    histograms = _shard()['histograms']
+    key = (name, labels)
+    series = histograms.get(key)
+    if series is None:
+        buckets = HISTOGRAMS[name][1]
+        # per-bucket counts (+Inf last), sum, count
+        series = histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+    series[0][bisect_left(HISTOGRAMS[name][1], value)] += 1
+    series[1] += value
+    series[2] += 1
+
+
+def increment(name, labels, amount=1):
+    counters = _shard()['counters']
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + amount
+
+
+def observe_request(view, status, duration, size, stats):
+    """Record everything we know about one finished request"""
+    labels = (('view', view),)
+    observe('request_duration_seconds', labels, duration)
+    if size is not None:
+        observe('response_size_bytes', labels, size)
+    observe('db_queries_per_request', labels, stats.queries)
+    increment('requests_total', labels + (('status', f'{status // 100}xx'),))
+    if stats.query_time:
+        increment('db_query_seconds_total', labels, stats.query_time)
+    if stats.cache_hits:
+        increment('cache_hits_total', labels, stats.cache_hits)
+    if stats.cache_misses:
+        increment('cache_misses_total', labels, stats.cache_misses)
+
+
+def _fold(into, shard):
+    """Add `shard`'s series to the shard-shaped dict `into`"""
+    histograms, counters = into['histograms'], into['counters']
+    # Copy first: the owning thread may add keys while we read
+    for key, (buckets, total, count) in list(shard['histograms'].items()):
+        merged = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+        merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+        merged[1] += total
+        merged[2] += count
+    for key, value in list(shard['counters'].items()):
+        counters[key] = counters.get(key, 0) + value
+
+
+def _merge():
+    merged = {'histograms': {}, 'counters': {}}
+    # Under the lock, so a thread ending now is counted once: live or retired
+    with _shards_lock:
+        shards = list(_shards)
+        _fold(merged, _retired)
+    for shard in shards:
+        _fold(merged, shard)
+    return merged['histograms'], merged['counters']
+
+
+def counter_values(name):
+    """{labels: value} of one counter, summed over all threads"""
+    _, counters = _merge()
+    return {labels: value for (series_name, labels), value in counters.items() if series_name == name}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """All metrics of this process in the Prometheus text exposition format"""
+    histograms, counters = _merge()
+    lines = []
+
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        lines.append(f'# HELP {PREFIX}{name} {help_text}')
+        lines.append(f'# TYPE {PREFIX}{name} histogram')
+        for (series_name, labels), (buckets, total, count) in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(bounds + ('+Inf',), buckets):
+                cumulative += bucket_count
+                le = bound if bound == '+Inf' else _number(bound)
+                lines.append(f'{PREFIX}{name}_bucket{_labels(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{PREFIX}{name}_sum{_labels(labels)} {_number(total)}')
+            lines.append(f'{PREFIX}{name}_count{_labels(labels)} {count}')
+
+    for name, help_text in COUNTERS.items():
+        lines.append(f'# HELP {PREFIX}{name} {help_text}')
+        lines.append(f'# TYPE {PREFIX}{name} counter')
+        for (series_name, labels), value in sorted(counters.items()):
+            if series_name == name:
+                lines.append(f'{PREFIX}{name}{_labels(labels)} {_number(value)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Forget everything recorded so far (used by tests and benchmarks)"""
+    with _shards_lock:
+        for shard in _shards + [_retired]:
+            shard['histograms'].clear()
+            shard['counters'].clear()
@@ -1,18 +1,122 @@
-﻿import logging
-from django.utils.deprecation import MiddlewareMixin
+import logging
+import random
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics, ratelimit
+from .instrumentation import begin_request, end_request
+from .request_logging import REQUEST_LOGGER, get_config
 
 # Configure logger
-logger = logging.getLogger(__name__)
-
-class RequestLoggingMiddleware(MiddlewareMixin):
-    def process_request(self, request):
-        # Log the request details
-        logger.info(f"[REQUEST] {request.method} {request.path} from {request.META.get('REMOTE_ADDR')}")
-        print(f"🔍 [MIDDLEWARE LOG] {request.method} {request.path}")
-        return None
-    
-    def process_response(self, request, response):
-        # Log the response status
-        logger.info(f"[RESPONSE] {request.path} - Status: {response.status_code}")
-        print(f"✅ [MIDDLEWARE LOG] Response Status: {response.status_code}")
-        return response
\ No newline at end of file
+logger = logging.getLogger(REQUEST_LOGGER)
+
+
+class RequestLoggingMiddleware:
+    """
+    Time every request, feed the per-view metrics and log one structured
+    record for it.
+
+    Works in both sync and async chains so async views under ASGI are not
+    pushed onto a thread. Writing the log line happens on the QueueListener
+    thread (see request_logging.py), never on the request path.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = get_config()
+        self.enabled = config['ENABLED']
+        self.sample_rate = config['SAMPLE_RATE']
+        self.slow_seconds = config['SLOW_REQUEST_MS'] / 1000
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = begin_request()
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        self.finish(request, response, perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = begin_request()
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        self.finish(request, response, perf_counter() - start, stats)
+        return response
+
+    def finish(self, request, response, duration, stats):
+        match = request.resolver_match
+        view = match.view_name if match else None
+        size = None if response.streaming else len(response.content)
+        metrics.observe_request(view or 'unresolved', response.status_code, duration, size, stats)
+
+        if not self.enabled:
+            return
+        # Slow requests and server errors are always kept; the rest are sampled
+        if (
+            duration < self.slow_seconds
+            and response.status_code < 500
+            and random.random() >= self.sample_rate
+        ):
+            return
+
+        logger.info('request', extra={'request': {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'db_queries': stats.queries,
+            'db_time_ms': round(stats.query_time * 1000, 2),
+            'remote_addr': request.META.get('REMOTE_ADDR'),
+        }})
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Shed load early: with MAX_CONCURRENT_REQUESTS requests already in
+    flight in this process, answer 503 at once instead of queueing more
+    work. Sits near the top of MIDDLEWARE so a shed request costs no
+    session or database access. Streaming responses release their slot
+    when the view returns, not when the last byte is sent.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limit = ratelimit.concurrency_limit()
+        if not self.limit:
+            raise MiddlewareNotUsed
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not ratelimit.acquire_slot(self.limit):
+            return ratelimit.service_unavailable()
+        try:
+            return self.get_response(request)
+        finally:
+            ratelimit.release_slot()
+
+    async def __acall__(self, request):
+        if not ratelimit.acquire_slot(self.limit):
+            return ratelimit.service_unavailable()
+        try:
+            return await self.get_response(request)
+        finally:
+            ratelimit.release_slot()
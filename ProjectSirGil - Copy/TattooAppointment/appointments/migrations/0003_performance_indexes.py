@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_appointment_reference_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointment_date', 'id'], name='appt_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['-created_at', '-id'], name='appt_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='appt_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'appointment_date', 'id'], name='appt_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['user', 'appointment_date'], name='appt_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['user', '-created_at'], name='appt_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['user', 'status'], name='appt_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artist',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', 'name'], name='artist_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enquiry',
+            index=models.Index(fields=['-created_at', '-id'], name='enquiry_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enquiry',
+            index=models.Index(fields=['is_contacted', '-created_at'], name='enquiry_contacted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('is_approved', True), ('is_featured', True)), fields=['-date'], name='review_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['-date', '-id'], name='review_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studio',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', 'name'], name='studio_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tattoostyle',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', 'name'], name='style_active_order_idx'),
+        ),
+    ]
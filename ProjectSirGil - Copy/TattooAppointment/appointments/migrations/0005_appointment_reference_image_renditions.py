@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_appointment_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='reference_image_renditions',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Widths of the downscaled copies stored next to the reference image'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+"""
+FTS5 indexes for appointment and enquiry search.
+
+External-content tables: the text stays in the real tables and triggers
+keep the index in step with every INSERT/UPDATE/DELETE, including bulk
+QuerySet.update() calls that bypass model signals. Skipped on databases
+without FTS5; search.py then falls back to LIKE queries.
+"""
+from django.db import migrations
+
+# content table -> (FTS table, indexed columns); mirrored in search.py
+INDEXES = {
+    'appointments_appointment': ('appointments_appointment_fts', ('client_name', 'email', 'phone', 'tattoo_design')),
+    'appointments_enquiry': ('appointments_enquiry_fts', ('name', 'email', 'phone', 'message')),
+}
+
+
+def create_sql(table, content_table, columns):
+    cols = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    delete = f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    insert = f'INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new});'
+    return [
+        f"CREATE VIRTUAL TABLE {table} USING fts5({cols}, content='{content_table}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f'CREATE TRIGGER {table}_ai AFTER INSERT ON {content_table} BEGIN {insert} END',
+        f'CREATE TRIGGER {table}_ad AFTER DELETE ON {content_table} BEGIN {delete} END',
+        f'CREATE TRIGGER {table}_au AFTER UPDATE OF {cols} ON {content_table} BEGIN {delete} {insert} END',
+        f"INSERT INTO {table}({table}) VALUES ('rebuild')",
+    ]
+
+
+def create_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+    for content_table, (table, columns) in INDEXES.items():
+        for statement in create_sql(table, content_table, columns):
+            schema_editor.execute(statement)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, _ in INDEXES.values():
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_appointment_artist_duration'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0009_updated_at_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAppointment',
+            fields=[
+                ('id', models.IntegerField(help_text='Id the appointment had in the live table', primary_key=True, serialize=False)),
+                ('client_name', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254)),
+                ('phone', models.CharField(max_length=15)),
+                ('tattoo_design', models.TextField()),
+                ('reference_image', models.ImageField(blank=True, null=True, upload_to='appointments/designs/')),
+                ('reference_image_renditions', models.JSONField(blank=True, default=list, editable=False)),
+                ('appointment_date', models.DateTimeField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending Review'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='pending', max_length=10)),
+                ('duration_minutes', models.PositiveIntegerField(default=60)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('artist', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='appointments.artist')),
+                ('user', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-appointment_date'],
+                'indexes': [models.Index(fields=['appointment_date', 'id'], name='archive_date_idx'), models.Index(fields=['user', 'appointment_date'], name='archive_user_date_idx'), models.Index(fields=['user', 'status'], name='archive_user_status_idx'), models.Index(fields=['archived_at'], name='archive_archived_idx')],
+            },
+        ),
+    ]
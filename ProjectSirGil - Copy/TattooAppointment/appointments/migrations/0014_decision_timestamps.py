@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0013_appointment_reminders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='approved_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='rejected_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedappointment',
+            name='approved_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedappointment',
+            name='rejected_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
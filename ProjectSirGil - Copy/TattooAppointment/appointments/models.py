@@ -1,5 +1,85 @@
-﻿from django.db import models
+﻿from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+
+# Status -> the field recording when an appointment last got it
+DECISION_FIELDS = {'approved': 'approved_at', 'rejected': 'rejected_at'}
+
+
+class StatusCountsQuerySet(models.QuerySet):
+    """Queries shared by live and archived appointments"""
+
+    def status_counts(self):
+        """Total and per-status counts in a single conditional aggregate"""
+        counts = {
+            status: Count('pk', filter=Q(status=status))
+            for status, _ in Appointment.STATUS_CHOICES
+        }
+        return self.order_by().aggregate(total=Count('pk'), **counts)
+
+
+class AppointmentQuerySet(StatusCountsQuerySet):
+    """Appointment queries plus counter-table bookkeeping for bulk updates"""
+
+    def update(self, **kwargs):
+        """
+        Bulk updates bypass save() and its signals. When status or owner
+        change we count what is about to move and patch AppointmentStats;
+        when booking fields change the affected artist schedules are dropped;
+        approvals and rejections queue client emails in the outbox and are
+        stamped in approved_at / rejected_at. updated_at is stamped here too,
+        since auto_now only runs in save().
+        """
+        from .stats import stats_enabled, apply_bulk_update
+        from .scheduling import SCHEDULE_FIELDS, invalidate
+        from .outbox import enqueue_status_changes, notifies
+
+        now = timezone.now()
+        kwargs.setdefault('updated_at', now)
+        decided_at = DECISION_FIELDS.get(kwargs.get('status'))
+        if decided_at:
+            # Only rows whose status really changes get a new decision time
+            kwargs.setdefault(decided_at, Case(
+                When(~Q(status=kwargs['status']), then=Value(now)),
+                default=F(decided_at),
+            ))
+        if 'appointment_date' in kwargs:
+            # A moved session is reminded again, ahead of its new date
+            kwargs.setdefault('reminder_sent_at', None)
+        track_stats = stats_enabled() and {'status', 'user', 'user_id'} & kwargs.keys()
+        track_schedule = SCHEDULE_FIELDS & kwargs.keys()
+        notify = notifies(kwargs.get('status'))
+        if not (track_stats or track_schedule or notify):
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db):
+            if track_stats:
+                groups = list(
+                    self.order_by().values('user_id', 'status').annotate(count=Count('pk'))
+                )
+            if track_schedule:
+                artist_ids = set(self.order_by().values_list('artist_id', flat=True).distinct())
+                new_artist = kwargs.get('artist_id', kwargs.get('artist'))
+                artist_ids.add(getattr(new_artist, 'pk', new_artist))
+            if notify:
+                # Only rows whose status really changes hear about it
+                changing = list(self.exclude(status=kwargs['status']).order_by().values(
+                    'pk', 'email', 'client_name', 'appointment_date',
+                ))
+            rows = super().update(**kwargs)
+            if track_stats:
+                apply_bulk_update(groups, kwargs)
+            if track_schedule:
+                transaction.on_commit(lambda: invalidate(artist_ids), using=self.db)
+            if notify:
+                enqueue_status_changes(changing, kwargs['status'], using=self.db)
+        return rows
+
+    update.alters_data = True
 
 
 class Appointment(models.Model):
@@ -14,21 +94,136 @@ class Appointment(models.Model):
     phone = models.CharField(max_length=15)
     tattoo_design = models.TextField()
     reference_image = models.ImageField(upload_to='appointments/designs/', blank=True, null=True)
+    reference_image_renditions = models.JSONField(
+        default=list,
+        blank=True,
+        editable=False,
+        help_text='Widths of the downscaled copies stored next to the reference image',
+    )
     appointment_date = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every save and bulk update; keys the cached card fragments
+    updated_at = models.DateTimeField(auto_now=True)
     status = models.CharField(
         max_length=10,
         choices=STATUS_CHOICES,
         default='pending',
         help_text='Appointment approval status'
     )
-    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,  # covered by appt_user_date_idx and the other user-first indexes
+    )
+    artist = models.ForeignKey(
+        'Artist',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='appointments',
+        db_index=False,  # covered by appt_artist_date_idx
+    )
+    duration_minutes = models.PositiveIntegerField(default=60, help_text='Session length in minutes')
+    reminder_sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='When the reminder email was queued (see reminders.py); cleared on reschedule',
+    )
+    # Stamped when the status changes (signals.py, AppointmentQuerySet.update); read by reports.py
+    approved_at = models.DateTimeField(null=True, blank=True, editable=False)
+    rejected_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = AppointmentQuerySet.as_manager()
+
+    # ArchivedAppointment says True; templates hide actions on archived rows
+    is_archived = False
     
     def __str__(self):
         return f"{self.client_name} - {self.appointment_date}"
     
     class Meta:
         ordering = ['-appointment_date']
+        indexes = [
+            # Admin date_hierarchy, list ordering and the staff "upcoming" slice
+            models.Index(fields=['appointment_date', 'id'], name='appt_date_idx'),
+            # Staff queue keyset pagination (manage page) and "recent activity"
+            models.Index(fields=['-created_at', '-id'], name='appt_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='appt_status_created_idx'),
+            # Admin changelist filtered by status, ordered by session date; reminder window scan
+            models.Index(fields=['status', 'appointment_date', 'id'], name='appt_status_date_idx'),
+            # Per-client dashboard and history views
+            models.Index(fields=['user', 'appointment_date'], name='appt_user_date_idx'),
+            models.Index(fields=['user', '-created_at'], name='appt_user_created_idx'),
+            models.Index(fields=['user', 'status'], name='appt_user_status_idx'),
+            # Rebuilding an artist's booking index (scheduling.py)
+            models.Index(fields=['artist', 'appointment_date'], name='appt_artist_date_idx'),
+            # MAX(updated_at) for conditional GET, studio-wide and per client
+            models.Index(fields=['updated_at'], name='appt_updated_idx'),
+            models.Index(fields=['user', 'updated_at'], name='appt_user_updated_idx'),
+        ]
+
+
+class ArchivedAppointment(models.Model):
+    """
+    Appointments whose session is long past, moved out of the live table by
+    `manage.py archive_appointments` so its indexes stay small. Rows keep
+    their original id and still count in AppointmentStats; the appointment
+    lists merge them with the live ones (archive.appointment_history).
+    """
+    is_archived = True
+
+    id = models.IntegerField(primary_key=True, help_text='Id the appointment had in the live table')
+    client_name = models.CharField(max_length=100)
+    email = models.EmailField()
+    phone = models.CharField(max_length=15)
+    tattoo_design = models.TextField()
+    reference_image = models.ImageField(upload_to='appointments/designs/', blank=True, null=True)
+    reference_image_renditions = models.JSONField(default=list, blank=True, editable=False)
+    appointment_date = models.DateTimeField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=Appointment.STATUS_CHOICES, default='pending')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        db_index=False,  # covered by archive_user_date_idx
+    )
+    artist = models.ForeignKey(
+        'Artist',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        db_index=False,
+    )
+    duration_minutes = models.PositiveIntegerField(default=60)
+    approved_at = models.DateTimeField(null=True, blank=True, editable=False)
+    rejected_at = models.DateTimeField(null=True, blank=True, editable=False)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = StatusCountsQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.client_name} - {self.appointment_date}"
+
+    class Meta:
+        ordering = ['-appointment_date']
+        indexes = [
+            # Admin date_hierarchy and list ordering
+            models.Index(fields=['appointment_date', 'id'], name='archive_date_idx'),
+            # Per-client history
+            models.Index(fields=['user', 'appointment_date'], name='archive_user_date_idx'),
+            # Counter rebuilds: per-client and whole-table status counts
+            models.Index(fields=['user', 'status'], name='archive_user_status_idx'),
+            # Newest move, part of the staff list ETag
+            models.Index(fields=['archived_at'], name='archive_archived_idx'),
+        ]
 
 
 class TattooStyle(models.Model):
@@ -45,6 +240,10 @@ class TattooStyle(models.Model):
     
     class Meta:
         ordering = ['order', 'name']
+        indexes = [
+            # Landing page only ever lists active rows in display order
+            models.Index(fields=['order', 'name'], condition=models.Q(is_active=True), name='style_active_order_idx'),
+        ]
 
 
 class Artist(models.Model):
@@ -80,6 +279,10 @@ class Artist(models.Model):
     
     class Meta:
         ordering = ['order', 'name']
+        indexes = [
+            # Landing page only ever lists active rows in display order
+            models.Index(fields=['order', 'name'], condition=models.Q(is_active=True), name='artist_active_order_idx'),
+        ]
 
 
 class Studio(models.Model):
@@ -106,6 +309,10 @@ class Studio(models.Model):
     
     class Meta:
         ordering = ['order', 'name']
+        indexes = [
+            # Landing page only ever lists active rows in display order
+            models.Index(fields=['order', 'name'], condition=models.Q(is_active=True), name='studio_active_order_idx'),
+        ]
 
 
 class Review(models.Model):
@@ -123,6 +330,16 @@ class Review(models.Model):
     
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Featured testimonials on the landing page
+            models.Index(
+                fields=['-date'],
+                condition=models.Q(is_approved=True, is_featured=True),
+                name='review_featured_idx',
+            ),
+            # Admin changelist ordering (-date, -pk)
+            models.Index(fields=['-date', '-id'], name='review_date_idx'),
+        ]
 
 
 class Enquiry(models.Model):
@@ -140,4 +357,140 @@ class Enquiry(models.Model):
     
     class Meta:
         ordering = ['-created_at']
-        verbose_name_plural = "Enquiries"
\ No newline at end of file
+        verbose_name_plural = "Enquiries"
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='enquiry_created_idx'),
+            models.Index(fields=['is_contacted', '-created_at'], name='enquiry_contacted_idx'),
+        ]
+
+
+class AppointmentStats(models.Model):
+    """
+    Denormalized appointment counters so the dashboard never has to count rows.
+    One row per client, plus a single studio-wide row where user is empty.
+    Kept current by the signal handlers in signals.py and by
+    AppointmentQuerySet.update(); rebuild with `manage.py rebuild_appointment_stats`.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='appointment_stats',
+        help_text='Leave empty for the studio-wide totals',
+    )
+    total = models.PositiveIntegerField(default=0)
+    pending = models.PositiveIntegerField(default=0)
+    approved = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        owner = self.user.username if self.user_id else 'Studio-wide'
+        return f"{owner} - {self.total} appointment(s)"
+
+    class Meta:
+        verbose_name_plural = "Appointment stats"
+        constraints = [
+            # Only one studio-wide (user IS NULL) row
+            models.UniqueConstraint(Coalesce('user', 0), name='appointment_stats_scope_unique'),
+        ]
+
+
+class CacheVersion(models.Model):
+    """
+    Version counters for cached data that every process must agree on.
+    The caches are per process, so the version itself lives here and a
+    bump in one worker is seen by all of them (see caching.py).
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class OutboxMessage(models.Model):
+    """
+    An email waiting to go out, written in the same transaction as the
+    change it reports. `manage.py send_notifications` drains the table
+    (see outbox.py); messages that keep failing end up as dead letters.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (DEAD, 'Dead letter'),
+    ]
+
+    topic = models.CharField(max_length=50)
+    recipient = models.EmailField()
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a worker may (re)try it; also the lease while one is sending it
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.topic} to {self.recipient} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The worker's "what is due" scan; sent rows drop out of it
+            models.Index(fields=['next_attempt_at', 'id'], condition=Q(status='pending'), name='outbox_due_idx'),
+            models.Index(fields=['status', '-created_at'], name='outbox_status_created_idx'),
+        ]
+
+
+class Job(models.Model):
+    """
+    A unit of background work for `manage.py run_workers` (see jobs.py).
+    Higher priority runs first, never before run_at. A worker holds a
+    running job until locked_until; past that another worker may take it.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Latency: queue wait is started_at - run_at, run time finished_at - started_at
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Claim order of waiting jobs
+            models.Index(fields=['-priority', 'run_at', 'id'], condition=Q(status='queued'), name='job_queued_idx'),
+            # Running jobs whose worker went quiet
+            models.Index(fields=['locked_until'], condition=Q(status='running'), name='job_running_idx'),
+            models.Index(fields=['locked_by'], condition=Q(status='running'), name='job_locked_by_idx'),
+            # Latency stats and the admin list
+            models.Index(fields=['task', 'status', 'finished_at'], name='job_task_finished_idx'),
+        ]
@@ -0,0 +1,224 @@
+"""
+Transactional outbox for client emails.
+
+A status change or a reminder never talks to the mail server. It adds an
+OutboxMessage row in the same transaction, so the email exists exactly
+when the change was committed and staff clicks cost one INSERT, not an
+SMTP round trip.
+
+The table is drained by `manage.py send_notifications` or by the job
+queue (`manage.py run_workers`), which gets a drain job whenever new
+messages commit. A drain leases a batch of due messages, sends them over
+one SMTP connection and marks them sent. A failed message is retried
+after RETRY_DELAY seconds, doubling each time; after MAX_ATTEMPTS it
+becomes a dead letter, visible (and re-queueable) in the admin. A worker
+that dies mid-batch leaves its lease to expire, so delivery is at least
+once.
+"""
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Appointment, OutboxMessage
+
+STATUS_CHANGED = 'appointment.status_changed'
+REMINDER = 'appointment.reminder'
+
+# Template name prefixes per topic: <prefix>.txt and <prefix>_subject.txt
+TEMPLATES = {
+    STATUS_CHANGED: 'appointments/emails/status_changed',
+    REMINDER: 'appointments/emails/reminder',
+}
+
+# Clients hear about decisions, not about being put back in the queue
+NOTIFY_STATUSES = ('approved', 'rejected')
+
+DEFAULTS = {
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 6,
+    'RETRY_DELAY': 60,
+    'LEASE': 300,
+}
+
+SEND_ERRORS = (smtplib.SMTPException, OSError)
+
+
+def get_setting(name):
+    return getattr(settings, 'OUTBOX', {}).get(name, DEFAULTS[name])
+
+
+def notifies(status):
+    return isinstance(status, str) and status in NOTIFY_STATUSES
+
+
+# ============================================
+# WRITING
+# ============================================
+
+def _message(topic, appointment, **extra):
+    return OutboxMessage(
+        topic=topic,
+        recipient=appointment['email'],
+        payload={
+            'appointment_id': appointment['pk'],
+            'client_name': appointment['client_name'],
+            'appointment_date': appointment['appointment_date'],
+            **extra,
+        },
+    )
+
+
+def _enqueue(messages, using):
+    messages = OutboxMessage.objects.using(using).bulk_create(messages, batch_size=500)
+    if messages:
+        # Workers (run_workers) send them right away; a single waiting drain covers every message
+        from .tasks import send_notifications
+        send_notifications.enqueue_on_commit(unique=True)
+    return len(messages)
+
+
+def enqueue_status_change(appointment, using='default'):
+    """Queue the email for one appointment whose status just changed"""
+    row = {
+        'pk': appointment.pk,
+        'email': appointment.email,
+        'client_name': appointment.client_name,
+        'appointment_date': appointment.appointment_date,
+    }
+    enqueue_status_changes([row], appointment.status, using)
+
+
+def enqueue_status_changes(appointments, status, using='default'):
+    """Queue one email per appointment dict (pk, email, client_name, appointment_date)"""
+    return _enqueue([_message(STATUS_CHANGED, appointment, status=status) for appointment in appointments], using)
+
+
+def enqueue_reminders(appointments, using='default'):
+    """Queue one reminder per appointment dict (pk, email, client_name, appointment_date)"""
+    return _enqueue([_message(REMINDER, appointment) for appointment in appointments], using)
+
+
+# ============================================
+# SENDING
+# ============================================
+
+def claim_batch(size=None):
+    """
+    Lease up to `size` due messages to this worker. Workers racing for the
+    same rows each get only those their own UPDATE moved.
+    """
+    now = timezone.now()
+    ids = list(
+        OutboxMessage.objects.filter(status=OutboxMessage.PENDING, next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id')
+        .values_list('pk', flat=True)[:size or get_setting('BATCH_SIZE')]
+    )
+    if not ids:
+        return []
+    # Our lease end (from our own clock reading) tells our rows apart from another worker's
+    lease_until = now + timedelta(seconds=get_setting('LEASE'))
+    OutboxMessage.objects.filter(
+        pk__in=ids, status=OutboxMessage.PENDING, next_attempt_at__lte=now,
+    ).update(next_attempt_at=lease_until)
+    return list(OutboxMessage.objects.filter(pk__in=ids, next_attempt_at=lease_until).order_by('id'))
+
+
+def build_email(message, connection=None):
+    payload = dict(message.payload)
+    payload['appointment_date'] = parse_datetime(payload.get('appointment_date') or '')
+    if 'status' in payload:
+        payload['status_display'] = dict(Appointment.STATUS_CHOICES).get(payload['status'], payload['status'])
+    template = TEMPLATES[message.topic]
+    subject = render_to_string(f'{template}_subject.txt', payload).strip()
+    body = render_to_string(f'{template}.txt', payload)
+    return EmailMessage(
+        subject, body, settings.DEFAULT_FROM_EMAIL, [message.recipient],
+        connection=connection, headers={'X-Outbox-Id': str(message.pk)},
+    )
+
+
+def record_failure(message, error):
+    """Schedule a retry with doubling delay, or dead-letter after MAX_ATTEMPTS"""
+    attempts = message.attempts + 1
+    now = timezone.now()
+    changes = {'attempts': attempts, 'last_error': f'{type(error).__name__}: {error}'[:1000]}
+    if attempts >= get_setting('MAX_ATTEMPTS'):
+        changes.update(status=OutboxMessage.DEAD, next_attempt_at=now)
+    else:
+        changes['next_attempt_at'] = now + timedelta(seconds=get_setting('RETRY_DELAY') * 2 ** (attempts - 1))
+    OutboxMessage.objects.filter(pk=message.pk).update(**changes)
+
+
+def mark_sent(message):
+    OutboxMessage.objects.filter(pk=message.pk).update(
+        status=OutboxMessage.SENT, sent_at=timezone.now(), attempts=F('attempts') + 1, last_error='',
+    )
+
+
+def send_batch(messages, connection=None):
+    """
+    Send leased `messages` over one SMTP connection; returns (sent, failed).
+    Each message is marked sent as soon as the server takes it, so a crash
+    later in the batch does not send it again. After an SMTP error the
+    connection is reopened for the rest of the batch; a message that cannot
+    be built (missing template or key, bad address) fails on its own.
+    """
+    connection = connection or get_connection(fail_silently=False)
+    sent = failed = 0
+    try:
+        connection.open()
+    except SEND_ERRORS as exc:
+        for message in messages:
+            record_failure(message, exc)
+        return 0, len(messages)
+
+    try:
+        for position, message in enumerate(messages):
+            try:
+                connection.send_messages([build_email(message, connection)])
+            except SEND_ERRORS as exc:
+                record_failure(message, exc)
+                failed += 1
+                try:
+                    # The session may be half-way through a transaction or gone
+                    connection.close()
+                    connection.open()
+                except SEND_ERRORS as exc:
+                    # The server went away: the rest of the batch waits for its retry
+                    for rest in messages[position + 1:]:
+                        record_failure(rest, exc)
+                    failed += len(messages) - position - 1
+                    break
+            except Exception as exc:
+                # Nothing reached the server; retried and dead-lettered like the rest
+                record_failure(message, exc)
+                failed += 1
+            else:
+                mark_sent(message)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def drain(batch_size=None, connection=None):
+    """Send every message that is due now, batch by batch; returns (sent, failed)"""
+    sent = failed = 0
+    while batch := claim_batch(batch_size):
+        batch_sent, batch_failed = send_batch(batch, connection)
+        sent += batch_sent
+        failed += batch_failed
+    return sent, failed
+
+
+def requeue(queryset):
+    """Give dead letters (or anything else in `queryset`) a fresh set of attempts"""
+    return queryset.exclude(status=OutboxMessage.SENT).update(
+        status=OutboxMessage.PENDING, attempts=0, next_attempt_at=timezone.now(),
+    )
@@ -0,0 +1,181 @@
+"""
+Keyset (cursor) pagination for large appointment querysets.
+
+OFFSET pagination gets slower the deeper you page because the database still
+has to walk every skipped row. Keyset pagination remembers the last row of the
+previous page and asks for rows "after" it instead, so every page costs the
+same no matter how big the table gets.
+
+The admin changelists keep their numbered pages but use
+EstimatedCountPaginator, which avoids an exact COUNT(*) over the table.
+"""
+import base64
+import binascii
+
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+
+
+def encode_cursor(value, pk):
+    """Build an opaque, URL-safe cursor from a (timestamp or date, pk) pair"""
+    raw = f"{value.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Turn a cursor token back into its (timestamp or date, pk) pair"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        value, pk = raw.rsplit('|', 1)
+        timestamp = parse_datetime(value) if 'T' in value else parse_date(value)
+        if timestamp is None:
+            raise ValueError(value)
+        return timestamp, int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+class KeysetPage:
+    """One page of results plus the cursor pointing at the next one"""
+
+    def __init__(self, object_list, next_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginate_keyset(queryset, cursor=None, per_page=20, field='created_at'):
+    """
+    Return a KeysetPage of `queryset` ordered newest first on (field, pk).
+
+    The seek condition is written as `field <= value AND (field < value OR
+    pk < last_pk)` rather than a plain OR so the database can turn the first
+    half into an index range scan.
+    """
+    queryset = queryset.order_by(f'-{field}', '-pk')
+
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{field}__lte': value}),
+            Q(**{f'{field}__lt': value}) | Q(pk__lt=pk),
+        )
+
+    # Fetch one extra row to find out whether another page exists
+    rows = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return KeysetPage(rows, next_cursor)
+
+
+# ============================================
+# ADMIN CHANGELISTS
+# ============================================
+
+def table_row_estimate(model, using='default'):
+    """
+    Rows in `model`'s table as of the last ANALYZE, read from SQLite's
+    sqlite_stat1; None if the table was never analyzed.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            return None
+        # Every row for the table starts with its row count
+        cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [model._meta.db_table])
+        row = cursor.fetchone()
+    return int(row[0].split()[0]) if row else None
+
+
+def refresh_row_estimates(*models, using='default'):
+    """Re-ANALYZE the tables of `models` after bulk inserts or deletes"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for model in models:
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for changelists over tables too large to COUNT(*) per page view.
+
+    Up to COUNT_CAP matching rows are counted exactly. Past that, an
+    unfiltered list takes the table's row estimate (table_row_estimate) and
+    a filtered or searched one stops counting. count_is_estimate and
+    count_is_capped tell the template which it got.
+
+    Both are lower bounds: the estimate is only as fresh as the last
+    ANALYZE, so rows inserted since are missing from it. Deeper pages are
+    still served, and the last counted page checks for a row past its end
+    so the count grows to reach the next page while there is one.
+    """
+    COUNT_CAP = 10000
+
+    count_is_estimate = False
+    count_is_capped = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        count = queryset.order_by().values('pk')[:self.COUNT_CAP + 1].count()
+        if count > self.COUNT_CAP and not queryset.query.has_filters():
+            estimate = table_row_estimate(queryset.model, queryset.db)
+            if estimate is not None:
+                self.count_is_estimate = True
+                return max(estimate, count)
+        self.count_is_capped = count > self.COUNT_CAP
+        return count
+
+    @property
+    def count_is_lower_bound(self):
+        return self.count_is_estimate or self.count_is_capped
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # The table may have grown since the estimate; keep serving deeper pages
+            if self.count_is_lower_bound and int(number) > 1:
+                return int(number)
+            raise
+
+    def page(self, number):
+        if not self.count_is_lower_bound:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        # Not cut at count: that may stop short of rows the estimate missed
+        object_list = self.object_list[bottom:top]
+        seen = bottom + len(object_list)
+        if top >= self.count and seen == top and self.object_list[top:top + 1].exists():
+            seen += 1
+        if seen > self.count:
+            self.count = seen
+            self.__dict__.pop('num_pages', None)
+        return self._get_page(object_list, number, self)
@@ -0,0 +1,190 @@
+"""
+Rate limits and load shedding for the endpoints a bot burst can exhaust.
+
+Login runs PBKDF2 on every POST; register and enquiries write a row.
+Each of these scopes has token buckets (settings.RATE_LIMITS) keyed by
+client IP and, for login, by the submitted username. A bucket refills
+at `rate` tokens per minute up to `burst`. An empty bucket means an
+immediate plain-text 429 before the view runs, so no password is hashed
+and nothing is written. The JSON API's enquiry and booking POSTs share
+the 'enquiry' scope with the site form.
+
+Buckets live in the RATE_LIMIT_CACHE cache alias (default: 'default'),
+two cache round trips per POST. With the LocMem cache that is per
+process: every worker keeps its own buckets, so a client spread over N
+workers gets up to N times the configured rate. Point RATE_LIMIT_CACHE
+at a cache all workers share (Redis, Memcached) for studio-wide limits.
+The read and the write are not atomic either way, so requests racing on
+one key can overshoot a limit slightly.
+
+The concurrency cap (settings.MAX_CONCURRENT_REQUESTS, per process) is
+enforced by ConcurrencyLimitMiddleware: once that many requests are in
+flight, further ones are answered 503 before sessions or views load.
+
+Both feed the request metrics; rate_limit_stats() gathers them for the
+staff rate-limit page.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+
+from . import metrics
+
+RETRY_MESSAGE = 'Too many attempts. Please wait a moment and try again.'
+
+_slots_lock = threading.Lock()
+_in_flight = 0
+
+
+def get_limits(scope):
+    """{key kind: (tokens per minute, burst)} for `scope`; empty if unlimited"""
+    return getattr(settings, 'RATE_LIMITS', {}).get(scope, {})
+
+
+def _key_values(request, kinds):
+    values = {}
+    if 'ip' in kinds:
+        values['ip'] = request.META.get('REMOTE_ADDR', '')
+    if 'username' in kinds:
+        username = request.POST.get('username', '').strip().lower()
+        if username:
+            values['username'] = username
+    return values
+
+
+def _cache():
+    return caches[getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+
+
+def _cache_key(scope, kind, value):
+    digest = hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+    return f'ratelimit:{scope}:{kind}:{digest}'
+
+
+def consume(scope, request):
+    """
+    Take one token from every bucket of `scope` that applies to `request`.
+    Returns 0 if allowed, otherwise the seconds until a retry can succeed;
+    a refused request takes no tokens.
+    """
+    limits = get_limits(scope)
+    values = _key_values(request, limits)
+    if not values:
+        return 0
+
+    keys = {kind: _cache_key(scope, kind, value) for kind, value in values.items()}
+    cache = _cache()
+    states = cache.get_many(keys.values())
+    # Wall clock, not monotonic: a shared RATE_LIMIT_CACHE hands buckets between processes
+    now = time.time()
+    updated, retry_after, refused_by = {}, 0, None
+    for kind, key in keys.items():
+        per_minute, burst = limits[kind]
+        rate = per_minute / 60
+        tokens, last = states.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - last) * rate)
+        if tokens < 1:
+            wait = (1 - tokens) / rate
+            if wait > retry_after:
+                retry_after, refused_by = wait, kind
+        else:
+            # Expires once the bucket would be full again anyway
+            updated[key] = ((tokens - 1, now), int(burst / rate) + 1)
+
+    if refused_by:
+        metrics.increment('rate_limited_total', (('scope', scope), ('key', refused_by)))
+        return retry_after
+    for key, (state, timeout) in updated.items():
+        cache.set(key, state, timeout)
+    metrics.increment('rate_limit_allowed_total', (('scope', scope),))
+    return 0
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse(RETRY_MESSAGE, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = max(1, round(retry_after))
+    return response
+
+
+def rate_limit(scope):
+    """Refuse POSTs with 429 once a bucket of `scope` is empty, before the view runs"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method == 'POST':
+                retry_after = consume(scope, request)
+                if retry_after:
+                    return too_many_requests(retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def rate_limit_stats():
+    """
+    Per-scope limits with this process's allowed / refused counts, and the
+    concurrency cap. Counters are per process, like all request metrics.
+    """
+    allowed = metrics.counter_values('rate_limit_allowed_total')
+    refused = {}
+    for labels, value in metrics.counter_values('rate_limited_total').items():
+        labels = dict(labels)
+        refused.setdefault(labels['scope'], {})[labels['key']] = value
+    return {
+        'scopes': [
+            {
+                'name': scope,
+                'limits': [(kind, per_minute, burst) for kind, (per_minute, burst) in limits.items()],
+                'allowed': allowed.get((('scope', scope),), 0),
+                'refused': sum(refused.get(scope, {}).values()),
+                'refused_by': sorted(refused.get(scope, {}).items()),
+            }
+            for scope, limits in getattr(settings, 'RATE_LIMITS', {}).items()
+        ],
+        'per_process_buckets': isinstance(_cache(), LocMemCache),
+        'concurrency_limit': concurrency_limit(),
+        'in_flight': in_flight(),
+        'shed': metrics.counter_values('requests_shed_total').get((), 0),
+    }
+
+
+# ============================================
+# CONCURRENCY CAP
+# ============================================
+
+def concurrency_limit():
+    return getattr(settings, 'MAX_CONCURRENT_REQUESTS', 0) or 0
+
+
+def acquire_slot(limit):
+    """Count one more request in flight; False (and nothing counted) if `limit` is reached"""
+    global _in_flight
+    with _slots_lock:
+        if _in_flight >= limit:
+            metrics.increment('requests_shed_total', ())
+            return False
+        _in_flight += 1
+        return True
+
+
+def release_slot():
+    global _in_flight
+    with _slots_lock:
+        _in_flight -= 1
+
+
+def in_flight():
+    return _in_flight
+
+
+def service_unavailable():
+    response = HttpResponse('The studio site is busy. Please try again in a moment.', status=503,
+                            content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = 1
+    return response
@@ -0,0 +1,137 @@
+"""
+Reminder emails for upcoming sessions, sent by `manage.py send_reminders`.
+
+Every INTERVAL seconds the scheduler looks for approved sessions starting
+within the next LEAD_TIME hours that have no reminder_sent_at yet. They
+are read with a range scan of appt_status_date_idx (status,
+appointment_date, id) that starts at now and stops at the window's end,
+so sessions further out are never read, however many there are, and
+memory never holds more than one batch.
+
+Each batch is one transaction: stamp reminder_sent_at on the rows that
+are still un-reminded, then queue an outbox email for each row that was
+stamped. Schedulers that overlap, or a run that is retried, skip rows
+already stamped, so every session gets one reminder. Moving a session to
+another date clears the stamp, so the new date gets its own reminder.
+
+Lag is how long after a reminder became due (LEAD_TIME before the
+session) it was queued, or, in reminder_stats(), delivered.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import outbox
+from .models import Appointment, OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'LEAD_TIME': 24,
+    'BATCH_SIZE': 500,
+    'INTERVAL': 300,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'REMINDERS', {}).get(name, DEFAULTS[name])
+
+
+def lead_time():
+    return timedelta(hours=get_setting('LEAD_TIME'))
+
+
+def due(now=None):
+    """Approved sessions in the reminder window that have not been reminded"""
+    now = now or timezone.now()
+    return Appointment.objects.filter(
+        status='approved',
+        reminder_sent_at__isnull=True,
+        appointment_date__gt=now,
+        appointment_date__lte=now + lead_time(),
+    )
+
+
+def remind_batch(size=None, using='default'):
+    """Queue reminders for up to `size` due sessions in one transaction; returns their appointment dates"""
+    now = timezone.now()
+    with transaction.atomic(using=using):
+        ids = list(
+            due(now).using(using).order_by('appointment_date', 'id')
+            .values_list('pk', flat=True)[:size or get_setting('BATCH_SIZE')]
+        )
+        if not ids:
+            return []
+        # Our stamp (from our own clock reading) tells our rows apart from another run's.
+        # updated_at stays: nothing a page shows has changed.
+        Appointment.objects.using(using).filter(pk__in=ids, reminder_sent_at__isnull=True).update(
+            reminder_sent_at=now, updated_at=F('updated_at'),
+        )
+        rows = list(
+            Appointment.objects.using(using).filter(pk__in=ids, reminder_sent_at=now)
+            .order_by('appointment_date', 'id')
+            .values('pk', 'email', 'client_name', 'appointment_date')
+        )
+        outbox.enqueue_reminders(rows, using)
+    return [row['appointment_date'] for row in rows]
+
+
+def send_due(batch_size=None):
+    """
+    Queue every due reminder, batch by batch. Returns the run's metrics:
+    reminders queued, batches, seconds, reminders per second and the
+    p50/p95/max lag in seconds.
+    """
+    from .benchmarking import percentile
+
+    started = time.perf_counter()
+    lead = lead_time()
+    lags, batches = [], 0
+    while dates := remind_batch(batch_size):
+        batches += 1
+        now = timezone.now()
+        lags.extend(max((now - (date - lead)).total_seconds(), 0) for date in dates)
+    seconds = time.perf_counter() - started
+    run = {
+        'reminded': len(lags),
+        'batches': batches,
+        'seconds': round(seconds, 3),
+        'per_second': round(len(lags) / seconds, 1) if seconds else 0,
+        'lag_p50': percentile(lags, 0.5),
+        'lag_p95': percentile(lags, 0.95),
+        'lag_max': max(lags, default=None),
+    }
+    if lags:
+        logger.info('Queued %s reminder(s)', len(lags), extra={'reminders': run})
+    return run
+
+
+def reminder_stats(since=None):
+    """
+    Reminder emails created since `since` (default: the last 24 hours) by
+    outbox status, and p50/p95 delivery lag in seconds of the sent ones.
+    """
+    from .benchmarking import percentile
+
+    since = since or timezone.now() - timedelta(days=1)
+    lead = lead_time()
+    counts, lags = {}, []
+    for status, _ in OutboxMessage.STATUS_CHOICES:
+        # One range read of outbox_status_created_idx per status
+        rows = (
+            OutboxMessage.objects.filter(status=status, created_at__gte=since, topic=outbox.REMINDER)
+            .values_list('sent_at', 'payload__appointment_date')
+            .iterator()
+        )
+        counts[status] = 0
+        for sent_at, appointment_date in rows:
+            counts[status] += 1
+            if sent_at and appointment_date:
+                lags.append(max((sent_at - (parse_datetime(appointment_date) - lead)).total_seconds(), 0))
+    return {**counts, 'lag_p50': percentile(lags, 0.5), 'lag_p95': percentile(lags, 0.95)}
@@ -0,0 +1,86 @@
+"""
+Structured request logs written off the request thread.
+
+The middleware hands each record to a QueueHandler, which only puts it on
+an in-memory queue. A QueueListener thread formats the record as JSON and
+does the actual (blocking) I/O.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+from django.conf import settings
+
+REQUEST_LOGGER = 'appointments.requests'
+
+DEFAULTS = {
+    # Off unless a deployment turns it on
+    'ENABLED': False,
+    # Fraction of ordinary requests to log (0.0 - 1.0)
+    'SAMPLE_RATE': 0.1,
+    # Requests slower than this, and all 5xx responses, are always logged
+    'SLOW_REQUEST_MS': 500,
+    # Log file path; None writes to stdout
+    'FILE': None,
+}
+
+_listener = None
+_handler = None
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_LOGGING', {})}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; request fields come from record.request"""
+
+    def format(self, record):
+        payload = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update(getattr(record, 'request', {}))
+        return json.dumps(payload, default=str)
+
+
+def configure_request_logging():
+    """Attach the queue handler and start the listener thread (once)"""
+    global _listener, _handler
+    config = get_config()
+    if _listener is not None or not config['ENABLED']:
+        return
+
+    if config['FILE']:
+        target = logging.FileHandler(config['FILE'])
+    else:
+        target = logging.StreamHandler(sys.stdout)
+    target.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    _handler = logging.handlers.QueueHandler(log_queue)
+    logger = logging.getLogger(REQUEST_LOGGER)
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, target, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_request_logging)
+
+
+def stop_request_logging():
+    """Detach the queue handler, write out what is queued and stop the listener"""
+    global _listener, _handler
+    if _listener is None:
+        return
+    logging.getLogger(REQUEST_LOGGER).removeHandler(_handler)
+    _listener.stop()
+    for target in _listener.handlers:
+        target.close()
+    _listener = _handler = None
@@ -0,0 +1,204 @@
+"""
+In-memory booking index per artist.
+
+Each artist's upcoming pending/approved bookings are kept sorted by start
+time, so "is this slot free?" is a binary search plus a look at the few
+bookings that could overlap, and "next N free slots" jumps from booking to
+booking instead of scanning the table.
+
+Schedules are built lazily from the database, patched in place by the
+signal handlers after each commit, and rebuilt after SCHEDULE_INDEX_TTL
+seconds so changes made by other worker processes show up.
+
+The index is only a fast pre-check: it can be up to SCHEDULE_INDEX_TTL
+seconds behind other processes. A booking is confirmed against the table
+with conflicting_bookings(), inside the transaction that saves it.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+# Bookings in these states hold their slot
+BLOCKING_STATUSES = ('pending', 'approved')
+
+# Changing any of these on an appointment can move it in the index
+SCHEDULE_FIELDS = {'status', 'artist', 'artist_id', 'appointment_date', 'duration_minutes'}
+
+_schedules = {}
+_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class ArtistSchedule:
+    """Sorted bookings of one artist as (start, end, appointment id)"""
+
+    def __init__(self, bookings=()):
+        self.bookings = sorted(bookings)
+        self.by_id = {pk: (start, end, pk) for start, end, pk in self.bookings}
+        self.max_length = max((end - start for start, end, _ in self.bookings), default=timedelta(0))
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.bookings)
+
+    def add(self, pk, start, end):
+        self.remove(pk)
+        booking = (start, end, pk)
+        insort(self.bookings, booking)
+        self.by_id[pk] = booking
+        self.max_length = max(self.max_length, end - start)
+
+    def remove(self, pk):
+        booking = self.by_id.pop(pk, None)
+        if booking is not None:
+            index = bisect_left(self.bookings, booking)
+            del self.bookings[index]
+
+    def conflicts(self, start, end, exclude=None):
+        """Bookings overlapping [start, end)"""
+        # Only bookings starting in (start - longest booking, end) can overlap
+        low = bisect_right(self.bookings, (start - self.max_length,))
+        high = bisect_left(self.bookings, (end,))
+        return [
+            booking for booking in self.bookings[low:high]
+            if booking[1] > start and booking[2] != exclude
+        ]
+
+    def is_free(self, start, end, exclude=None):
+        return not self.conflicts(start, end, exclude)
+
+    def free_slots(self, start, end, duration, limit=10, step=None, opening_hours=None):
+        """Up to `limit` free [slot_start, slot_end) pairs between start and end"""
+        step = step or timedelta(minutes=_setting('BOOKING_SLOT_MINUTES', 30))
+        opening_hours = opening_hours or _setting('STUDIO_OPENING_HOURS', (10, 20))
+        tz = timezone.get_current_timezone()
+        slots = []
+        candidate = _align(start, step)
+
+        while candidate + duration <= end and len(slots) < limit:
+            local = timezone.localtime(candidate, tz)
+            opens = timezone.make_aware(datetime.combine(local.date(), datetime.min.time()), tz) \
+                + timedelta(hours=opening_hours[0])
+            closes = opens + timedelta(hours=opening_hours[1] - opening_hours[0])
+            if candidate < opens:
+                candidate = opens
+                continue
+            if candidate + duration > closes:
+                candidate = opens + timedelta(days=1)
+                continue
+
+            clashes = self.conflicts(candidate, candidate + duration)
+            if clashes:
+                # Skip straight past the latest-ending clash
+                candidate = _align(max(booking[1] for booking in clashes), step)
+                continue
+            slots.append((candidate, candidate + duration))
+            candidate += step
+        return slots
+
+
+def _align(moment, step):
+    """Round `moment` up to the next multiple of `step` past midnight UTC"""
+    seconds = step.total_seconds()
+    epoch = moment.timestamp()
+    aligned = -(-epoch // seconds) * seconds
+    return moment + timedelta(seconds=aligned - epoch)
+
+
+def booking_interval(start, duration_minutes):
+    return start, start + timedelta(minutes=duration_minutes or 0)
+
+
+def _load(artist_id):
+    from .models import Appointment
+
+    since = timezone.now() - timedelta(days=1)
+    rows = (
+        Appointment.objects
+        .filter(artist_id=artist_id, status__in=BLOCKING_STATUSES, appointment_date__gte=since)
+        .order_by()
+        .values_list('pk', 'appointment_date', 'duration_minutes')
+    )
+    return ArtistSchedule(
+        (*booking_interval(start, minutes), pk) for pk, start, minutes in rows.iterator()
+    )
+
+
+def conflicting_bookings(artist_id, start, end, exclude=None, using='default'):
+    """
+    Pk and interval of the stored bookings overlapping [start, end), read
+    from the table itself (a range scan of appt_artist_date_idx). Run it in
+    the transaction that saves the booking, after locking the artist row.
+    """
+    from .models import Appointment
+
+    # Only bookings starting within the longest session before `start` can reach it
+    longest = max(
+        timedelta(minutes=_setting('MAX_SESSION_MINUTES', 600)),
+        get_schedule(artist_id).max_length,
+    )
+    rows = (
+        Appointment.objects.using(using)
+        .filter(
+            artist_id=artist_id,
+            status__in=BLOCKING_STATUSES,
+            appointment_date__gt=start - longest,
+            appointment_date__lt=end,
+        )
+        .exclude(pk=exclude)
+        .order_by()
+        .values_list('pk', 'appointment_date', 'duration_minutes')
+    )
+    return [
+        (pk, *booking_interval(booked, minutes)) for pk, booked, minutes in rows
+        if booking_interval(booked, minutes)[1] > start
+    ]
+
+
+def get_schedule(artist_id):
+    """The (possibly freshly rebuilt) booking index of one artist"""
+    ttl = _setting('SCHEDULE_INDEX_TTL', 60)
+    schedule = _schedules.get(artist_id)
+    if schedule is None or time.monotonic() - schedule.built_at > ttl:
+        schedule = _load(artist_id)
+        with _lock:
+            _schedules[artist_id] = schedule
+    return schedule
+
+
+def invalidate(artist_ids=None):
+    """Drop cached schedules so they are rebuilt on next use (None = all)"""
+    with _lock:
+        if artist_ids is None:
+            _schedules.clear()
+        else:
+            for artist_id in artist_ids:
+                _schedules.pop(artist_id, None)
+
+
+def sync_booking(pk, old_artist_id, artist_id, status, start, duration_minutes):
+    """Move one appointment within the loaded schedules after it was saved"""
+    with _lock:
+        if old_artist_id in _schedules and old_artist_id != artist_id:
+            _schedules[old_artist_id].remove(pk)
+        schedule = _schedules.get(artist_id)
+        if schedule is None:
+            return
+        if status in BLOCKING_STATUSES and start is not None:
+            schedule.add(pk, *booking_interval(start, duration_minutes))
+        else:
+            schedule.remove(pk)
+
+
+def remove_booking(pk, artist_id):
+    with _lock:
+        schedule = _schedules.get(artist_id)
+        if schedule is not None:
+            schedule.remove(pk)
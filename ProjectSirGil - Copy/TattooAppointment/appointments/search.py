@@ -0,0 +1,229 @@
+"""
+Full-text search over appointments and enquiries.
+
+On SQLite with FTS5 (see migration 0007) the search goes to the
+external-content FTS tables: matches come back ranked by bm25 with
+highlighted snippets, and nothing scans the real tables. Anywhere else,
+or with FULL_TEXT_SEARCH = False, the same functions fall back to
+icontains lookups ordered newest first.
+"""
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+# model name -> FTS table, indexed columns (same order as migration 0007),
+# bm25 column weights, title and body columns used for display
+SEARCH_INDEXES = {
+    'Appointment': {
+        'table': 'appointments_appointment_fts',
+        'columns': ('client_name', 'email', 'phone', 'tattoo_design'),
+        'weights': (4.0, 2.0, 1.0, 3.0),
+        'title': 'client_name',
+        'body': 'tattoo_design',
+        'fallback_order': ('-created_at', '-id'),
+    },
+    'Enquiry': {
+        'table': 'appointments_enquiry_fts',
+        'columns': ('name', 'email', 'phone', 'message'),
+        'weights': (4.0, 2.0, 1.0, 3.0),
+        'title': 'name',
+        'body': 'message',
+        'fallback_order': ('-created_at', '-id'),
+    },
+}
+
+# Highlight markers that cannot occur in user text; swapped for <mark>
+# after the snippet has been HTML-escaped
+_START, _END = '\x02', '\x03'
+
+TERM_RE = re.compile(r'\w+')
+MAX_TERMS = 8
+
+SearchHit = namedtuple('SearchHit', 'object rank title snippet')
+
+_tables = {}
+
+
+def search_terms(query):
+    return TERM_RE.findall(query or '')[:MAX_TERMS]
+
+
+def match_expression(terms):
+    """Every term must match, each as a prefix ("ko" finds "koi")"""
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _spec(model):
+    return SEARCH_INDEXES[model._meta.object_name]
+
+
+def fts_enabled(queryset):
+    """True if the FTS table for this queryset's model exists in its database"""
+    if not getattr(settings, 'FULL_TEXT_SEARCH', True):
+        return False
+    connection = connections[queryset.db]
+    if connection.vendor != 'sqlite':
+        return False
+    key = (queryset.db, connection.settings_dict['NAME'])
+    if key not in _tables:
+        _tables[key] = set(connection.introspection.table_names())
+    return _spec(queryset.model)['table'] in _tables[key]
+
+
+def _trigger_sql(model):
+    """CREATE TRIGGER statements that keep `model`'s FTS table in sync (as in migration 0007)"""
+    spec = _spec(model)
+    table, columns, content_table = spec['table'], spec['columns'], model._meta.db_table
+    cols = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    delete = f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    insert = f'INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new});'
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {content_table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {content_table} BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {cols} ON {content_table} BEGIN {delete} {insert} END',
+    ]
+
+
+def _create_triggers(model, using):
+    with connections[using].cursor() as cursor:
+        for statement in _trigger_sql(model):
+            cursor.execute(statement)
+
+
+def restore_triggers(using='default'):
+    """
+    Recreate any missing sync triggers, leaving the index alone.
+
+    SQLite drops a table's triggers whenever a migration rebuilds the
+    table (AddField, AlterField, ...), so this runs after every migrate.
+    """
+    from django.apps import apps
+
+    for key in [key for key in _tables if key[0] == using]:
+        del _tables[key]
+    for name in SEARCH_INDEXES:
+        model = apps.get_model('appointments', name)
+        if fts_enabled(model.objects.using(using)):
+            _create_triggers(model, using)
+
+
+def rebuild_index(model, using='default'):
+    """Restore the sync triggers if missing and reindex every row"""
+    if not fts_enabled(model.objects.using(using)):
+        return False
+    _create_triggers(model, using)
+    table = _spec(model)['table']
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+    return True
+
+
+@contextmanager
+def deferred_index(model, using='default'):
+    """
+    Pause incremental indexing of `model` during a bulk load.
+
+    Per-row trigger updates make big inserts several times slower than
+    one 'rebuild' at the end. Searches during the load see the old index.
+    If the process is killed before the end, run rebuild_search_index.
+    """
+    if not fts_enabled(model.objects.using(using)):
+        yield
+        return
+    table = _spec(model)['table']
+    with connections[using].cursor() as cursor:
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {table}_{suffix}')
+    try:
+        yield
+    finally:
+        rebuild_index(model, using)
+
+
+def _fallback_filter(queryset, terms):
+    columns = _spec(queryset.model)['columns']
+    for term in terms:
+        condition = Q()
+        for column in columns:
+            condition |= Q(**{f'{column}__icontains': term})
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def filter_queryset(queryset, query):
+    """Narrow `queryset` to rows matching `query`; keeps its ordering"""
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    if not fts_enabled(queryset):
+        return _fallback_filter(queryset, terms)
+    table = _spec(queryset.model)['table']
+    return queryset.filter(
+        pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [match_expression(terms)])
+    )
+
+
+def _marked_html(text):
+    return mark_safe(escape(text).replace(_START, '<mark>').replace(_END, '</mark>'))
+
+
+def _mark_terms(text, terms):
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    return _marked_html(pattern.sub(lambda m: f'{_START}{m.group(0)}{_END}', text))
+
+
+def search(queryset, query, limit=20):
+    """Best `limit` matches within `queryset` as SearchHit tuples"""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    spec = _spec(queryset.model)
+
+    if not fts_enabled(queryset):
+        rows = _fallback_filter(queryset, terms).order_by(*spec['fallback_order'])[:limit]
+        return [
+            SearchHit(
+                row,
+                None,
+                _mark_terms(getattr(row, spec['title']), terms),
+                _mark_terms(Truncator(getattr(row, spec['body'])).words(30), terms),
+            )
+            for row in rows
+        ]
+
+    table, columns = spec['table'], spec['columns']
+    weights = ', '.join(str(weight) for weight in spec['weights'])
+    sql = (
+        f"SELECT rowid, bm25({table}, {weights}), "
+        f"highlight({table}, {columns.index(spec['title'])}, %s, %s), "
+        f"snippet({table}, {columns.index(spec['body'])}, %s, %s, '…', 24) "
+        f"FROM {table} WHERE {table} MATCH %s"
+    )
+    params = [_START, _END, _START, _END, match_expression(terms)]
+    if queryset.query.where:
+        # Restrict to the caller's rows (e.g. a client's own appointments)
+        scope_sql, scope_params = queryset.order_by().values('pk').query.sql_with_params()
+        sql += f' AND rowid IN ({scope_sql})'
+        params.extend(scope_params)
+    sql += ' ORDER BY 2 LIMIT %s'
+    params.append(limit)
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    objects = queryset.in_bulk([row[0] for row in rows])
+    return [
+        SearchHit(objects[pk], rank, _marked_html(title), _marked_html(snippet))
+        for pk, rank, title, snippet in rows
+        if pk in objects
+    ]
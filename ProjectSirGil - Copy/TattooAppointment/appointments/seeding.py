@@ -0,0 +1,215 @@
+"""
+Synthetic data for benchmarks and local load testing.
+
+seed() inserts `size` appointments and enquiries plus proportional users
+and reviews, and a small catalogue. The large tables go through
+bulk_insert(), a plain executemany, to make 1M-row runs practical. That
+skips model signals, so the stats table and schedules are left for
+their lazy rebuilds. The search index is rebuilt once after each table
+instead of row by row. Output is deterministic for a given size and
+seed.
+"""
+import random
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.models import DateField, DateTimeField
+from django.utils import timezone
+
+from .models import Appointment, Artist, Enquiry, Review, Studio, TattooStyle
+from .search import deferred_index
+
+BENCH_PASSWORD = 'bench-password'
+STAFF_USERNAME = 'bench_staff'
+CLIENT_USERNAME = 'bench_client'
+
+STYLES = ['Traditional', 'Neo-Traditional', 'Japanese', 'Blackwork', 'Fine Line', 'Realism', 'Watercolor', 'Tribal']
+MOTIFS = ['koi', 'rose', 'dagger', 'skull', 'swallow', 'tiger', 'dragon', 'snake', 'moth', 'lotus', 'anchor', 'wolf']
+PLACEMENTS = ['forearm', 'sleeve', 'back piece', 'ankle', 'ribs', 'shoulder', 'calf', 'hand', 'chest']
+NAMES = ['Ana', 'Ben', 'Cleo', 'Dev', 'Eli', 'Fay', 'Gus', 'Hana', 'Ivo', 'Jun', 'Kai', 'Lena', 'Milo', 'Nia']
+
+
+def parse_size(value):
+    """'10k' -> 10000, '1M' -> 1000000 (ValueError if malformed)"""
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    suffix = value[-1:].lower()
+    if suffix in multipliers:
+        return int(float(value[:-1]) * multipliers[suffix])
+    return int(value)
+
+
+def _ratio(size, divisor, minimum):
+    return max(size // divisor, minimum)
+
+
+def _design(rng):
+    return (
+        f'{rng.choice(STYLES)} {rng.choice(MOTIFS)} with {rng.choice(MOTIFS)} on the '
+        f'{rng.choice(PLACEMENTS)}, about {rng.randrange(5, 40)} cm'
+    )
+
+
+def bulk_insert(model, columns, rows, using='default', batch_size=5000):
+    """
+    INSERT rows of database-ready values with executemany.
+
+    Skips model instances and per-value field conversion, which is where
+    bulk_create spends most of its time. `rows` yields tuples matching
+    `columns` (attnames), already adapted for the backend. Every other
+    column gets its field default, converted once. Returns the row count.
+    """
+    connection = connections[using]
+    now = timezone.now()
+    fields = {field.attname: field for field in model._meta.concrete_fields if not field.primary_key}
+    fixed = {}
+    for attname, field in fields.items():
+        if attname in columns:
+            continue
+        default = now if getattr(field, 'auto_now_add', False) or getattr(field, 'auto_now', False) else field.get_default()
+        if isinstance(field, DateTimeField):
+            default = connection.ops.adapt_datetimefield_value(default)
+        elif isinstance(field, DateField):
+            default = connection.ops.adapt_datefield_value(default)
+        else:
+            default = field.get_db_prep_save(default, connection)
+        fixed[attname] = default
+
+    names = [fields[attname].column for attname in (*columns, *fixed)]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(name) for name in names),
+        ', '.join(['%s'] * len(names)),
+    )
+    tail = tuple(fixed.values())
+    count = 0
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, batch_size)):
+            # One transaction per batch: chunked commits, bounded memory
+            with transaction.atomic(using=using):
+                cursor.executemany(sql, [row + tail for row in batch])
+            count += len(batch)
+    return count
+
+
+def seed(size, using='default', batch_size=5000, random_seed=0, progress=None):
+    """Insert a dataset scaled to `size` appointments; returns row counts"""
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    report = progress or (lambda message: None)
+    ops = connections[using].ops
+    adapt_datetime, adapt_date = ops.adapt_datetimefield_value, ops.adapt_datefield_value
+
+    def insert(model, columns, rows):
+        count = bulk_insert(model, columns, rows, using, batch_size)
+        report(f'  {model._meta.verbose_name_plural}: {count:,}')
+        return count
+
+    if not TattooStyle.objects.using(using).exists():
+        TattooStyle.objects.using(using).bulk_create([
+            TattooStyle(name=name, description=f'{name} work', order=i) for i, name in enumerate(STYLES)
+        ])
+        Artist.objects.using(using).bulk_create([
+            Artist(name=f'{name} Ink', role=rng.choice(Artist.ROLE_CHOICES)[0], order=i)
+            for i, name in enumerate(NAMES[:10])
+        ])
+        Studio.objects.using(using).bulk_create([
+            Studio(name=f'J\'ink {city}', city=city, country='PH', address=f'1 Main St, {city}', order=i)
+            for i, city in enumerate(['Manila', 'Cebu', 'Davao'])
+        ])
+    artist_ids = list(Artist.objects.using(using).values_list('pk', flat=True))
+
+    password = make_password(BENCH_PASSWORD)
+    staff, _ = User.objects.using(using).get_or_create(
+        username=STAFF_USERNAME,
+        defaults={'password': password, 'is_staff': True, 'is_superuser': True},
+    )
+    client, _ = User.objects.using(using).get_or_create(
+        username=CLIENT_USERNAME, defaults={'password': password, 'email': 'client@example.com'},
+    )
+    users = User.objects.using(using)
+    last_pk = users.order_by('-pk').values_list('pk', flat=True).first()
+    offset = users.count()
+    joined = adapt_datetime(now)
+    user_count = insert(User, ('username', 'email', 'password', 'date_joined'), (
+        (f'bench_{offset + i}', f'bench_{offset + i}@example.com', password, joined)
+        for i in range(_ratio(size, 20, 10))
+    ))
+    user_ids = list(users.filter(pk__gt=last_pk).values_list('pk', flat=True))
+
+    # Booking history for reports; its own generator keeps the rows above unchanged
+    history_rng = random.Random(random_seed + 1)
+
+    def history(appointment_date, status):
+        created_at = min(appointment_date - timedelta(hours=history_rng.randrange(2, 24 * 90)), now)
+        decided_at = min(created_at + timedelta(minutes=history_rng.randrange(5, 60 * 72)), now)
+        return (
+            adapt_datetime(created_at),
+            adapt_datetime(decided_at) if status == 'approved' else None,
+            adapt_datetime(decided_at) if status == 'rejected' else None,
+        )
+
+    def appointments():
+        for i in range(size):
+            # The bench client gets a realistic history of their own
+            if i % 500 == 0:
+                user_id = client.pk
+            else:
+                user_id = rng.choice(user_ids) if rng.random() < 0.8 else None
+            name = rng.choice(NAMES)
+            design = _design(rng)
+            appointment_date = now + timedelta(minutes=30 * rng.randrange(-17520, 4320))
+            status = rng.choices(['pending', 'approved', 'rejected'], weights=[3, 5, 2])[0]
+            yield (
+                f'{name} {i}',
+                f'{name.lower()}{i}@example.com',
+                f'555-{i % 10000:04d}',
+                design,
+                adapt_datetime(appointment_date),
+                status,
+                user_id,
+                rng.choice(artist_ids) if rng.random() < 0.7 else None,
+                rng.choice([60, 90, 120, 180]),
+                *history(appointment_date, status),
+            )
+
+    with deferred_index(Appointment, using):
+        insert(Appointment, (
+            'client_name', 'email', 'phone', 'tattoo_design', 'appointment_date',
+            'status', 'user_id', 'artist_id', 'duration_minutes', 'created_at', 'approved_at', 'rejected_at',
+        ), appointments())
+    with deferred_index(Enquiry, using):
+        insert(Enquiry, ('name', 'email', 'phone', 'message', 'preferred_date', 'is_contacted'), (
+            (
+                f'{rng.choice(NAMES)} {i}',
+                f'enquiry{i}@example.com',
+                f'555-{i % 10000:04d}',
+                f'Looking for a {_design(rng)}.',
+                adapt_date((now + timedelta(days=rng.randrange(1, 120))).date()),
+                rng.random() < 0.6,
+            )
+            for i in range(size)
+        ))
+    review_count = insert(Review, ('client_name', 'rating', 'review_text', 'is_approved', 'is_featured'), (
+        (
+            rng.choice(NAMES),
+            rng.randint(3, 5),
+            f'Loved my {rng.choice(MOTIFS)} piece.',
+            rng.random() < 0.8,
+            rng.random() < 0.05,
+        )
+        for i in range(_ratio(size, 10, 10))
+    ))
+
+    return {
+        'appointments': size,
+        'enquiries': size,
+        'reviews': review_count,
+        'users': user_count + 2,
+        'staff': staff.pk,
+        'client': client.pk,
+    }
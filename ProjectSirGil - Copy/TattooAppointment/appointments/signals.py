@@ -0,0 +1,206 @@
+from django.db import transaction
+from django.db.models.signals import post_init, pre_save, post_save, post_delete, post_migrate
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caching import bump_landing_version
+from .models import DECISION_FIELDS, Appointment, ArchivedAppointment, TattooStyle, Artist, Studio, Review
+from . import outbox, scheduling, stats, tasks
+from .search import restore_triggers
+
+
+# ============================================
+# APPOINTMENT SNAPSHOT
+# ============================================
+
+def _stats_state(instance):
+    """(user_id, status) as loaded, or None when either field was deferred"""
+    values = instance.__dict__
+    if 'status' not in values or 'user_id' not in values:
+        return None
+    return values['user_id'], values['status']
+
+
+def _reference_image_name(instance):
+    value = instance.__dict__.get('reference_image')
+    return getattr(value, 'name', value) or ''
+
+
+def _snapshot(instance):
+    values = instance.__dict__
+    saved = instance.pk is not None
+    return {
+        'status': values.get('status') if saved else None,
+        'stats': _stats_state(instance) if saved else None,
+        'artist_id': values.get('artist_id'),
+        'appointment_date': values.get('appointment_date'),
+        'reference_image': _reference_image_name(instance),
+    }
+
+
+@receiver(post_init, sender=Appointment)
+def remember_loaded_state(sender, instance, **kwargs):
+    # One receiver for every row loaded (list pages and exports load
+    # thousands); the save and delete handlers below diff against it
+    instance._loaded = _snapshot(instance)
+
+
+# ============================================
+# APPOINTMENT STATS COUNTERS
+# ============================================
+
+
+@receiver(post_save, sender=Appointment)
+def update_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw or not stats.stats_enabled():
+        return
+    new_state = _stats_state(instance)
+    if created:
+        stats.record_change(None, new_state)
+    elif instance._loaded['stats'] is None:
+        # Saved from a deferred instance: we cannot diff, so recount
+        stats.rebuild_stats(None)
+        if instance.user_id:
+            stats.rebuild_stats(instance.user_id)
+    else:
+        stats.record_change(instance._loaded['stats'], new_state)
+
+
+@receiver(post_delete, sender=Appointment)
+def update_stats_on_delete(sender, instance, **kwargs):
+    if not stats.stats_enabled():
+        return
+    # Never recreate a missing row here: during a user cascade delete the
+    # client's counter row is going away too.
+    stats.record_change(instance._loaded['stats'] or _stats_state(instance), None, rebuild_missing=False)
+
+
+@receiver(post_delete, sender=ArchivedAppointment)
+def update_stats_on_archive_delete(sender, instance, **kwargs):
+    # Archived rows still count, so deleting one for good takes it off
+    if stats.stats_enabled():
+        stats.record_change(_stats_state(instance), None, rebuild_missing=False)
+
+
+# ============================================
+# LANDING PAGE CACHE
+# ============================================
+
+@receiver([post_save, post_delete], sender=TattooStyle)
+@receiver([post_save, post_delete], sender=Artist)
+@receiver([post_save, post_delete], sender=Studio)
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_landing_cache(sender, **kwargs):
+    # Admin edits (including list_editable) all go through save()/delete()
+    bump_landing_version()
+
+
+# ============================================
+# REFERENCE IMAGE RENDITIONS
+# ============================================
+
+@receiver(post_save, sender=Appointment)
+def create_reference_renditions(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    name, replaced_name = _reference_image_name(instance), instance._loaded['reference_image']
+    if name == replaced_name:
+        return
+
+    # Resizing takes seconds per photo: a worker does it once the upload is committed.
+    # Until then templates show the original.
+    tasks.render_reference_image.enqueue_on_commit(
+        appointment_id=instance.pk,
+        name=name,
+        replaced_name=replaced_name,
+        replaced_widths=instance.reference_image_renditions or [],
+    )
+    if instance.reference_image_renditions:
+        Appointment.objects.filter(pk=instance.pk).update(reference_image_renditions=[])
+        instance.reference_image_renditions = []
+
+
+# ============================================
+# ARTIST BOOKING INDEX
+# ============================================
+
+@receiver(post_save, sender=Appointment)
+def update_schedule_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old_artist_id, artist_id = instance._loaded['artist_id'], instance.artist_id
+    values = instance.__dict__
+    if not {'status', 'appointment_date', 'duration_minutes'} <= values.keys():
+        # Saved from a deferred instance: let both schedules rebuild
+        transaction.on_commit(lambda: scheduling.invalidate({old_artist_id, artist_id}))
+        return
+    booking = (instance.pk, old_artist_id, artist_id, values['status'],
+               values['appointment_date'], values['duration_minutes'])
+    # Only touch the shared index once the booking is really committed
+    transaction.on_commit(lambda: scheduling.sync_booking(*booking))
+
+
+@receiver(post_delete, sender=Appointment)
+def update_schedule_on_delete(sender, instance, **kwargs):
+    pk, artist_id = instance.pk, instance._loaded['artist_id']
+    transaction.on_commit(lambda: scheduling.remove_booking(pk, artist_id))
+
+
+# ============================================
+# CLIENT NOTIFICATIONS
+# ============================================
+
+@receiver(post_save, sender=Appointment)
+def notify_status_change(sender, instance, created, raw=False, using='default', **kwargs):
+    # Written in the caller's transaction: the email exists only if the change commits
+    status, previous = instance.__dict__.get('status'), instance._loaded['status']
+    if raw or created or previous is None or status == previous or not outbox.notifies(status):
+        return
+    outbox.enqueue_status_change(instance, using)
+
+
+# ============================================
+# SESSION REMINDERS
+# ============================================
+
+@receiver(pre_save, sender=Appointment)
+def reset_reminder_on_reschedule(sender, instance, raw=False, **kwargs):
+    # A moved session is reminded again, ahead of its new date
+    date, loaded_date = instance.__dict__.get('appointment_date'), instance._loaded['appointment_date']
+    if not raw and loaded_date is not None and date != loaded_date:
+        instance.reminder_sent_at = None
+
+
+# ============================================
+# DECISION TIMESTAMPS
+# ============================================
+
+@receiver(pre_save, sender=Appointment)
+def stamp_decision(sender, instance, raw=False, **kwargs):
+    # Approval latency in reports.py is approved_at - created_at
+    status = instance.__dict__.get('status')
+    field = DECISION_FIELDS.get(status)
+    if not raw and field and status != instance._loaded['status']:
+        setattr(instance, field, timezone.now())
+
+
+# ============================================
+# APPOINTMENT SNAPSHOT REFRESH
+# ============================================
+
+@receiver(post_save, sender=Appointment)
+def refresh_loaded_state(sender, instance, **kwargs):
+    # Connected after every handler above, so they all compared against the
+    # state as loaded; the next save of this instance diffs against this one
+    instance._loaded = _snapshot(instance)
+
+
+# ============================================
+# FULL-TEXT SEARCH TRIGGERS
+# ============================================
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using='default', **kwargs):
+    # Table rebuilds during migrate take the FTS sync triggers with them
+    if sender.name == 'appointments':
+        restore_triggers(using)
@@ -0,0 +1,35 @@
+function toggleDetails(card) {
+    // Close all other cards
+    document.querySelectorAll('.appointment-card.expanded').forEach(function(openCard) {
+        if (openCard !== card) {
+            openCard.classList.remove('expanded');
+        }
+    });
+
+    // Toggle current card
+    card.classList.toggle('expanded');
+}
+
+// Auto-hide empty state messages after animations
+document.addEventListener('DOMContentLoaded', function() {
+    const statCards = document.querySelectorAll('.stat-card');
+    statCards.forEach((card, index) => {
+        card.style.animation = `fadeIn 0.5s ease ${index * 0.1}s both`;
+    });
+});
+
+// Add fadeIn animation
+const style = document.createElement('style');
+style.textContent = `
+    @keyframes fadeIn {
+        from {
+            opacity: 0;
+            transform: translateY(20px);
+        }
+        to {
+            opacity: 1;
+            transform: translateY(0);
+        }
+    }
+`;
+document.head.appendChild(style);
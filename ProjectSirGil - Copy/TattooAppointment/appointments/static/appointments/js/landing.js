@@ -0,0 +1,23 @@
+// Smooth scrolling for navigation links
+document.querySelectorAll('a[href^="#"]').forEach(anchor => {
+    anchor.addEventListener('click', function (e) {
+        e.preventDefault();
+        const target = document.querySelector(this.getAttribute('href'));
+        if (target) {
+            target.scrollIntoView({
+                behavior: 'smooth',
+                block: 'start'
+            });
+        }
+    });
+});
+
+// Auto-hide messages after 5 seconds
+setTimeout(function() {
+    const messages = document.querySelector('.messages');
+    if (messages) {
+        messages.style.opacity = '0';
+        messages.style.transition = 'opacity 0.5s ease';
+        setTimeout(() => messages.remove(), 500);
+    }
+}, 5000);
@@ -0,0 +1,47 @@
+// Infinite scroll: fetch the next page of cards whenever the
+// "Load More" link scrolls into view. The plain link still works
+// without JavaScript.
+(function () {
+    const link = document.getElementById('load-more');
+    const queue = document.getElementById('appointment-queue');
+    if (!link || !queue || !('IntersectionObserver' in window)) {
+        return;
+    }
+    let loading = false;
+
+    function loadMore() {
+        if (loading || !link.dataset.cursor) {
+            return;
+        }
+        loading = true;
+        const params = new URLSearchParams(link.dataset.filters);
+        params.set('cursor', link.dataset.cursor);
+        fetch(link.dataset.url + '?' + params.toString(), {credentials: 'same-origin'})
+            .then(function (response) {
+                const next = response.headers.get('X-Next-Cursor');
+                return response.text().then(function (html) {
+                    queue.insertAdjacentHTML('beforeend', html);
+                    link.dataset.cursor = next || '';
+                    if (next) {
+                        params.set('cursor', next);
+                        link.href = '?' + params.toString();
+                    } else {
+                        link.parentNode.remove();
+                        observer.disconnect();
+                    }
+                });
+            })
+            .finally(function () { loading = false; });
+    }
+
+    const observer = new IntersectionObserver(function (entries) {
+        if (entries.some(function (entry) { return entry.isIntersecting; })) {
+            loadMore();
+        }
+    }, {rootMargin: '400px'});
+    observer.observe(link);
+    link.addEventListener('click', function (event) {
+        event.preventDefault();
+        loadMore();
+    });
+})();
@@ -0,0 +1,163 @@
+"""
+Dashboard statistics backed by the AppointmentStats counter table.
+
+Every change to an appointment's owner or status is turned into +1/-1
+deltas on two counter rows: the client's and the studio-wide one. The
+dashboard then reads one row instead of counting the appointments table.
+Archived appointments (archive.py) still count; moving a row there
+changes no counter.
+Switch the table off with APPOINTMENT_STATS_TABLE = False and the dashboard
+falls back to a single conditional aggregate.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from .models import Appointment, AppointmentStats, ArchivedAppointment
+
+STATUS_FIELDS = [status for status, _ in Appointment.STATUS_CHOICES]
+COUNTER_FIELDS = ['total'] + STATUS_FIELDS
+
+
+def stats_enabled():
+    return getattr(settings, 'APPOINTMENT_STATS_TABLE', False)
+
+
+def _scopes(user_id):
+    """Counter rows an appointment belongs to: studio-wide plus its owner"""
+    return [None, user_id] if user_id else [None]
+
+
+def _add(deltas, state, sign):
+    """Accumulate +/- one appointment in `state` = (user_id, status)"""
+    if state is None:
+        return
+    user_id, status = state
+    for scope in _scopes(user_id):
+        deltas[scope]['total'] += sign
+        if status in STATUS_FIELDS:
+            deltas[scope][status] += sign
+
+
+def count_appointments(user_id=None):
+    """Count straight from the appointment tables (the slow, always-right path)"""
+    totals = dict.fromkeys(COUNTER_FIELDS, 0)
+    for model in (Appointment, ArchivedAppointment):
+        queryset = model.objects.all()
+        if user_id:
+            queryset = queryset.filter(user_id=user_id)
+        for field, count in queryset.status_counts().items():
+            totals[field] += count
+    return totals
+
+
+def rebuild_stats(user_id=None):
+    """Recompute one counter row from scratch and store it"""
+    counts = count_appointments(user_id)
+    try:
+        with transaction.atomic():
+            AppointmentStats.objects.update_or_create(user_id=user_id, defaults=counts)
+    except IntegrityError:
+        # Another request created the row first; overwrite it with our counts
+        AppointmentStats.objects.filter(user_id=user_id).update(**counts)
+    return counts
+
+
+def rebuild_all_stats():
+    """
+    Recompute every counter row with one grouped aggregate per table and
+    replace the table in a single transaction. Returns the number of client rows.
+    """
+    counts = {
+        status: Count('pk', filter=Q(status=status))
+        for status in STATUS_FIELDS
+    }
+    per_user = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    for model in (Appointment, ArchivedAppointment):
+        grouped = (
+            model.objects.exclude(user=None).order_by()
+            .values('user_id').annotate(total=Count('pk'), **counts)
+        )
+        for row in grouped.iterator():
+            totals = per_user[row.pop('user_id')]
+            for field, count in row.items():
+                totals[field] += count
+    rows = [AppointmentStats(user_id=None, **count_appointments(None))]
+    rows.extend(AppointmentStats(user_id=user_id, **totals) for user_id, totals in per_user.items())
+    with transaction.atomic():
+        AppointmentStats.objects.all().delete()
+        AppointmentStats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows) - 1
+
+
+def apply_deltas(deltas, rebuild_missing=True):
+    """
+    Apply {scope: {field: delta}} with F() expressions so concurrent
+    requests cannot lose updates. A missing row is rebuilt from the table,
+    which already reflects the change, unless `rebuild_missing` is off.
+    """
+    for user_id, fields in deltas.items():
+        updates = {field: F(field) + delta for field, delta in fields.items() if delta}
+        if not updates:
+            continue
+        updated = AppointmentStats.objects.filter(user_id=user_id).update(**updates)
+        if not updated and rebuild_missing:
+            rebuild_stats(user_id)
+
+
+def record_change(old_state, new_state, rebuild_missing=True):
+    """Move one appointment from `old_state` to `new_state` (either may be None)"""
+    if old_state == new_state:
+        return
+    deltas = defaultdict(lambda: defaultdict(int))
+    _add(deltas, old_state, -1)
+    _add(deltas, new_state, +1)
+    apply_deltas(deltas, rebuild_missing)
+
+
+def apply_bulk_update(groups, changes):
+    """
+    Patch the counters after AppointmentQuerySet.update().
+
+    `groups` holds the (user_id, status, count) rows captured before the
+    update ran and `changes` the keyword arguments it was called with.
+    """
+    new_status = changes.get('status')
+    new_user = changes.get('user_id', changes.get('user'))
+    new_user_id = getattr(new_user, 'pk', new_user)
+
+    # F() and other expressions cannot be resolved here; recount instead
+    if hasattr(new_status, 'resolve_expression') or hasattr(new_user_id, 'resolve_expression'):
+        for scope in {None} | {group['user_id'] for group in groups}:
+            rebuild_stats(scope)
+        return
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for group in groups:
+        old_state = (group['user_id'], group['status'])
+        new_state = (
+            new_user_id if {'user', 'user_id'} & changes.keys() else group['user_id'],
+            new_status if 'status' in changes else group['status'],
+        )
+        if old_state == new_state:
+            continue
+        _add(deltas, old_state, -group['count'])
+        _add(deltas, new_state, +group['count'])
+    apply_deltas(deltas)
+
+
+def get_dashboard_stats(user=None):
+    """
+    Total and per-status counts for one client, or studio-wide when `user`
+    is None. Reads a single counter row when the stats table is enabled.
+    """
+    user_id = user.pk if user is not None else None
+    if not stats_enabled():
+        return count_appointments(user_id)
+
+    row = AppointmentStats.objects.filter(user_id=user_id).values(*COUNTER_FIELDS).first()
+    if row is None:
+        return rebuild_stats(user_id)
+    return row
@@ -0,0 +1,27 @@
+"""
+Background tasks for `manage.py run_workers` (see jobs.py).
+
+Priorities: client-visible work first (emails 20, renditions of a fresh
+upload 10); bulk backfills queue renditions below zero so they never
+hold up new uploads.
+"""
+from . import outbox
+from .images import delete_renditions, generate_renditions
+from .jobs import task
+from .models import Appointment
+
+
+@task('appointments.render_reference_image', priority=10, timeout=120)
+def render_reference_image(appointment_id, name, replaced_name='', replaced_widths=()):
+    """Renditions of an uploaded reference image; removes those of the image it replaced"""
+    if replaced_name and replaced_widths:
+        delete_renditions(replaced_name, replaced_widths)
+    widths = generate_renditions(name) if name else []
+    # The client may have uploaded yet another image meanwhile; its own job handles it
+    Appointment.objects.filter(pk=appointment_id, reference_image=name).update(reference_image_renditions=widths)
+
+
+@task('appointments.send_notifications', priority=20)
+def send_notifications():
+    """Drain the email outbox (the same work as `manage.py send_notifications --once`)"""
+    outbox.drain()
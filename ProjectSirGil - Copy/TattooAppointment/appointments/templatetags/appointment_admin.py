@@ -0,0 +1,152 @@
+"""
+Admin changelist tags for the large appointment tables.
+
+Django's date_hierarchy runs SELECT DISTINCT over a date truncation of
+every matching row, on each changelist view. cached_date_hierarchy finds
+the same years, months or days with one index seek per bucket ("first
+row on or after the next bucket") and caches them for
+ADMIN_DATE_HIERARCHY_TIMEOUT seconds per filter and search combination.
+A new year or month can take that long to appear in the drilldown.
+"""
+import datetime
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+from django.contrib.admin.utils import get_fields_from_path
+from django.contrib.admin.views.main import ORDER_VAR
+from django.core.cache import cache
+from django.db import models
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+LEVELS = ('year', 'month', 'day')
+
+
+def _bucket(day, kind):
+    if kind == 'year':
+        return day.replace(month=1, day=1)
+    if kind == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(day, kind):
+    if kind == 'year':
+        return datetime.date(day.year + 1, 1, 1)
+    if kind == 'month':
+        return datetime.date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return day + datetime.timedelta(days=1)
+
+
+def date_buckets(queryset, field_name, kind):
+    """
+    Distinct years, months or days (as dates, in the current time zone) of
+    `field_name` in `queryset`, one indexed lookup per bucket found.
+    """
+    is_datetime = isinstance(queryset.model._meta.get_field(field_name), models.DateTimeField)
+    ordered = queryset.order_by(field_name).values_list(field_name, flat=True)
+    buckets = []
+    value = ordered.first()
+    while value is not None:
+        if is_datetime:
+            value = (timezone.localtime(value) if timezone.is_aware(value) else value).date()
+        bucket = _bucket(value, kind)
+        buckets.append(bucket)
+        start = _next_bucket(bucket, kind)
+        if is_datetime:
+            start = datetime.datetime.combine(start, datetime.time.min)
+            if settings.USE_TZ:
+                start = timezone.make_aware(start)
+        value = ordered.filter(**{f'{field_name}__gte': start}).first()
+    return buckets
+
+
+def _cached_buckets(cl, field_name, kind, lookups):
+    # Everything that narrows the list except ordering; the date lookups are part of `lookups`
+    generic = f'{field_name}__'
+    params = sorted((k, str(v)) for k, v in cl.params.items() if k != ORDER_VAR and not k.startswith(generic))
+    digest = hashlib.md5(repr([params, lookups]).encode(), usedforsecurity=False).hexdigest()
+    key = f'admin:date_hierarchy:{cl.opts.label_lower}:{field_name}:{kind}:{timezone.get_current_timezone_name()}:{digest}'
+    buckets = cache.get(key)
+    if buckets is None:
+        buckets = date_buckets(cl.queryset, field_name, kind)
+        cache.set(key, buckets, getattr(settings, 'ADMIN_DATE_HIERARCHY_TIMEOUT', 300))
+    return buckets
+
+
+def cached_date_hierarchy(cl):
+    """date_hierarchy with the drilldown choices cached; same template and links"""
+    if not cl.date_hierarchy:
+        return None
+    field_name = cl.date_hierarchy
+    if '__' in field_name or not isinstance(get_fields_from_path(cl.model, field_name)[-1], models.DateField):
+        return date_hierarchy(cl)
+
+    year_field, month_field, day_field = (f'{field_name}__{level}' for level in LEVELS)
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+    if year_lookup and month_lookup and day_lookup:
+        # The last level shows no choices, so there is nothing to look up
+        return date_hierarchy(cl)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    lookups = [year_lookup, month_lookup]
+    if not (year_lookup or month_lookup):
+        # Start one level down while everything falls in a single year or month
+        years = _cached_buckets(cl, field_name, 'year', lookups)
+        if len(years) != 1:
+            return {
+                'show': True,
+                'back': None,
+                'choices': [{'link': link({year_field: str(year.year)}), 'title': str(year.year)} for year in years],
+            }
+        year_lookup = years[0].year
+        months = _cached_buckets(cl, field_name, 'month', lookups)
+        if len(months) == 1:
+            month_lookup = months[0].month
+
+    if year_lookup and month_lookup:
+        days = _cached_buckets(cl, field_name, 'day', [year_lookup, month_lookup])
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year_lookup}), 'title': str(year_lookup)},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: month_lookup, day_field: day.day}),
+                    'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT')),
+                }
+                for day in days
+            ],
+        }
+    months = _cached_buckets(cl, field_name, 'month', [year_lookup, month_lookup])
+    return {
+        'show': True,
+        'back': {'link': link({}), 'title': _('All dates')},
+        'choices': [
+            {
+                'link': link({year_field: year_lookup, month_field: month.month}),
+                'title': capfirst(formats.date_format(month, 'YEAR_MONTH_FORMAT')),
+            }
+            for month in months
+        ],
+    }
+
+
+@register.tag(name='cached_date_hierarchy')
+def cached_date_hierarchy_tag(parser, token):
+    return InclusionAdminNode(
+        parser,
+        token,
+        func=cached_date_hierarchy,
+        template_name='date_hierarchy.html',
+        takes_context=False,
+    )
@@ -0,0 +1,40 @@
+from django import template
+from django.utils.html import format_html
+
+from appointments.images import rendition_formats, rendition_url
+
+register = template.Library()
+
+DEFAULT_SIZES = '(max-width: 600px) 100vw, 600px'
+
+
+@register.simple_tag
+def responsive_image(image, widths, alt='', sizes=DEFAULT_SIZES, css_class='', style=''):
+    """
+    Lazy-loaded <picture> with WebP and JPEG srcsets for an uploaded image.
+
+    Usage: {% responsive_image appointment.reference_image appointment.reference_image_renditions alt="Reference" %}
+
+    Falls back to a plain lazy <img> of the original until renditions exist.
+    """
+    if not image:
+        return ''
+    if not widths:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" loading="lazy" decoding="async">',
+            image.url, alt, css_class, style,
+        )
+
+    sources = {
+        ext: ', '.join(f'{rendition_url(image.name, width, ext)} {width}w' for width in widths)
+        for ext, _, _ in rendition_formats()
+    }
+    fallback = rendition_url(image.name, widths[min(1, len(widths) - 1)], 'jpg')
+    webp = format_html(
+        '<source type="image/webp" srcset="{}" sizes="{}">', sources['webp'], sizes
+    ) if 'webp' in sources else ''
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" style="{}" '
+        'loading="lazy" decoding="async"></picture>',
+        webp, fallback, sources['jpg'], sizes, alt, css_class, style,
+    )
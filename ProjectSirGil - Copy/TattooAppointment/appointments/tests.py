@@ -1,3 +1,1885 @@
-from django.test import TestCase
+import csv
+import email
+import gzip
+import importlib
+import json
+import logging
+import os
+import re
+import socketserver
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest.mock import patch
 
-# Create your tests here.
+import numpy as np
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.base import BaseHandler
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.template.loader import render_to_string
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from TattooAppointment.db_profiles import BUSY_TIMEOUT_MS, sqlite_database
+from TattooAppointment.static_assets import accepted_encodings, hashed_names, serve_static
+
+from . import (
+    admin, caching, exports, images, jobs, metrics, outbox, ratelimit, reminders, reports, request_logging, scheduling, seeding,
+    tasks, urls,
+)
+from .archive import appointment_history
+from .benchmarking import SKIPPED_ROUTES, compare, discover_routes
+from .search import fts_enabled, search
+from .forms import AppointmentForm
+from .middleware import ConcurrencyLimitMiddleware, RequestLoggingMiddleware
+from .pagination import EstimatedCountPaginator, refresh_row_estimates
+from .models import (
+    Appointment, AppointmentStats, ArchivedAppointment, TattooStyle, Artist, Studio, Review, Enquiry, OutboxMessage,
+    Job, CacheVersion,
+)
+from .stats import count_appointments, get_dashboard_stats
+from .templatetags import appointment_admin, appointment_images
+
+
+# ============================================
+# QUERY PLAN REGRESSION TESTS
+# ============================================
+
+# "SCAN <table>" with nothing after it means SQLite reads every row.
+# Index scans show up as "SCAN <table> USING [COVERING] INDEX ..." instead.
+FULL_SCAN = re.compile(r'^SCAN (appointments_\w+)$')
+
+
+class QueryPlanTests(TestCase):
+    """Fail if any hot query of a view falls back to a full table scan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('staff', 'staff@example.com', 'pass')
+        cls.client_user = User.objects.create_user('client', 'client@example.com', 'pass')
+        now = timezone.now()
+        statuses = ['pending', 'approved', 'rejected']
+
+        Appointment.objects.bulk_create([
+            Appointment(
+                client_name=f'Client {i}',
+                email='client@example.com',
+                phone='555-0100',
+                tattoo_design='Rose on forearm',
+                appointment_date=now + timedelta(days=i - 100),
+                status=statuses[i % 3],
+                user=cls.client_user if i % 2 else None,
+            )
+            for i in range(200)
+        ])
+        Enquiry.objects.bulk_create([
+            Enquiry(name=f'Lead {i}', email='lead@example.com', phone='555-0101', message='Sleeve idea',
+                    is_contacted=bool(i % 2))
+            for i in range(50)
+        ])
+        Review.objects.bulk_create([
+            Review(client_name=f'Reviewer {i}', review_text='Great work', is_approved=bool(i % 2),
+                   is_featured=not i % 3)
+            for i in range(50)
+        ])
+        TattooStyle.objects.bulk_create([
+            TattooStyle(name=f'Style {i}', description='...', is_active=bool(i % 2)) for i in range(20)
+        ])
+        Artist.objects.bulk_create([Artist(name=f'Artist {i}', is_active=bool(i % 2)) for i in range(20)])
+        Studio.objects.bulk_create([
+            Studio(name=f'Studio {i}', city='Manila', country='PH', address='...', is_active=bool(i % 2))
+            for i in range(20)
+        ])
+
+    def full_scans(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            details = [row[3] for row in cursor.fetchall()]
+        return [detail for detail in details if FULL_SCAN.match(detail)]
+
+    def assertQuerysetUsesIndexes(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        self.assertEqual(self.full_scans(sql, params), [], sql)
+
+    def assertViewUsesIndexes(self, url, user=None):
+        if user is not None:
+            self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+        checked = 0
+        for query in ctx.captured_queries:
+            if 'appointments_' not in query['sql']:
+                continue
+            checked += 1
+            self.assertEqual(self.full_scans(query['sql']), [], f"{url}: {query['sql']}")
+        self.assertGreater(checked, 0, f'{url} issued no appointment queries')
+
+    def test_landing_page(self):
+        # landing.html does not render every list, so check the querysets directly too
+        self.assertQuerysetUsesIndexes(TattooStyle.objects.filter(is_active=True)[:4])
+        self.assertQuerysetUsesIndexes(Artist.objects.filter(is_active=True)[:8])
+        self.assertQuerysetUsesIndexes(Studio.objects.filter(is_active=True)[:2])
+        self.assertQuerysetUsesIndexes(Review.objects.filter(is_approved=True, is_featured=True)[:4])
+        self.assertViewUsesIndexes(reverse('appointments:landing'))
+
+    def test_client_dashboard_and_history(self):
+        for name in ['appointments:index', 'appointments:list-fbv', 'appointments:list-cbv']:
+            self.assertViewUsesIndexes(reverse(name), self.client_user)
+
+    def test_staff_dashboard_and_history(self):
+        for name in ['appointments:index', 'appointments:list-fbv', 'appointments:list-cbv']:
+            self.assertViewUsesIndexes(reverse(name), self.staff)
+
+    def test_staff_queue(self):
+        url = reverse('appointments:manage')
+        self.assertViewUsesIndexes(url, self.staff)
+        self.assertViewUsesIndexes(f'{url}?status=approved', self.staff)
+        self.assertViewUsesIndexes(f'{url}?date_from=2020-01-01&date_to=2030-01-01', self.staff)
+
+        first_page = self.client.get(url).context['page']
+        self.assertViewUsesIndexes(
+            f"{reverse('appointments:manage-more')}?cursor={first_page.next_cursor}", self.staff
+        )
+
+    def test_admin_changelists(self):
+        # Artists, studios and styles are a handful of rows each; only the
+        # tables that grow with bookings are checked here.
+        for model in ['appointment', 'enquiry', 'review']:
+            self.assertViewUsesIndexes(reverse(f'admin:appointments_{model}_changelist'), self.staff)
+        self.assertViewUsesIndexes(
+            reverse('admin:appointments_appointment_changelist') + '?status__exact=pending', self.staff
+        )
+        self.assertViewUsesIndexes(
+            reverse('admin:appointments_enquiry_changelist') + '?is_contacted__exact=0', self.staff
+        )
+
+
+# ============================================
+# DASHBOARD COUNTER TABLE
+# ============================================
+
+class AppointmentStatsTests(TestCase):
+    """AppointmentStats must always agree with counting the table"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='pass')
+        self.bob = User.objects.create_user('bob', password='pass')
+
+    def book(self, user, status='pending'):
+        return Appointment.objects.create(
+            client_name=user.username if user else 'Walk-in',
+            email='client@example.com',
+            phone='555-0100',
+            tattoo_design='Koi',
+            appointment_date=timezone.now() + timedelta(days=7),
+            status=status,
+            user=user,
+        )
+
+    def assertCountersMatchTable(self):
+        for user in [None, self.alice, self.bob]:
+            row = AppointmentStats.objects.filter(user=user).values(
+                'total', 'pending', 'approved', 'rejected'
+            ).first()
+            self.assertEqual(row, count_appointments(user.pk if user else None), user)
+
+    def test_counters_follow_saves_updates_and_deletes(self):
+        first = self.book(self.alice)
+        self.book(self.alice, 'approved')
+        self.book(self.bob)
+        self.book(None, 'rejected')
+        self.assertCountersMatchTable()
+
+        first.status = 'rejected'
+        first.save()
+        self.assertCountersMatchTable()
+
+        # Same path as the admin bulk actions
+        Appointment.objects.filter(status='pending').update(status='approved')
+        self.assertCountersMatchTable()
+
+        Appointment.objects.filter(user=self.bob).update(user=self.alice)
+        self.assertCountersMatchTable()
+
+        first.delete()
+        Appointment.objects.filter(status='rejected').delete()
+        self.assertCountersMatchTable()
+
+    def test_missing_rows_are_rebuilt_on_read(self):
+        self.book(self.alice)
+        AppointmentStats.objects.all().delete()
+        self.assertEqual(get_dashboard_stats(self.alice)['pending'], 1)
+        self.assertEqual(get_dashboard_stats()['total'], 1)
+
+    def test_dashboard_reads_counters_in_one_query(self):
+        self.book(self.alice)
+        self.client.force_login(self.alice)
+        self.client.get(reverse('appointments:index'))
+        # session + user + newest updated_at + stats row + next session (the
+        # last three build the ETag) + upcoming + recent
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('appointments:index'))
+        self.assertEqual(response.context['stats']['pending'], 1)
+
+
+# ============================================
+# ARTIST SCHEDULES
+# ============================================
+
+class SchedulingTests(TestCase):
+    """The in-memory artist schedules must agree with the table"""
+
+    def setUp(self):
+        scheduling.invalidate()
+        self.artist = Artist.objects.create(name='Mika')
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        self.noon = timezone.make_aware(timezone.datetime.combine(tomorrow, timezone.datetime.min.time())) \
+            + timedelta(hours=12)
+
+    def tearDown(self):
+        scheduling.invalidate()
+
+    def book(self, start, minutes=60, status='pending'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Appointment.objects.create(
+                client_name='Client',
+                email='client@example.com',
+                phone='555-0100',
+                tattoo_design='Koi',
+                appointment_date=start,
+                duration_minutes=minutes,
+                artist=self.artist,
+                status=status,
+            )
+
+    def assertScheduleMatchesTable(self):
+        cached = sorted(scheduling.get_schedule(self.artist.pk).bookings)
+        scheduling.invalidate([self.artist.pk])
+        self.assertEqual(cached, sorted(scheduling.get_schedule(self.artist.pk).bookings))
+
+    def test_schedule_follows_saves_and_deletes(self):
+        first = self.book(self.noon)
+        scheduling.get_schedule(self.artist.pk)
+        second = self.book(self.noon + timedelta(hours=2), minutes=120)
+        self.assertScheduleMatchesTable()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.appointment_date += timedelta(hours=5)
+            first.save()
+        self.assertScheduleMatchesTable()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.filter(pk=second.pk).update(status='rejected')
+            first.delete()
+        self.assertEqual(len(scheduling.get_schedule(self.artist.pk)), 0)
+
+    def test_free_slots_skip_bookings_and_closed_hours(self):
+        self.book(self.noon, minutes=90)
+        schedule = scheduling.get_schedule(self.artist.pk)
+        slots = schedule.free_slots(self.noon - timedelta(hours=1), self.noon + timedelta(days=2),
+                                    timedelta(hours=1), limit=30)
+
+        self.assertEqual(slots[0][0], self.noon - timedelta(hours=1))
+        self.assertEqual(slots[1][0], self.noon + timedelta(minutes=90))
+        for start, end in slots:
+            self.assertTrue(schedule.is_free(start, end))
+            self.assertGreaterEqual(timezone.localtime(start).hour, 10)
+            self.assertLessEqual(timezone.localtime(end).hour * 60 + timezone.localtime(end).minute, 20 * 60)
+
+    def test_booking_form_rejects_overlaps(self):
+        self.book(self.noon)
+        data = {
+            'client_name': 'Other',
+            'email': 'other@example.com',
+            'phone': '555-0101',
+            'tattoo_design': 'Rose',
+            'artist': self.artist.pk,
+            'appointment_date': timezone.localtime(self.noon + timedelta(minutes=30)).strftime('%Y-%m-%dT%H:%M'),
+            'duration_minutes': 60,
+        }
+        form = AppointmentForm(data)
+        self.assertFalse(form.is_valid())
+        self.assertIn('Next free slot', form.errors['appointment_date'][0])
+
+        data['appointment_date'] = timezone.localtime(self.noon + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M')
+        self.assertTrue(AppointmentForm(data).is_valid(), AppointmentForm(data).errors)
+
+    def booking_data(self, start, **extra):
+        return {
+            'client_name': 'Other',
+            'email': 'other@example.com',
+            'phone': '555-0101',
+            'tattoo_design': 'Rose',
+            'artist': self.artist.pk,
+            'appointment_date': timezone.localtime(start).strftime('%Y-%m-%dT%H:%M'),
+            'duration_minutes': 60,
+            **extra,
+        }
+
+    def test_booking_is_confirmed_against_the_table(self):
+        scheduling.get_schedule(self.artist.pk)
+        # Booked by another process: this process's index has not seen it
+        Appointment.objects.create(
+            client_name='Client', email='client@example.com', phone='555-0100', tattoo_design='Koi',
+            appointment_date=self.noon, duration_minutes=120, artist=self.artist,
+        )
+        form = AppointmentForm(self.booking_data(self.noon + timedelta(hours=1)))
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertIsNone(form.book(status='pending'))
+        self.assertIn('already booked', form.errors['appointment_date'][0])
+        self.assertEqual(Appointment.objects.count(), 1)
+
+        form = AppointmentForm(self.booking_data(self.noon + timedelta(hours=2)))
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.book(status='pending').appointment_date, self.noon + timedelta(hours=2))
+
+        # The API books through the same form
+        self.client.force_login(User.objects.create_user('ana', password='pass'))
+        response = self.client.post(
+            reverse('appointments:api-appointments'),
+            json.dumps(self.booking_data(self.noon - timedelta(minutes=30))), content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('appointment_date', response.json()['errors'])
+
+    def test_sessions_are_capped(self):
+        form = AppointmentForm(self.booking_data(self.noon, duration_minutes=601))
+        self.assertFalse(form.is_valid())
+        self.assertIn('duration_minutes', form.errors)
+
+    def test_free_slots_rejects_malformed_queries(self):
+        self.client.force_login(User.objects.create_user('ana', password='pass'))
+        url = reverse('appointments:slots')
+        for query in (
+            {'artist': 'abc'},
+            {'artist': self.artist.pk, 'start': '2026-02-30T10:00'},
+            {'artist': self.artist.pk, 'duration': '9' * 400},
+            {'artist': self.artist.pk, 'limit': 'ten'},
+            {},
+        ):
+            with self.subTest(query=query):
+                response = self.client.get(url, query)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('errors', response.json())
+        self.assertEqual(self.client.get(url, {'artist': self.artist.pk + 1}).status_code, 404)
+
+        response = self.client.get(url, {
+            'artist': self.artist.pk, 'start': timezone.localtime(self.noon).strftime('%Y-%m-%dT%H:%M'),
+            'duration': 90, 'limit': 500,
+        })
+        slots = response.json()['slots']
+        self.assertEqual(len(slots), 50)
+        self.assertEqual(slots[0]['value'], timezone.localtime(self.noon).strftime('%Y-%m-%dT%H:%M'))
+
+
+# ============================================
+# FULL-TEXT SEARCH
+# ============================================
+
+class FullTextSearchTests(TestCase):
+    """FTS5 search stays in sync with the tables and degrades to LIKE"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='pass', is_staff=True, is_superuser=True)
+        cls.client_user = User.objects.create_user('client', password='pass')
+        designs = [
+            ('Ana', 'Koi fish sleeve with waves', cls.client_user),
+            ('Ben', 'Small koi on the ankle', None),
+            ('Cleo', 'Rose and dagger <script>', cls.client_user),
+        ]
+        for name, design, user in designs:
+            Appointment.objects.create(
+                client_name=name,
+                email=f'{name.lower()}@example.com',
+                phone='555-0100',
+                tattoo_design=design,
+                appointment_date=timezone.now() + timedelta(days=3),
+                user=user,
+            )
+        Enquiry.objects.create(name='Dora', email='dora@example.com', phone='555-0101', message='Koi cover-up')
+
+    def test_index_follows_inserts_updates_and_bulk_updates(self):
+        self.assertTrue(fts_enabled(Appointment.objects.all()))
+        self.assertEqual(len(search(Appointment.objects.all(), 'koi')), 2)
+
+        Appointment.objects.filter(client_name='Cleo').update(tattoo_design='Koi and lotus')
+        Appointment.objects.filter(client_name='Ben').delete()
+        hits = search(Appointment.objects.all(), 'ko')
+        self.assertEqual({hit.object.client_name for hit in hits}, {'Ana', 'Cleo'})
+        self.assertIn('<mark>Koi</mark>', hits[0].snippet)
+
+    def test_results_are_scoped_and_escaped(self):
+        hits = search(Appointment.objects.filter(user=self.client_user), 'koi')
+        self.assertEqual([hit.object.client_name for hit in hits], ['Ana'])
+
+        hits = search(Appointment.objects.all(), 'dagger')
+        self.assertIn('&lt;script&gt;', hits[0].snippet)
+
+    @override_settings(FULL_TEXT_SEARCH=False)
+    def test_like_fallback_finds_the_same_rows(self):
+        self.assertFalse(fts_enabled(Appointment.objects.all()))
+        hits = search(Appointment.objects.all(), 'KOI')
+        self.assertEqual({hit.object.client_name for hit in hits}, {'Ana', 'Ben'})
+        self.assertIn('<mark>koi</mark>', hits[0].snippet.lower())
+
+    def test_search_page_and_admin(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('appointments:search'), {'q': 'koi'})
+        self.assertContains(response, 'Ana')
+        self.assertContains(response, 'Dora')
+
+        response = self.client.get(reverse('admin:appointments_appointment_changelist'), {'q': 'rose'})
+        self.assertContains(response, 'Cleo')
+        self.assertNotContains(response, 'ana@example.com')
+
+
+# ============================================
+# BENCHMARK HARNESS
+# ============================================
+
+class BenchmarkHarnessTests(TestCase):
+    """The benchmark seeds every model and reaches every route"""
+
+    def test_seed_covers_every_route(self):
+        counts = seeding.seed(40)
+        self.assertEqual(Appointment.objects.count(), 40)
+        self.assertEqual(Enquiry.objects.count(), 40)
+
+        context = {
+            'appointment': Appointment.objects.filter(user_id=counts['client']).values_list('pk', flat=True)[0],
+            'artist': Artist.objects.values_list('pk', flat=True)[0],
+        }
+        names = {route.name for route in discover_routes(context)}
+        for pattern in urls.urlpatterns:
+            if pattern.name not in SKIPPED_ROUTES:
+                self.assertIn(f'appointments:{pattern.name}', names)
+        self.assertIn('admin:appointments_appointment_changelist', names)
+
+    def test_compare_flags_slower_routes_and_extra_queries(self):
+        base = {'datasets': {'10000': {'routes': {'index [staff]': {'p95_ms': 10.0, 'queries': 5, 'errors': 0}}}}}
+        same = {'datasets': {'10000': {'routes': {'index [staff]': {'p95_ms': 11.0, 'queries': 5, 'errors': 0}}}}}
+        worse = {'datasets': {'10000': {'routes': {'index [staff]': {'p95_ms': 30.0, 'queries': 7, 'errors': 0}}}}}
+        self.assertEqual(compare(same, base), [])
+        self.assertEqual(len(compare(worse, base)), 2)
+
+
+# ============================================
+# BULK IMPORT
+# ============================================
+
+class ImportTests(TestCase):
+    """Imports validate every row with the site forms and checkpoint progress"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='pass12345')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name) / 'appointments.csv'
+        when = (timezone.now() + timedelta(days=10)).strftime('%Y-%m-%d %H:%M')
+        self.path.write_text(
+            'Client Name,Email,Phone,Tattoo Design,Appointment Date,Status,User\n'
+            f'Ana,ana@example.com,555-0101,Koi sleeve,{when},Approved,importer\n'
+            f'Ben,not-an-email,555-0102,Rose,{when},pending,\n'
+            f'Cleo,cleo@example.com,555-0103,Dagger,{when},pending,\n'
+        )
+
+    def test_import_rejects_invalid_rows_and_checkpoints(self):
+        rejects = Path(self.directory.name) / 'rejects.jsonl'
+        call_command(
+            'import_appointments', str(self.path), '--workers', '0', '--chunk-size', '2',
+            '--rejects', str(rejects), stdout=StringIO(),
+        )
+        self.assertEqual(
+            sorted(Appointment.objects.values_list('client_name', 'status')),
+            [('Ana', 'approved'), ('Cleo', 'pending')],
+        )
+        self.assertEqual(Appointment.objects.get(client_name='Ana').user, self.user)
+        # Decided rows get the decision stamp the pre_save handler would have set
+        ana, cleo = Appointment.objects.order_by('client_name')
+        self.assertEqual(ana.approved_at, ana.created_at)
+        self.assertEqual((ana.rejected_at, cleo.approved_at, cleo.rejected_at), (None, None, None))
+        self.assertEqual(AppointmentStats.objects.get(user=self.user).approved, 1)
+        self.assertIn('email', json.loads(rejects.read_text())['errors'])
+
+        checkpoint = json.loads(Path(f'{self.path}.checkpoint.json').read_text())
+        self.assertEqual((checkpoint['line'], checkpoint['imported'], checkpoint['rejected']), (4, 2, 1))
+
+        # Nothing left after the checkpoint, so resuming adds nothing
+        call_command('import_appointments', str(self.path), '--workers', '0', '--resume', stdout=StringIO())
+        self.assertEqual(Appointment.objects.count(), 2)
+
+    def test_imported_rows_are_searchable(self):
+        if not fts_enabled(Appointment.objects.all()):
+            self.skipTest('SQLite FTS5 not available')
+        call_command('import_appointments', str(self.path), '--workers', '0', stdout=StringIO())
+        self.assertEqual([hit.object.client_name for hit in search(Appointment.objects.all(), 'koi')], ['Ana'])
+
+
+# ============================================
+# STATIC ASSETS
+# ============================================
+
+class StaticAssetTests(TestCase):
+    """Page CSS ships as hashed, precompressed files instead of inline styles"""
+
+    def test_accept_encoding_weights(self):
+        self.assertEqual(
+            accepted_encodings('br;q=0, gzip; Q=0.8 ,*;q=0.1, deflate;q=oops, '),
+            {'br': 0.0, 'gzip': 0.8, '*': 0.1, 'deflate': 0.0},
+        )
+
+    def test_pages_link_stylesheets_instead_of_inlining(self):
+        response = self.client.get(reverse('appointments:login'))
+        self.assertNotContains(response, '<style>')
+        self.assertContains(response, 'appointments/css/login.css')
+
+    def test_collectstatic_hashes_compresses_and_serves_immutable(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            STATIC_ROOT=root,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'TattooAppointment.static_assets.CompressedManifestStaticFilesStorage'},
+            },
+        ):
+            call_command('collectstatic', '--noinput', verbosity=0)
+            hashed_names.cache_clear()
+            self.addCleanup(hashed_names.cache_clear)
+            manifest = json.loads((Path(root) / 'staticfiles.json').read_text())['paths']
+            hashed = manifest['appointments/css/landing.css']
+            self.assertTrue((Path(root) / f'{hashed}.gz').exists())
+
+            request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+            response = serve_static(request, hashed)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn('Accept-Encoding', response['Vary'])
+            response.close()
+
+            # q=0 refuses a coding, also when a wildcard would allow it
+            for header in ('gzip;q=0, deflate', 'gzip; q=0.0, br;q=0, *', 'identity'):
+                with self.subTest(header=header):
+                    response = serve_static(RequestFactory().get('/', HTTP_ACCEPT_ENCODING=header), hashed)
+                    self.assertFalse(response.has_header('Content-Encoding'))
+                    response.close()
+            response = serve_static(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='br;q=0, *;q=0.5'), hashed)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            response.close()
+
+            # Unhashed names may change in place, so they get a short lifetime
+            response = serve_static(RequestFactory().get('/'), 'css/main.css')
+            self.assertNotIn('immutable', response['Cache-Control'])
+            self.assertFalse(response.has_header('Content-Encoding'))
+            response.close()
+
+
+# ============================================
+# CARD FRAGMENT CACHE
+# ============================================
+
+class CardFragmentCacheTests(TestCase):
+    """Cached cards are keyed on updated_at, so edits show up immediately"""
+
+    def setUp(self):
+        caches['template_fragments'].clear()
+        self.staff = User.objects.create_user(username='staff', password='pass12345', is_staff=True)
+        self.appointment = Appointment.objects.create(
+            client_name='Ana', email='ana@example.com', phone='555-0101',
+            tattoo_design='Koi sleeve', appointment_date=timezone.now() + timedelta(days=3),
+        )
+
+    def test_bulk_update_refreshes_cached_card(self):
+        self.client.force_login(self.staff)
+        self.assertContains(self.client.get(reverse('appointments:list-fbv')), 'Pending Review')
+        self.assertContains(self.client.get(reverse('appointments:list-cbv')), 'Pending Review')
+
+        before = self.appointment.updated_at
+        Appointment.objects.filter(pk=self.appointment.pk).update(status='approved')
+        self.appointment.refresh_from_db()
+        self.assertGreater(self.appointment.updated_at, before)
+
+        response = self.client.get(reverse('appointments:list-fbv'))
+        self.assertContains(response, '✅ Approved')
+        self.assertNotContains(response, 'Pending Review')
+
+    def test_manage_cards_keep_per_visitor_csrf_tokens(self):
+        self.client.force_login(self.staff)
+        first = self.client.get(reverse('appointments:manage')).content.decode()
+        other = self.client_class()
+        other.force_login(User.objects.create_user(username='staff2', password='pass12345', is_staff=True))
+        second = other.get(reverse('appointments:manage')).content.decode()
+        token = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+        self.assertNotEqual(token.findall(first)[0], token.findall(second)[0])
+
+    def test_atomic_card_renders_its_components(self):
+        html = render_to_string('organisms/appointment-card.html', {'appointment': self.appointment})
+        self.assertIn('Pending Review', html)
+        self.assertIn('ana@example.com', html)
+
+
+# ============================================
+# CONDITIONAL GET
+# ============================================
+
+class ConditionalGetTests(TestCase):
+    """Unchanged pages answer 304 before running the view"""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='pass12345', is_staff=True)
+        self.appointment = Appointment.objects.create(
+            client_name='Ana', email='ana@example.com', phone='555-0101',
+            tattoo_design='Koi sleeve', appointment_date=timezone.now() + timedelta(days=3),
+        )
+        self.client.force_login(self.staff)
+        # The landing fragment cached here would hide queries from other tests
+        self.addCleanup(cache.clear)
+
+    def revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('private', first['Cache-Control'])
+        return self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_lists_answer_304_until_appointments_change(self):
+        for name in ('appointments:list-fbv', 'appointments:list-cbv'):
+            url = reverse(name)
+            self.assertEqual(self.revalidate(url).status_code, 304)
+            self.assertTrue(self.client.get(url).has_header('Last-Modified'))
+
+        etag = self.client.get(reverse('appointments:list-fbv'))['ETag']
+        Appointment.objects.filter(pk=self.appointment.pk).update(status='approved')
+        response = self.client.get(reverse('appointments:list-fbv'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # MAX(updated_at) cannot see a deletion; the row count can
+        etag = response['ETag']
+        Appointment.objects.create(
+            client_name='Ben', email='ben@example.com', phone='555-0102',
+            tattoo_design='Rose', appointment_date=timezone.now() + timedelta(days=4),
+        ).delete()
+        Appointment.objects.get(pk=self.appointment.pk).delete()
+        response = self.client.get(reverse('appointments:list-fbv'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_and_landing_answer_304(self):
+        self.assertEqual(self.revalidate(reverse('appointments:index')).status_code, 304)
+        self.client.logout()
+        self.assertEqual(self.revalidate(reverse('appointments:landing')).status_code, 304)
+
+    def test_pending_messages_disable_revalidation(self):
+        self.client.get(reverse('appointments:list-fbv'))
+        etag = self.client.get(reverse('appointments:list-fbv'))['ETag']
+        self.client.post(reverse('appointments:enquiry_submit'), {})  # queues an error message
+        response = self.client.get(reverse('appointments:landing'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+# ============================================
+# JSON API
+# ============================================
+
+class ApiTests(TestCase):
+    """The v1 JSON API applies the same owner / staff rules as the pages"""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='pass12345', is_staff=True)
+        self.ana = User.objects.create_user(username='ana', password='pass12345')
+        self.ben = User.objects.create_user(username='ben', password='pass12345')
+        start = timezone.now() + timedelta(days=3)
+        self.appointments = [
+            Appointment.objects.create(
+                client_name=f'Client {i}', email='client@example.com', phone='555-0101',
+                tattoo_design='Koi sleeve', appointment_date=start + timedelta(days=i),
+                user=self.ana if i < 3 else self.ben,
+            )
+            for i in range(5)
+        ]
+
+    def patch(self, url, data):
+        return self.client.patch(url, json.dumps(data), content_type='application/json')
+
+    def test_lists_are_scoped_paginated_and_projected(self):
+        self.assertEqual(self.client.get(reverse('appointments:api-appointments')).status_code, 401)
+
+        self.client.force_login(self.ana)
+        url = reverse('appointments:api-appointments')
+        with self.assertNumQueries(3):  # session, user, page
+            first = self.client.get(url, {'limit': 2, 'fields': 'client_name,status'}).json()
+        self.assertEqual([set(row) for row in first['results']], [{'id', 'client_name', 'status'}] * 2)
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(second['next_cursor'])
+        ids = {row['id'] for row in first['results'] + second['results']}
+        self.assertEqual(ids, {appointment.pk for appointment in self.appointments[:3]})
+
+        self.assertEqual(self.client.get(url, {'fields': 'password'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'status': 'lost'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': 'nonsense'}).status_code, 400)
+
+        self.client.force_login(self.staff)
+        self.assertEqual(len(self.client.get(url).json()['results']), 5)
+
+    def test_clients_cannot_touch_other_bookings_or_status(self):
+        self.client.force_login(self.ana)
+        theirs = reverse('appointments:api-appointment', args=[self.appointments[4].pk])
+        mine = reverse('appointments:api-appointment', args=[self.appointments[0].pk])
+        self.assertEqual(self.client.get(theirs).status_code, 404)
+        self.assertEqual(self.client.delete(theirs).status_code, 404)
+        self.assertEqual(self.patch(mine, {'status': 'approved'}).status_code, 403)
+
+        response = self.patch(mine, {'tattoo_design': 'Dragon back piece'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['tattoo_design'], 'Dragon back piece')
+        self.assertEqual(self.patch(mine, {'user': self.ben.pk}).status_code, 400)
+
+    def test_create_and_bulk_status(self):
+        self.client.force_login(self.ana)
+        response = self.client.post(reverse('appointments:api-appointments'), {
+            'client_name': 'Ana', 'email': 'ana@example.com', 'phone': '555-0101',
+            'tattoo_design': 'Swallow', 'appointment_date': '2030-01-10T14:00', 'duration_minutes': 60,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['user'], response.json()['status']), (self.ana.pk, 'pending'))
+
+        bulk_url = reverse('appointments:api-appointments-bulk-status')
+        ids = [appointment.pk for appointment in self.appointments]
+        self.assertEqual(self.client.post(bulk_url, {'ids': ids, 'status': 'approved'},
+                                          content_type='application/json').status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.post(bulk_url, {'ids': ids, 'status': 'approved'}, content_type='application/json')
+        self.assertEqual(response.json()['updated'], 5)
+        self.assertEqual(get_dashboard_stats()['approved'], 5)
+
+    def test_enquiries_and_catalogue(self):
+        for i in range(10):
+            Artist.objects.create(name=f'Artist {i}', bio='Fine line and blackwork', is_active=i > 0)
+        response = self.client.get(reverse('appointments:api-artists'), {'fields': 'name,bio'},
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 9)
+
+        # Reviews are paged newest first on (date, id)
+        Review.objects.bulk_create([
+            Review(client_name=f'Client {i}', rating=5, review_text='Great', is_approved=i != 4)
+            for i in range(6)
+        ])
+        Review.objects.filter(client_name='Client 0').update(date=timezone.localdate() - timedelta(days=3))
+        url = reverse('appointments:api-reviews')
+        with self.assertNumQueries(1):
+            first = self.client.get(url, {'limit': 3, 'fields': 'client_name'}).json()
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(second['next_cursor'])
+        self.assertEqual(
+            [row['client_name'] for row in first['results'] + second['results']],
+            ['Client 5', 'Client 3', 'Client 2', 'Client 1', 'Client 0'],
+        )
+        self.assertEqual(self.client.get(url, {'cursor': 'nonsense'}).status_code, 400)
+
+        self.client.force_login(self.ana)
+        enquiry = {'name': 'Ana', 'email': 'ana@example.com', 'phone': '555-0101', 'message': 'Sleeve'}
+        response = self.client.post(reverse('appointments:api-enquiries'), enquiry, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get(reverse('appointments:api-enquiries')).status_code, 403)
+
+        self.client.force_login(self.staff)
+        url = reverse('appointments:api-enquiry', args=[response.json()['id']])
+        self.assertTrue(self.patch(url, {'is_contacted': True}).json()['is_contacted'])
+        listed = self.client.get(reverse('appointments:api-enquiries'), {'is_contacted': 'true'}).json()
+        self.assertEqual(len(listed['results']), 1)
+
+
+# ============================================
+# ASYNC VIEWS
+# ============================================
+
+class AsyncViewTests(TestCase):
+    """
+    Landing page and dashboard stay sync views: under ASGI they run on the
+    sync thread like the rest, and WSGI pays no async_to_sync per request.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ana', password='pass12345')
+        Appointment.objects.create(
+            client_name='Ana', email='ana@example.com', phone='555-0101', tattoo_design='Koi sleeve',
+            appointment_date=timezone.now() + timedelta(days=3), user=self.user,
+        )
+        self.addCleanup(cache.clear)
+
+    async def test_pages_render_and_revalidate_under_asgi(self):
+        # Django logs (in DEBUG) every middleware it has to wrap in sync_to_async
+        with override_settings(DEBUG=True), self.assertLogs('django.request', level='DEBUG') as logs:
+            BaseHandler().load_middleware(is_async=True)
+            logging.getLogger('django.request').debug('middleware loaded')
+        self.assertFalse([line for line in logs.output if 'adapted' in line])
+
+        client = AsyncClient()
+        response = await client.get(reverse('appointments:landing'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'enquiry')
+
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('appointments:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['upcoming_appointments']), 1)
+        again = await client.get(reverse('appointments:index'), headers={'if-none-match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+
+    def test_asgi_closes_connections_after_each_request(self):
+        databases = {alias: dict(database) for alias, database in settings.DATABASES.items()}
+        self.addCleanup(lambda: [settings.DATABASES[alias].update(database) for alias, database in databases.items()])
+        with patch.dict('os.environ'):
+            os.environ.pop('DJANGO_CONN_MAX_AGE', None)
+            importlib.reload(importlib.import_module('TattooAppointment.asgi'))
+            self.assertNotIn('DJANGO_CONN_MAX_AGE', os.environ)
+        self.assertEqual({database['CONN_MAX_AGE'] for database in settings.DATABASES.values()}, {0})
+
+        # An explicit DJANGO_CONN_MAX_AGE, already read by settings, is kept
+        settings.DATABASES['default']['CONN_MAX_AGE'] = 60
+        with patch.dict('os.environ', DJANGO_CONN_MAX_AGE='60'):
+            importlib.reload(importlib.import_module('TattooAppointment.asgi'))
+        self.assertEqual(settings.DATABASES['default']['CONN_MAX_AGE'], 60)
+
+
+# ============================================
+# RATE LIMITS AND LOAD SHEDDING
+# ============================================
+
+@override_settings(RATE_LIMITS={'login': {'ip': (60, 100), 'username': (1, 2)}})
+class RateLimitTests(TestCase):
+    """Bursts get a cheap 429 or 503 before any password is hashed"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_login_bucket_per_username(self):
+        url = reverse('appointments:login')
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, {'username': 'Ana', 'password': 'wrong'}).status_code, 200)
+        with self.assertNumQueries(0):  # no user lookup, no PBKDF2
+            response = self.client.post(url, {'username': 'ana ', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        # The IP bucket still has room for other accounts
+        self.assertEqual(self.client.post(url, {'username': 'ben', 'password': 'wrong'}).status_code, 200)
+
+    def test_concurrency_cap_sheds_excess_requests(self):
+        responses = []
+
+        def view(request):
+            # A second request arriving while this one is still running
+            responses.append(middleware(request))
+            return HttpResponse('ok')
+
+        with override_settings(MAX_CONCURRENT_REQUESTS=1):
+            middleware = ConcurrencyLimitMiddleware(view)
+        self.assertEqual(middleware(RequestFactory().get('/')).status_code, 200)
+        self.assertEqual(responses[0].status_code, 503)
+        self.assertEqual(ratelimit.in_flight(), 0)
+
+    def test_staff_page_shows_per_process_counters(self):
+        self.client.post(reverse('appointments:login'), {'username': 'ana', 'password': 'wrong'})
+        url = reverse('appointments:rate-limits')
+        self.client.force_login(User.objects.create_user('ana', password='pass12345'))
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(User.objects.create_user('boss', password='pass12345', is_staff=True))
+        response = self.client.get(url)
+        self.assertContains(response, 'username: 1 / 2')
+        self.assertContains(response, 'In flight now')
+        self.assertContains(response, 'Rate-limit buckets are per process too')
+
+    def test_api_writes_share_the_enquiry_limit(self):
+        self.client.force_login(User.objects.create_user('ana', password='pass12345'))
+        enquiry = {'name': 'Ana', 'email': 'ana@example.com', 'phone': '555-0101', 'message': 'Sleeve'}
+        with self.settings(RATE_LIMITS={'enquiry': {'ip': (1, 2)}}):
+            statuses = [
+                self.client.post(reverse('appointments:api-enquiries'), enquiry, content_type='application/json')
+                .status_code for _ in range(2)
+            ]
+            response = self.client.post(reverse('appointments:api-appointments'), {}, content_type='application/json')
+        self.assertEqual(statuses, [201, 201])
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        # Reads are never limited
+        self.assertEqual(self.client.get(reverse('appointments:api-appointments')).status_code, 200)
+
+
+# ============================================
+# APPOINTMENT ARCHIVE
+# ============================================
+
+class ArchiveTests(TestCase):
+    """Old sessions move to the archive without disappearing from history or counters"""
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='ana', password='pass12345')
+        self.staff = User.objects.create_user(username='staff', password='pass12345', is_staff=True)
+        now = timezone.now()
+        for name, days, status in [('Old koi', -400, 'approved'), ('Old rose', -500, 'rejected'), ('Next', 5, 'pending')]:
+            Appointment.objects.create(
+                client_name=name, email='ana@example.com', phone='555-0101', tattoo_design=name,
+                appointment_date=now + timedelta(days=days), status=status, user=self.client_user,
+            )
+
+    def test_archive_moves_old_sessions_and_keeps_history(self):
+        self.client.force_login(self.staff)
+        staff_etag = self.client.get(reverse('appointments:list-fbv'))['ETag']
+        before = get_dashboard_stats(self.client_user)
+
+        call_command('archive_appointments', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(list(Appointment.objects.values_list('client_name', flat=True)), ['Next'])
+        self.assertEqual(ArchivedAppointment.objects.count(), 2)
+        self.assertEqual(get_dashboard_stats(self.client_user), before)
+        self.assertEqual(count_appointments(self.client_user.pk), {**before})
+
+        # Staff lists keep the rows but lose their actions, so the cached copy must not be reused
+        response = self.client.get(reverse('appointments:list-fbv'), HTTP_IF_NONE_MATCH=staff_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([a.client_name for a in response.context['appointments']], ['Next', 'Old koi', 'Old rose'])
+        self.assertContains(response, 'btn-delete', count=1)
+
+        self.client.force_login(self.client_user)
+        for name in ('appointments:list-fbv', 'appointments:list-cbv'):
+            response = self.client.get(reverse(name))
+            self.assertEqual([a.client_name for a in response.context['appointments']], ['Next', 'Old koi', 'Old rose'])
+
+        ArchivedAppointment.objects.get(client_name='Old rose').delete()
+        self.assertEqual(get_dashboard_stats(self.client_user)['rejected'], 0)
+        call_command('rebuild_appointment_stats', stdout=StringIO())
+        self.assertEqual(get_dashboard_stats(self.client_user)['total'], 2)
+
+    def test_history_pages_merge_live_and_archived_rows(self):
+        now = timezone.now()
+        for days in range(-30, -5, 2):
+            Appointment.objects.create(
+                client_name=f'Live {days}', email='ana@example.com', phone='555-0101', tattoo_design='Koi',
+                appointment_date=now + timedelta(days=days), user=self.client_user,
+            )
+        call_command('archive_appointments', '--older-than', '20', stdout=StringIO())
+        self.assertTrue(ArchivedAppointment.objects.filter(client_name__startswith='Live').exists())
+        expected = sorted(
+            [*Appointment.objects.all(), *ArchivedAppointment.objects.all()],
+            key=lambda row: (row.appointment_date, row.pk), reverse=True,
+        )
+
+        seen, cursor = [], None
+        while True:
+            with self.assertNumQueries(2):
+                page = appointment_history(self.client_user, cursor, per_page=4)
+            seen.extend((row.pk, row.is_archived) for row in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, [(row.pk, row.is_archived) for row in expected])
+        self.assertEqual(len(appointment_history(self.staff, per_page=4)), 0)
+
+        self.client.force_login(self.client_user)
+        with patch('appointments.views.LIST_PAGE_SIZE', 4):
+            first = self.client.get(reverse('appointments:list-cbv'))
+        self.assertEqual(len(first.context['appointments']), 4)
+        self.assertContains(first, f'?cursor={first.context["page"].next_cursor}')
+        self.assertEqual(self.client.get(reverse('appointments:list-fbv'), {'cursor': 'nonsense'}).status_code, 404)
+
+
+# ============================================
+# LARGE ADMIN CHANGELISTS
+# ============================================
+
+class AdminChangelistTests(TestCase):
+    """Estimated counts, the cached date drilldown and precomputed badges"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client.force_login(User.objects.create_superuser('boss', 'boss@example.com', 'pass12345'))
+        now = timezone.now()
+        for i, (days, status) in enumerate([(-800, 'approved'), (-400, 'rejected'), (-2, 'approved'), (30, 'pending')]):
+            Appointment.objects.create(
+                client_name=f'Client {i}', email='c@example.com', phone='555-0101', tattoo_design='Koi',
+                appointment_date=now + timedelta(days=days), status=status,
+            )
+        self.url = reverse('admin:appointments_appointment_changelist')
+
+    def test_counts_are_estimated_or_capped(self):
+        response = self.client.get(self.url)
+        self.assertFalse(response.context['cl'].paginator.count_is_estimate)
+        self.assertContains(response, '4 appointments')
+
+        # Up to COUNT_CAP rows are counted, not estimated
+        refresh_row_estimates(Appointment)
+        Appointment.objects.filter(status='rejected').delete()
+        response = self.client.get(self.url)
+        self.assertFalse(response.context['cl'].paginator.count_is_estimate)
+        self.assertContains(response, '3 appointments')
+
+        with patch.object(EstimatedCountPaginator, 'COUNT_CAP', 1):
+            response = self.client.get(self.url)
+        self.assertTrue(response.context['cl'].paginator.count_is_estimate)
+        self.assertContains(response, 'About 4 appointments')
+
+        with patch.object(EstimatedCountPaginator, 'COUNT_CAP', 1):
+            response = self.client.get(self.url, {'status__exact': 'approved'})
+        self.assertContains(response, 'More than 1 appointments')
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+
+    def test_stale_estimate_is_a_lower_bound(self):
+        refresh_row_estimates(Appointment)
+        for i in range(3):
+            Appointment.objects.create(
+                client_name=f'Late {i}', email='c@example.com', phone='555-0101', tattoo_design='Koi',
+                appointment_date=timezone.now() + timedelta(days=60 + i),
+            )
+        with patch.object(EstimatedCountPaginator, 'COUNT_CAP', 1), \
+                patch.object(admin.AppointmentAdmin, 'list_per_page', 2):
+            first = self.client.get(self.url)
+            second = self.client.get(self.url, {'p': '2'})
+            last = self.client.get(self.url, {'p': '4'})
+        self.assertContains(first, 'About 4 appointments')
+        self.assertEqual(first.context['cl'].paginator.num_pages, 2)
+        # Reading page 2 finds rows past the estimate, so page 3 gets a link
+        self.assertContains(second, 'About 5 appointments')
+        self.assertEqual(second.context['cl'].paginator.num_pages, 3)
+        self.assertContains(second, '?p=3')
+        self.assertEqual(len(last.context['cl'].result_list), 1)
+        self.assertContains(last, 'About 7 appointments')
+
+    def test_badges(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, '✓ UPCOMING', count=1)
+        self.assertContains(response, '✓ COMPLETED', count=3)
+        self.assertContains(response, '⏳ PENDING', count=1)
+
+    def test_date_drilldown_matches_distinct_dates_and_is_cached(self):
+        queryset = Appointment.objects.all()
+        for kind in ('year', 'month', 'day'):
+            self.assertEqual(
+                appointment_admin.date_buckets(queryset, 'appointment_date', kind),
+                [value.date() for value in queryset.datetimes('appointment_date', kind)],
+            )
+
+        with patch.object(appointment_admin, 'date_buckets', wraps=appointment_admin.date_buckets) as buckets:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url, {'o': '2'})
+            self.client.get(self.url, {'status__exact': 'pending'})
+        # Years once for the unfiltered list (reordering reuses them); years,
+        # months and days for the single pending session
+        self.assertEqual(buckets.call_count, 4)
+        years = sorted({str(a.appointment_date.year) for a in queryset})
+        for response in (first, second):
+            for year in years:
+                self.assertContains(response, f'appointment_date__year={year}')
+
+        # A single matching month opens straight on its days
+        response = self.client.get(self.url, {'status__exact': 'pending'})
+        self.assertContains(response, 'appointment_date__day=')
+
+
+# ============================================
+# NOTIFICATION OUTBOX
+# ============================================
+
+class SmtpStandInHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib; recipients containing "bounce" are refused"""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.server.sessions += 1
+        self.reply('220 stand-in ready')
+        while line := self.rfile.readline():
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb == 'RCPT' and 'bounce' in command:
+                self.reply('550 No such user')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = b''.join(iter(self.rfile.readline, b'.\r\n'))
+                self.server.messages.append(email.message_from_bytes(data))
+                self.reply('250 Queued')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    """Local SMTP server in a thread that records sessions and messages"""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SmtpStandInHandler)
+        self.sessions = 0
+        self.messages = []
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+    def settings(self):
+        return override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server_address[1],
+        )
+
+
+class OutboxTests(TestCase):
+    """Status changes queue emails transactionally; the worker sends, retries and dead-letters"""
+
+    def setUp(self):
+        self.staff = User.objects.create_superuser('boss', 'boss@example.com', 'pass12345')
+        when = timezone.now() + timedelta(days=7)
+        self.appointments = [
+            Appointment.objects.create(
+                client_name=name, email=f'{name}@example.com', phone='555-0101', tattoo_design='Koi',
+                appointment_date=when,
+            )
+            for name in ('ana', 'ben', 'bounce')
+        ]
+
+    def test_status_changes_are_queued_with_the_change(self):
+        ana, ben, bounce = self.appointments
+        self.client.force_login(self.staff)
+        self.client.post(reverse('appointments:update-status', args=[ana.pk]), {'status': 'approved'})
+        self.client.post(reverse('appointments:update-status', args=[ana.pk]), {'status': 'approved'})
+        self.assertEqual(list(OutboxMessage.objects.values_list('recipient', flat=True)), ['ana@example.com'])
+
+        # Bulk actions queue one message per appointment that really changes
+        self.client.post(reverse('admin:appointments_appointment_changelist'), {
+            'action': 'reject_appointments', '_selected_action': [ana.pk, ben.pk],
+        })
+        Appointment.objects.filter(pk=bounce.pk).update(status='pending')
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list('recipient', 'payload__status')),
+            [('ana@example.com', 'approved'), ('ana@example.com', 'rejected'), ('ben@example.com', 'rejected')],
+        )
+
+        # No committed change, no email
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            bounce.status = 'approved'
+            bounce.save()
+            raise RuntimeError
+        self.assertEqual(OutboxMessage.objects.count(), 3)
+
+    @override_settings(OUTBOX={'BATCH_SIZE': 10, 'MAX_ATTEMPTS': 2, 'RETRY_DELAY': 60, 'LEASE': 300})
+    def test_worker_sends_over_one_connection_retries_and_dead_letters(self):
+        Appointment.objects.update(status='approved')
+        with SmtpStandIn() as server, server.settings():
+            call_command('send_notifications', '--once', stdout=StringIO())
+            # The refused recipient costs one reconnect, not one per message
+            self.assertEqual(server.sessions, 2)
+            self.assertEqual(sorted(message['To'] for message in server.messages), ['ana@example.com', 'ben@example.com'])
+            self.assertIn('confirmed', server.messages[0]['Subject'])
+
+            failed = OutboxMessage.objects.get(recipient='bounce@example.com')
+            self.assertEqual((failed.status, failed.attempts), (OutboxMessage.PENDING, 1))
+            self.assertIn('SMTPRecipientsRefused', failed.last_error)
+            self.assertGreater(failed.next_attempt_at, timezone.now())
+            self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.SENT).count(), 2)
+
+            OutboxMessage.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now())
+            call_command('send_notifications', '--once', stdout=StringIO())
+            failed.refresh_from_db()
+            self.assertEqual((failed.status, failed.attempts), (OutboxMessage.DEAD, 2))
+            self.assertEqual(len(server.messages), 2)
+
+    def test_repeated_saves_diff_against_the_last_save(self):
+        ana = Appointment.objects.get(email='ana@example.com')
+        ana.status = 'approved'
+        ana.save()
+        approved_at = ana.approved_at
+        self.assertIsNotNone(approved_at)
+        ana.reminder_sent_at = timezone.now()
+        ana.save()
+        ana.appointment_date += timedelta(days=1)
+        ana.save()
+        self.assertIsNone(ana.reminder_sent_at)
+        ana.status = 'rejected'
+        ana.save()
+
+        self.assertEqual(ana.approved_at, approved_at)
+        self.assertIsNotNone(ana.rejected_at)
+        self.assertEqual(
+            list(OutboxMessage.objects.order_by('id').values_list('payload__status', flat=True)), ['approved', 'rejected'],
+        )
+        self.assertEqual(get_dashboard_stats()['rejected'], 1)
+
+    def test_message_that_cannot_be_built_fails_alone(self):
+        Appointment.objects.update(status='approved')
+        ana, ben, carla = OutboxMessage.objects.order_by('recipient')
+        OutboxMessage.objects.filter(pk=ana.pk).update(recipient='ana@example@com')
+        OutboxMessage.objects.filter(pk=ben.pk).update(topic='appointment.unknown')
+        OutboxMessage.objects.filter(pk=carla.pk).update(recipient='carla@example.com')
+
+        with SmtpStandIn() as server, server.settings():
+            self.assertEqual(outbox.send_batch(outbox.claim_batch()), (1, 2))
+            self.assertEqual(server.sessions, 1)
+            self.assertEqual([message['To'] for message in server.messages], ['carla@example.com'])
+
+        self.assertEqual(OutboxMessage.objects.get(pk=carla.pk).status, OutboxMessage.SENT)
+        for message, error in ((ana, 'ValueError'), (ben, 'KeyError')):
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts), (OutboxMessage.PENDING, 1))
+            self.assertIn(error, message.last_error)
+
+
+# ============================================
+# BACKGROUND JOB QUEUE TESTS
+# ============================================
+
+calls = []
+
+
+@jobs.task('tests.record', max_attempts=2, timeout=60)
+def record_call(value):
+    calls.append(value)
+
+
+@jobs.task('tests.explode', max_attempts=2)
+def explode():
+    raise ValueError('boom')
+
+
+@override_settings(JOBS={'RETRY_DELAY': 10, 'POLL_INTERVAL': 0})
+class JobQueueTests(TestCase):
+    """Jobs are claimed once, in priority order, retried, and their latency reported"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_claims_most_urgent_due_job_once(self):
+        low = record_call.enqueue(value='low')
+        high = record_call.enqueue(value='high', priority=5)
+        record_call.enqueue(value='later', run_at=timezone.now() + timedelta(hours=1))
+
+        job = jobs.claim('worker-a')
+        self.assertEqual((job.pk, job.status, job.attempts, job.locked_by), (high.pk, Job.RUNNING, 1, 'worker-a'))
+        self.assertEqual(jobs.claim('worker-b').pk, low.pk)
+        # The only job left is not due yet
+        self.assertIsNone(jobs.claim('worker-c'))
+
+        self.assertTrue(jobs.run_job(job, 'worker-a'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (Job.DONE, ''))
+        self.assertEqual(calls, ['high'])
+
+        self.assertIsNone(record_call.enqueue(value='later', unique=True, run_at=timezone.now()))
+
+    def test_expired_lease_is_requeued_then_failed(self):
+        record_call.enqueue(value='x')
+        job = jobs.claim('dead-worker')
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.release_expired(), 1)
+
+        job = jobs.claim('worker-b')
+        self.assertEqual(job.attempts, 2)
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        jobs.release_expired()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), (Job.FAILED, 'Visibility timeout expired'))
+
+        # The worker that lost its lease cannot mark the job done afterwards
+        self.assertTrue(jobs.run_job(job, 'worker-b'))
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.FAILED)
+
+    def test_failures_are_retried_with_backoff(self):
+        explode.enqueue()
+        with self.assertLogs('appointments.jobs', 'ERROR'):
+            self.assertFalse(jobs.run_job(jobs.claim('worker'), 'worker'))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('ValueError: boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('appointments.jobs', 'ERROR'):
+            self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    def test_run_workers_burst_and_latency_stats(self):
+        for value in range(3):
+            record_call.enqueue(value=value)
+        Job.objects.create(task=explode.name, max_attempts=1)
+
+        out = StringIO()
+        with self.assertLogs('appointments.jobs', 'ERROR'):
+            call_command('run_workers', '--burst', '--threads', '1', stdout=out)
+        self.assertIn('Workers stopped.', out.getvalue())
+        self.assertEqual(sorted(calls), [0, 1, 2])
+        self.assertFalse(Job.objects.filter(status__in=[Job.QUEUED, Job.RUNNING]).exists())
+
+        stats = jobs.latency_stats()
+        self.assertEqual((stats['tests.record']['done'], stats['tests.record']['failed']), (3, 0))
+        self.assertEqual((stats['tests.explode']['done'], stats['tests.explode']['failed']), (0, 1))
+        self.assertIsNotNone(stats['tests.record']['wait_p95_ms'])
+
+        # Old successes are purged; failures stay for inspection
+        Job.objects.update(finished_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(jobs.purge_finished(), 3)
+        self.assertEqual(Job.objects.get().task, 'tests.explode')
+
+    def test_uploads_and_status_changes_queue_jobs_after_commit(self):
+        appointment = Appointment.objects.create(
+            client_name='ana', email='ana@example.com', phone='555-0101', tattoo_design='Koi',
+            appointment_date=timezone.now() + timedelta(days=7),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.reference_image = 'references/koi.jpg'
+            appointment.status = 'approved'
+            appointment.save()
+            self.assertFalse(Job.objects.exists())
+        self.assertEqual(
+            sorted(Job.objects.values_list('task', 'priority')),
+            [('appointments.render_reference_image', 10), ('appointments.send_notifications', 20)],
+        )
+        render = Job.objects.get(task=tasks.render_reference_image.name)
+        self.assertEqual(render.kwargs['name'], 'references/koi.jpg')
+
+        # One waiting drain covers any number of new messages
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.filter(pk=appointment.pk).update(status='rejected')
+        self.assertEqual(Job.objects.filter(task=tasks.send_notifications.name).count(), 1)
+
+
+# ============================================
+# SESSION REMINDER TESTS
+# ============================================
+
+@override_settings(REMINDERS={'LEAD_TIME': 24, 'BATCH_SIZE': 2, 'INTERVAL': 300})
+class ReminderTests(TestCase):
+    """Approved sessions entering the window are reminded once, in batches"""
+
+    def setUp(self):
+        now = timezone.now()
+        self.sessions = Appointment.objects.bulk_create([
+            Appointment(
+                client_name=name, email=f'{name}@example.com', phone='555-0101', tattoo_design='Koi',
+                appointment_date=now + timedelta(hours=hours), status=status,
+            )
+            for name, hours, status in [
+                ('ana', 2, 'approved'), ('ben', 20, 'approved'), ('cy', 23, 'approved'),
+                ('dee', 30, 'approved'), ('eve', 5, 'pending'), ('fay', -1, 'approved'),
+            ]
+        ])
+
+    def test_due_sessions_are_reminded_once(self):
+        out = StringIO()
+        call_command('send_reminders', '--once', stdout=out)
+        self.assertIn('Queued 3 reminder(s) in 2 batch(es)', out.getvalue())
+        messages = OutboxMessage.objects.filter(topic=outbox.REMINDER).order_by('id')
+        self.assertEqual(
+            [message.recipient for message in messages], ['ana@example.com', 'ben@example.com', 'cy@example.com'],
+        )
+        self.assertEqual(Appointment.objects.filter(reminder_sent_at__isnull=False).count(), 3)
+
+        email = outbox.build_email(messages[0])
+        self.assertIn('Reminder', email.subject)
+        self.assertIn('ana', email.body)
+
+        # A second run, or an overlapping scheduler, finds nothing left to do
+        self.assertEqual(reminders.send_due()['reminded'], 0)
+
+        # Moving a session brings its reminder back, ahead of the new date
+        ana = Appointment.objects.get(client_name='ana')
+        ana.appointment_date += timedelta(hours=3)
+        ana.save()
+        Appointment.objects.filter(client_name='ben').update(appointment_date=timezone.now() + timedelta(hours=1))
+        run = reminders.send_due()
+        self.assertEqual(run['reminded'], 2)
+        self.assertGreater(run['lag_max'], 0)
+
+    def test_stats_report_delivery_lag(self):
+        reminders.send_due()
+        OutboxMessage.objects.filter(topic=outbox.REMINDER).update(status=OutboxMessage.SENT, sent_at=timezone.now())
+        stats = reminders.reminder_stats()
+        self.assertEqual((stats['sent'], stats['pending'], stats['dead']), (3, 0, 0))
+        # cy's session is 23 hours away, so its reminder was due about an hour ago
+        self.assertGreater(stats['lag_p95'], 3000)
+
+    def test_window_scan_uses_an_index(self):
+        sql, params = reminders.due().order_by('appointment_date', 'id').values('pk')[:500].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            details = [row[3] for row in cursor.fetchall()]
+        self.assertFalse([detail for detail in details if FULL_SCAN.match(detail)], details)
+
+
+# ============================================
+# REPORTING TESTS
+# ============================================
+
+class ReportTests(TestCase):
+    """Decision times are stamped on every path; the report's numbers match a known history"""
+
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_superuser('boss', 'boss@example.com', 'pass12345')
+        # Live bookings were made two days ago; the archived session was last week's Monday noon
+        self.now = timezone.now()
+        self.monday = timezone.localtime(self.now).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.monday -= timedelta(days=self.monday.weekday() + 7)
+        created = self.now - timedelta(days=2)
+        specs = [
+            # (days from creation to session, status, hours to decision)
+            (0.5, 'approved', 2), (2, 'approved', 30), (10, 'rejected', 5), (40, 'pending', None),
+        ]
+        for i, (lead_days, status, decided_after) in enumerate(specs):
+            appointment = Appointment.objects.create(
+                client_name=f'c{i}', email=f'c{i}@example.com', phone='555-0101', tattoo_design='Koi',
+                appointment_date=created + timedelta(days=lead_days), status=status, duration_minutes=90,
+            )
+            decided = {f'{status}_at': created + timedelta(hours=decided_after)} if decided_after else {}
+            Appointment.objects.filter(pk=appointment.pk).update(created_at=created, **decided)
+        # One archived session on a Monday in the past
+        ArchivedAppointment.objects.create(
+            id=999, client_name='old', email='old@example.com', phone='555-0101', tattoo_design='Rose',
+            appointment_date=self.monday, created_at=self.monday - timedelta(days=100), updated_at=self.monday,
+            status='approved', approved_at=self.monday - timedelta(days=90), duration_minutes=60,
+        )
+
+    def test_decisions_are_stamped_when_status_changes(self):
+        pending = Appointment.objects.get(client_name='c3')
+        pending.status = 'approved'
+        pending.save()
+        self.assertIsNotNone(pending.approved_at)
+
+        before = Appointment.objects.get(client_name='c0').approved_at
+        Appointment.objects.update(status='approved')
+        stamps = dict(Appointment.objects.values_list('client_name', 'approved_at'))
+        # Already approved: the original decision time stays
+        self.assertEqual(stamps['c0'], before)
+        self.assertGreater(stamps['c2'], before)
+        self.assertEqual(stamps['c3'], pending.approved_at)
+
+    def test_report_numbers(self):
+        report = reports.build_report(self.now)
+        self.assertEqual(report['appointments'], 5)
+        self.assertEqual(
+            [(row['stage'], row['count']) for row in report['funnel']],
+            [('Requested', 5), ('Decided', 4), ('Approved', 3), ('Completed', 2)],
+        )
+        lead = {bucket['label']: bucket['count'] for bucket in report['lead_time']['buckets']}
+        self.assertEqual((lead['0-1 days'], lead['1-3 days'], lead['7-14 days'], lead['30-60 days']), (1, 1, 1, 1))
+        self.assertEqual(lead['90-180 days'], 1)
+        approval = report['approval_latency']
+        self.assertEqual((approval['count'], approval['buckets'][1]['count'], approval['buckets'][4]['count']), (3, 1, 1))
+        self.assertEqual(report['rejection_latency']['count'], 1)
+
+        days = report['daily_volume']
+        self.assertEqual(len(days), reports.DAILY_VOLUME_DAYS)
+        self.assertEqual(days[-1]['date'], timezone.localdate(self.now))
+        self.assertEqual(sum(day['booked'] for day in days), 4)
+        self.assertEqual(days[-3]['booked'], 4)
+
+        load = {row['weekday']: row for row in report['weekday_load']}
+        self.assertEqual(sum(row['sessions'] for row in load.values()), 3)
+        self.assertGreaterEqual(load['Monday']['sessions'], 1)
+        self.assertEqual(sum(row['hours'] for row in load.values()), 4.0)
+
+    def test_text_and_datetime_loading_agree(self):
+        fast = reports.load_columns()
+        with patch.object(reports, '_text_datetimes', return_value=False):
+            slow = reports.load_columns()
+        for name in reports.COLUMNS:
+            self.assertEqual(fast[name].size, 5)
+            self.assertTrue(np.array_equal(fast[name], slow[name], equal_nan=True), name)
+
+    def test_staff_view_is_built_once_a_day(self):
+        self.client.force_login(User.objects.create_user('client', 'client@example.com', 'pass12345'))
+        self.assertEqual(self.client.get(reverse('appointments:reports')).status_code, 302)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('appointments:reports'))
+        self.assertContains(response, 'Status funnel')
+        self.assertContains(response, 'Completed')
+        with patch.object(reports, 'build_report') as build:
+            self.client.get(reverse('appointments:reports'))
+        build.assert_not_called()
+
+
+# ============================================
+# LANDING PAGE CACHE TESTS
+# ============================================
+
+class LandingCacheTests(TestCase):
+    """Catalogue data is cached per version; any catalogue edit moves to a new version"""
+
+    def setUp(self):
+        cache.clear()
+        self.artist = Artist.objects.create(name='Mara')
+
+    def test_data_is_cached_until_the_catalogue_changes(self):
+        version = caching.landing_version()
+        self.assertEqual(caching.landing_version(), version)
+        self.assertEqual([artist.name for artist in caching.get_landing_data()['artists']], ['Mara'])
+        with self.assertNumQueries(1):  # the version
+            caching.get_landing_data()
+
+        Artist.objects.create(name='Bo')
+        self.assertNotEqual(caching.landing_version(), version)
+        with self.assertNumQueries(5):
+            names = sorted(artist.name for artist in caching.get_landing_data()['artists'])
+        self.assertEqual(names, ['Bo', 'Mara'])
+
+        version = caching.landing_version()
+        self.artist.delete()
+        self.assertNotEqual(caching.landing_version(), version)
+        self.assertEqual([artist.name for artist in caching.get_landing_data()['artists']], ['Bo'])
+
+    def test_every_catalogue_model_invalidates(self):
+        for create in (
+            lambda: TattooStyle.objects.create(name='Blackwork', description='...'),
+            lambda: Studio.objects.create(name='Cebu', city='Cebu', country='PH', address='...'),
+            lambda: Review.objects.create(client_name='Ana', review_text='Great'),
+        ):
+            version = caching.landing_version()
+            create()
+            self.assertNotEqual(caching.landing_version(), version)
+
+    def test_bump_reaches_other_processes(self):
+        self.assertEqual([artist.name for artist in caching.get_landing_data()['artists']], ['Mara'])
+        version = caching.landing_version()
+        # Another worker: its own cache, as it was before this one's edit
+        other_worker = (dict(cache._cache), dict(cache._expire_info))
+        self.artist.name = 'Mara K'
+        self.artist.save()
+        cache.clear()
+        cache._cache.update(other_worker[0])
+        cache._expire_info.update(other_worker[1])
+        self.assertNotEqual(caching.landing_version(), version)
+        self.assertEqual([artist.name for artist in caching.get_landing_data()['artists']], ['Mara K'])
+
+    def test_deleted_version_is_never_reused(self):
+        version = caching.landing_version()
+        CacheVersion.objects.all().delete()
+        self.assertNotEqual(caching.landing_version(), version)
+        # bump_landing_version also copes with a missing row
+        CacheVersion.objects.all().delete()
+        caching.bump_landing_version()
+        self.assertTrue(CacheVersion.objects.filter(name=caching.LANDING_VERSION_KEY).exists())
+
+
+# ============================================
+# REFERENCE IMAGE RENDITION TESTS
+# ============================================
+
+def image_upload(width, height, name='koi.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'teal').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class RenditionTests(TestCase):
+    """Renditions never claim more pixels than the original has"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, APPOINTMENT_IMAGE_RENDITIONS=[200, 600]))
+
+    def test_upload_is_rendered_and_replacement_cleans_up(self):
+        appointment = Appointment.objects.create(
+            client_name='ana', email='ana@example.com', phone='555-0101', tattoo_design='Koi',
+            appointment_date=timezone.now() + timedelta(days=7),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.reference_image = image_upload(1000, 500)
+            appointment.save()
+        jobs.run_pending()
+        appointment.refresh_from_db()
+        first = appointment.reference_image.name
+        self.assertEqual(appointment.reference_image_renditions, [200, 600])
+        formats = [ext for ext, _, _ in images.rendition_formats()]
+        for width in (200, 600):
+            for ext in formats:
+                with default_storage.open(images.rendition_name(first, width, ext)) as rendition:
+                    self.assertEqual(Image.open(rendition).size, (width, width // 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.reference_image = image_upload(400, 400, 'rose.jpg')
+            appointment.save()
+        # Cleared until the worker has rendered the new image
+        self.assertEqual(Appointment.objects.get(pk=appointment.pk).reference_image_renditions, [])
+        jobs.run_pending()
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.reference_image_renditions, [200])
+        self.assertFalse(default_storage.exists(images.rendition_name(first, 600, 'jpg')))
+        self.assertTrue(default_storage.exists(images.rendition_name(appointment.reference_image.name, 200, 'jpg')))
+
+    def test_responsive_image_srcset(self):
+        appointment = Appointment(reference_image='appointments/designs/koi.jpg', reference_image_renditions=[200, 600])
+        html = appointment_images.responsive_image(appointment.reference_image, [200, 600], alt='Koi')
+        self.assertIn(
+            '/media/appointments/designs/koi_200w.jpg 200w, /media/appointments/designs/koi_600w.jpg 600w', html,
+        )
+        self.assertIn('src="/media/appointments/designs/koi_600w.jpg"', html)
+        self.assertIn('loading="lazy"', html)
+        if 'webp' in [ext for ext, _, _ in images.rendition_formats()]:
+            self.assertIn('<source type="image/webp" srcset="/media/appointments/designs/koi_200w.webp 200w', html)
+
+        # Before the worker has run: the original, still lazy
+        plain = appointment_images.responsive_image(appointment.reference_image, [])
+        self.assertIn('src="/media/appointments/designs/koi.jpg"', plain)
+        self.assertNotIn('srcset', plain)
+        self.assertEqual(appointment_images.responsive_image(None, []), '')
+
+    def test_narrow_original_is_recorded_at_its_own_width(self):
+        name = default_storage.save('appointments/designs/tiny.jpg', image_upload(120, 80))
+        self.assertEqual(images.generate_renditions(name), [120])
+        with default_storage.open(images.rendition_name(name, 120, 'jpg')) as rendition:
+            self.assertEqual(Image.open(rendition).size, (120, 80))
+
+
+# ============================================
+# STREAMING EXPORT TESTS
+# ============================================
+
+class ExportTests(TestCase):
+    """Admin exports stream every matching row as CSV or JSON Lines"""
+
+    def setUp(self):
+        self.staff = User.objects.create_superuser('boss', 'boss@example.com', 'pass12345')
+        when = timezone.make_aware(datetime(2026, 3, 14, 15, 30))
+        for name, status in (('Ana, "the koi"', 'approved'), ('Ben', 'pending')):
+            Appointment.objects.create(
+                client_name=name, email=f'{name[:3].lower()}@example.com', phone='555-0101',
+                tattoo_design='Koi\nsleeve', appointment_date=when, status=status,
+            )
+        self.client.force_login(self.staff)
+
+    def export(self, fmt, query=''):
+        response = self.client.get(reverse('admin:appointments_appointment_export', args=[fmt]) + query)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="appointments_export.{fmt}"')
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response, body = self.export('csv', '?status__exact=approved')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(StringIO(body)))
+        self.assertEqual(rows[0], [header for header, _, _ in exports.EXPORT_COLUMNS])
+        # Quoting survives commas, quotes and newlines; the filter is applied
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(
+            rows[1][:6], ['Ana, "the koi"', 'ana@example.com', '555-0101', 'Koi\nsleeve', '2026-03-14 15:30', 'Approved'],
+        )
+
+    def test_jsonl(self):
+        response, body = self.export('jsonl')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(sorted(record['client_name'] for record in records), ['Ana, "the koi"', 'Ben'])
+        self.assertEqual(records[0]['appointment_date'], '2026-03-14T15:30:00+00:00')
+        self.assertEqual(set(records[0]), {key for _, key, _ in exports.EXPORT_COLUMNS})
+
+    def test_unknown_format_is_404(self):
+        self.assertEqual(
+            self.client.get(reverse('admin:appointments_appointment_export', args=['xml'])).status_code, 404,
+        )
+
+
+# ============================================
+# REQUEST LOGGING
+# ============================================
+
+class RequestLoggingTests(TestCase):
+    def respond(self, status=200, **config):
+        """The request records logged for one request, under REQUEST_LOGGING `config`"""
+        with self.settings(REQUEST_LOGGING={'ENABLED': True, **config}):
+            middleware = RequestLoggingMiddleware(lambda request: HttpResponse('ok', status=status))
+        logger = logging.getLogger(request_logging.REQUEST_LOGGER)
+        with self.assertLogs(logger, 'INFO') as logs:
+            # assertLogs needs at least one record
+            logger.info('marker')
+            middleware(RequestFactory().get('/appointments/?page=2'))
+        return [record.request for record in logs.records if record.getMessage() == 'request']
+
+    def test_off_by_default_and_under_tests(self):
+        self.assertFalse(request_logging.DEFAULTS['ENABLED'])
+        self.assertFalse(request_logging.get_config()['ENABLED'])
+        self.assertIsNone(request_logging._listener)
+
+    def test_logs_one_record_per_request(self):
+        [record] = self.respond(SAMPLE_RATE=1.0)
+        self.assertEqual(record['method'], 'GET')
+        self.assertEqual(record['path'], '/appointments/')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['db_queries'], 0)
+
+    def test_sampling_keeps_slow_requests_and_server_errors(self):
+        self.assertEqual(self.respond(SAMPLE_RATE=0.0), [])
+        self.assertEqual(len(self.respond(SAMPLE_RATE=0.0, SLOW_REQUEST_MS=0)), 1)
+        self.assertEqual([record['status'] for record in self.respond(500, SAMPLE_RATE=0.0)], [500])
+        with patch('appointments.middleware.random.random', return_value=0.2):
+            self.assertEqual(len(self.respond(SAMPLE_RATE=0.25)), 1)
+            self.assertEqual(self.respond(SAMPLE_RATE=0.1), [])
+
+    def test_listener_writes_json_lines_and_stops(self):
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'requests.log'
+        logger = logging.getLogger(request_logging.REQUEST_LOGGER)
+        handlers = list(logger.handlers)
+        with self.settings(REQUEST_LOGGING={'ENABLED': True, 'FILE': str(path)}):
+            request_logging.configure_request_logging()
+            listener = request_logging._listener
+            self.addCleanup(request_logging.stop_request_logging)
+            # Configuring again is a no-op
+            request_logging.configure_request_logging()
+            self.assertIs(request_logging._listener, listener)
+            logger.info('request', extra={'request': {'path': '/appointments/', 'status': 200}})
+            request_logging.stop_request_logging()
+
+        self.assertIsNone(request_logging._listener)
+        self.assertEqual(logger.handlers, handlers)
+        [line] = path.read_text().splitlines()
+        record = json.loads(line)
+        self.assertEqual(record['logger'], request_logging.REQUEST_LOGGER)
+        self.assertEqual((record['message'], record['path'], record['status']), ('request', '/appointments/', 200))
+
+
+# ============================================
+# METRICS
+# ============================================
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        cls.client_user = User.objects.create_user('client', password='pass')
+
+    def setUp(self):
+        metrics.reset()
+        self.url = reverse('appointments:metrics')
+
+    def test_staff_only(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(reverse('appointments:login')))
+        self.client.force_login(self.client_user)
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn('# TYPE tattoo_request_duration_seconds histogram', response.content.decode())
+
+    def test_bearer_token(self):
+        with self.settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get(self.url, headers={'Authorization': 'Bearer s3cret'}).status_code, 200)
+            self.assertEqual(self.client.get(self.url, headers={'Authorization': 'Bearer wrong'}).status_code, 302)
+        # Without a configured token no header gets in
+        with self.settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get(self.url, headers={'Authorization': 'Bearer None'}).status_code, 302)
+
+    def test_shards_are_merged_across_threads(self):
+        labels = (('view', 'merge-test'),)
+
+        def record(duration):
+            metrics.observe('request_duration_seconds', labels, duration)
+            metrics.increment('requests_total', labels + (('status', '2xx'),))
+
+        threads = [threading.Thread(target=record, args=(duration,)) for duration in (0.003, 0.02, 0.3, 20.0)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        record(0.003)
+
+        self.assertEqual(metrics.counter_values('requests_total'), {labels + (('status', '2xx'),): 5})
+        lines = metrics.render_prometheus().splitlines()
+        series = 'tattoo_request_duration_seconds_bucket{view="merge-test"'
+        self.assertIn(f'{series},le="0.005"}} 2', lines)
+        self.assertIn(f'{series},le="0.025"}} 3', lines)
+        self.assertIn(f'{series},le="10.0"}} 4', lines)
+        self.assertIn(f'{series},le="+Inf"}} 5', lines)
+        self.assertIn('tattoo_request_duration_seconds_count{view="merge-test"} 5', lines)
+        self.assertIn('tattoo_requests_total{view="merge-test",status="2xx"} 5', lines)
+
+    def test_finished_threads_are_folded_into_one_total(self):
+        labels = (('view', 'short-lived'),)
+        live = len(metrics._shards)
+        for _ in range(50):
+            thread = threading.Thread(target=metrics.increment, args=('requests_total', labels))
+            thread.start()
+            thread.join()
+        self.assertLessEqual(len(metrics._shards), live + 1)
+        self.assertEqual(metrics.counter_values('requests_total'), {labels: 50})
+        metrics.reset()
+        self.assertEqual(metrics.counter_values('requests_total'), {})
+
+
+# ============================================
+# DATABASE PROFILES
+# ============================================
+
+class DatabaseProfileTests(TestCase):
+    def connect(self, profile):
+        """A connection to a scratch SQLite file opened with `profile`"""
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'profile.sqlite3'
+        conn = ConnectionHandler({'default': sqlite_database(str(path), profile)})['default']
+        conn.alias = 'profiled'
+        self.addCleanup(conn.close)
+        # Registered so transaction.atomic(using='profiled') finds it
+        connections['profiled'] = conn
+        self.addCleanup(connections.__delitem__, 'profiled')
+        return conn, path
+
+    def pragmas(self, conn, *names):
+        with conn.cursor() as cursor:
+            return {name: cursor.execute(f'PRAGMA {name}').fetchone()[0] for name in names}
+
+    def test_production_pragmas_are_applied_on_connect(self):
+        conn, _ = self.connect('production')
+        self.assertEqual(self.pragmas(conn, 'journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'temp_store'), {
+            'journal_mode': 'wal',
+            'synchronous': 1,  # NORMAL
+            'busy_timeout': BUSY_TIMEOUT_MS,
+            'cache_size': -64 * 1024,
+            'temp_store': 2,  # MEMORY
+        })
+        self.assertEqual(conn.settings_dict['CONN_MAX_AGE'], 600)
+
+    def test_production_transactions_take_the_write_lock_up_front(self):
+        conn, path = self.connect('production')
+        other = sqlite3.connect(path, timeout=0)
+        self.addCleanup(other.close)
+        with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+            # BEGIN IMMEDIATE: even a read-only transaction holds the write lock
+            cursor.execute('SELECT 1')
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+                other.execute('BEGIN IMMEDIATE')
+
+    def test_development_keeps_django_defaults(self):
+        conn, _ = self.connect('development')
+        self.assertEqual(
+            self.pragmas(conn, 'journal_mode', 'busy_timeout'), {'journal_mode': 'delete', 'busy_timeout': 5000},
+        )
+        self.assertEqual(conn.settings_dict['CONN_MAX_AGE'], 0)
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ImproperlyConfigured):
+            sqlite_database('db.sqlite3', 'fast')
@@ -1,5 +1,5 @@
 ﻿from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'appointments'
 
@@ -16,12 +16,31 @@ urlpatterns = [
     # Protected appointment URLs (REQUIRE LOGIN)
     path('', views.index, name='index'),  # Dashboard at /appointments/
     path('new/', views.appointment_create, name='create'),
+    path('slots/', views.free_slots, name='slots'),
     path('manage/', views.manage_appointments, name='manage'),
+    path('manage/more/', views.manage_appointments_more, name='manage-more'),
     path('status/<int:pk>/', views.update_appointment_status, name='update-status'),
     path('list-fbv/', views.appointment_list_fbv, name='list-fbv'),
     path('list-cbv/', views.AppointmentListCBV.as_view(), name='list-cbv'),
+    path('search/', views.search_view, name='search'),
+
+    # Staff-only instrumentation
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('reports/', views.reports_view, name='reports'),
+    path('rate-limits/', views.rate_limits_view, name='rate-limits'),
 
     # Edit and Delete URLs
     path('edit/<int:pk>/', views.appointment_edit, name='edit'),
     path('delete/<int:pk>/', views.appointment_delete, name='delete'),
+
+    # JSON API (kiosk and mobile app)
+    path('api/v1/appointments/', api.appointments, name='api-appointments'),
+    path('api/v1/appointments/bulk-status/', api.appointments_bulk_status, name='api-appointments-bulk-status'),
+    path('api/v1/appointments/<int:pk>/', api.appointment_detail, name='api-appointment'),
+    path('api/v1/enquiries/', api.enquiries, name='api-enquiries'),
+    path('api/v1/enquiries/<int:pk>/', api.enquiry_detail, name='api-enquiry'),
+    path('api/v1/styles/', api.catalogue, {'kind': 'styles'}, name='api-styles'),
+    path('api/v1/artists/', api.catalogue, {'kind': 'artists'}, name='api-artists'),
+    path('api/v1/studios/', api.catalogue, {'kind': 'studios'}, name='api-studios'),
+    path('api/v1/reviews/', api.catalogue, {'kind': 'reviews'}, name='api-reviews'),
 ]
\ No newline at end of file
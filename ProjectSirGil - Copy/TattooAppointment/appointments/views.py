@@ -1,14 +1,36 @@
-﻿from django.contrib.auth import login, authenticate, logout
+﻿from datetime import timedelta
+
+from django.contrib.auth import login, authenticate, logout
+from django.conf import settings
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponse
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponse, Http404, JsonResponse
 from django.contrib import messages
+from django.db import transaction
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.views.generic import ListView
 
-from .forms import RegisterForm, LoginForm, EnquiryForm, AppointmentForm, AppointmentStatusForm
+from . import metrics, ratelimit, reports
+from .archive import appointment_history
+from .caching import get_landing_data, landing_version, landing_timeout
+from .conditional import (
+    appointment_list_etag, appointment_list_last_modified, dashboard_etag, landing_etag, visitor_stats,
+)
+from .forms import (
+    RegisterForm, LoginForm, EnquiryForm, AppointmentForm, AppointmentStatusForm, AppointmentFilterForm, FreeSlotsForm,
+)
 from .models import Appointment, TattooStyle, Artist, Studio, Review, Enquiry
+from .pagination import paginate_keyset, InvalidCursor
+from .ratelimit import rate_limit
+from .scheduling import get_schedule
+from .search import search
 
 
 
@@ -16,23 +38,24 @@ from .models import Appointment, TattooStyle, Artist, Studio, Review, Enquiry
 # PUBLIC LANDING PAGE (NO LOGIN REQUIRED)
 # ============================================
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=landing_etag)
 def landing_page(request):
     """Public landing page - Homepage"""
-    styles = TattooStyle.objects.filter(is_active=True)[:4]
-    artists = Artist.objects.filter(is_active=True)[:8]
-    studios = Studio.objects.filter(is_active=True)[:2]
-    reviews = Review.objects.filter(is_approved=True, is_featured=True)[:4]
-    
+    version = landing_version()
+
+    # The catalogue is only loaded if its cached fragment has expired;
+    # navbar, messages and the enquiry form are rendered per request.
     context = {
-        'styles': styles,
-        'artists': artists,
-        'studios': studios,
-        'reviews': reviews,
+        'catalogue': SimpleLazyObject(lambda: get_landing_data(version)),
+        'landing_version': version,
+        'landing_timeout': landing_timeout(),
     }
     return render(request, 'appointments/landing.html', context)
 
 
 @login_required(login_url='appointments:login')
+@rate_limit('enquiry')
 def enquiry_submit(request):
     """Handle tattoo enquiry form submission - LOGIN REQUIRED"""
     if request.method == 'POST':
@@ -51,6 +74,7 @@ def enquiry_submit(request):
 # AUTHENTICATION VIEWS (Login appears first)
 # ============================================
 
+@rate_limit('login')
 def login_view(request):
     """User login view"""
     if request.user.is_authenticated:
@@ -79,6 +103,7 @@ def login_view(request):
     
     return render(request, 'appointments/login.html', {'form': form})
 
+@rate_limit('register')
 def register_view(request):
     """User registration view"""
     if request.user.is_authenticated:
@@ -109,6 +134,8 @@ def logout_view(request):
 # ============================================
 
 @login_required(login_url='appointments:login')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=dashboard_etag)
 def index(request):
     """Tattoo-inspired dashboard after login"""
     base_queryset = Appointment.objects.all() if request.user.is_staff else Appointment.objects.filter(user=request.user)
@@ -117,13 +144,9 @@ def index(request):
     upcoming_appointments = base_queryset.filter(appointment_date__gte=now).order_by('appointment_date')[:5]
     recent_activity = base_queryset.order_by('-created_at')[:4]
 
-    stats = {
-        'total': base_queryset.count(),
-        'pending': base_queryset.filter(status='pending').count(),
-        'approved': base_queryset.filter(status='approved').count(),
-        'rejected': base_queryset.filter(status='rejected').count(),
-        'next_session': upcoming_appointments[0].appointment_date if upcoming_appointments else None,
-    }
+    # Already read for the ETag; the copy keeps the view from mutating it
+    stats = dict(visitor_stats(request))
+    stats['next_session'] = upcoming_appointments[0].appointment_date if upcoming_appointments else None
 
     context = {
         'upcoming_appointments': upcoming_appointments,
@@ -142,16 +165,7 @@ def appointment_create(request):
 
     if request.method == 'POST':
         form = AppointmentForm(request.POST, request.FILES)
-        if form.is_valid():
-            appointment = form.save(commit=False)
-            appointment.user = request.user
-            if timezone.is_naive(appointment.appointment_date):
-                appointment.appointment_date = timezone.make_aware(
-                    appointment.appointment_date,
-                    timezone.get_current_timezone()
-                )
-            appointment.status = 'pending'
-            appointment.save()
+        if form.is_valid() and form.book(user=request.user, status='pending'):
             messages.success(request, 'Appointment submitted! We will review and get back to you.')
             return redirect('appointments:index')
         messages.error(request, 'Please correct the errors below.')
@@ -165,51 +179,172 @@ def appointment_create(request):
     return render(request, 'appointments/create_appointment.html', {'form': form})
 
 
+@login_required(login_url='appointments:login')
+def free_slots(request):
+    """Next free start times of one artist as JSON (for the booking form)"""
+    form = FreeSlotsForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'error': 'Invalid query.', 'errors': form.errors.get_json_data()}, status=400)
+    artist = get_object_or_404(Artist, pk=form.cleaned_data['artist'], is_active=True)
+    start, duration, limit = (form.cleaned_data[name] for name in ('start', 'duration', 'limit'))
+
+    slots = get_schedule(artist.pk).free_slots(start, start + timedelta(days=30), duration, limit=limit)
+    return JsonResponse({
+        'artist': artist.pk,
+        'slots': [
+            {
+                'start': slot_start.isoformat(),
+                'end': slot_end.isoformat(),
+                'value': f'{timezone.localtime(slot_start):%Y-%m-%dT%H:%M}',
+                'label': f'{timezone.localtime(slot_start):%a %d %b, %H:%M}',
+            }
+            for slot_start, slot_end in slots
+        ],
+    })
+
+
 def staff_check(user):
     return user.is_staff
 
 
+MANAGE_PAGE_SIZE = 20
+LIST_PAGE_SIZE = 20
+
+
+def _manage_queue_page(request):
+    """Filter the staff queue and cut one keyset page out of it"""
+    filter_form = AppointmentFilterForm(request.GET or None)
+    queryset = filter_form.filter_queryset(Appointment.objects.select_related('user', 'artist'))
+    try:
+        page = paginate_keyset(queryset, request.GET.get('cursor'), MANAGE_PAGE_SIZE)
+    except InvalidCursor:
+        raise Http404('Invalid page cursor')
+
+    # Carry the active filters over to the "load more" links
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    return filter_form, page, params.urlencode()
+
+
 @user_passes_test(staff_check, login_url='appointments:login')
 def manage_appointments(request):
-    appointments = Appointment.objects.all().order_by('-created_at')
+    filter_form, page, filter_query = _manage_queue_page(request)
     status_form = AppointmentStatusForm()
     return render(
         request,
         'appointments/manage.html',
         {
-            'appointments': appointments,
+            'appointments': page.object_list,
+            'page': page,
+            'filter_form': filter_form,
+            'filter_query': filter_query,
             'status_form': status_form,
         }
     )
 
 
+@user_passes_test(staff_check, login_url='appointments:login')
+def manage_appointments_more(request):
+    """Next page of staff queue cards as an HTML fragment (infinite scroll)"""
+    _, page, _ = _manage_queue_page(request)
+    response = render(
+        request,
+        'appointments/partials/manage_cards.html',
+        {'appointments': page.object_list},
+    )
+    response['X-Next-Cursor'] = page.next_cursor or ''
+    return response
+
+
 @user_passes_test(staff_check, login_url='appointments:login')
 def update_appointment_status(request, pk):
     appointment = get_object_or_404(Appointment, pk=pk)
     if request.method == 'POST':
         form = AppointmentStatusForm(request.POST, instance=appointment)
         if form.is_valid():
-            form.save()
+            # The client's email is queued in the outbox by the same transaction
+            with transaction.atomic():
+                form.save()
             messages.success(request, f"Appointment for {appointment.client_name} marked as {appointment.get_status_display()}.")
         else:
             messages.error(request, 'Invalid status update.')
     return redirect('appointments:manage')
 
 @login_required(login_url='appointments:login')
-def appointment_list_fbv(request):
-    """Function-Based View (FBV) - Protected"""
+def search_view(request):
+    """Ranked full-text search; clients only see their own appointments"""
+    query = request.GET.get('q', '').strip()
     if request.user.is_staff:
-        appointments = Appointment.objects.all()
-        view_type = 'Function-Based View (FBV)'
+        appointments = search(Appointment.objects.select_related('user'), query)
+        enquiries = search(Enquiry.objects.all(), query)
     else:
-        appointments = Appointment.objects.filter(user=request.user)
-        view_type = 'My Appointments (FBV)'
+        appointments = search(Appointment.objects.filter(user=request.user), query)
+        enquiries = []
     context = {
-        'appointments': appointments,
-        'view_type': view_type
+        'query': query,
+        'appointment_hits': appointments,
+        'enquiry_hits': enquiries,
+    }
+    return render(request, 'appointments/search.html', context)
+
+def metrics_view(request):
+    """Prometheus scrape endpoint - staff session or METRICS_TOKEN bearer"""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    auth = request.META.get('HTTP_AUTHORIZATION', '')
+    has_token = bool(token) and constant_time_compare(auth, f'Bearer {token}')
+    if not has_token and not staff_check(request.user):
+        return redirect_to_login(request.get_full_path(), 'appointments:login')
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@user_passes_test(staff_check, login_url='appointments:login')
+@cache_control(private=True, no_cache=True)
+def reports_view(request):
+    """Booking analytics, rebuilt once a day (reports.py)"""
+    report = reports.get_report()
+    context = {
+        'report': report,
+        'histograms': [
+            ('⏳ Lead time (booking to session)', report['lead_time']),
+            ('✅ Approval latency', report['approval_latency']),
+            ('❌ Rejection latency', report['rejection_latency']),
+        ],
+    }
+    return render(request, 'appointments/reports.html', context)
+
+@user_passes_test(staff_check, login_url='appointments:login')
+@cache_control(private=True, no_cache=True)
+def rate_limits_view(request):
+    """Rate-limit and load-shedding counters of the process serving the request"""
+    return render(request, 'appointments/rate_limits.html', ratelimit.rate_limit_stats())
+
+@login_required(login_url='appointments:login')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=appointment_list_etag, last_modified_func=appointment_list_last_modified)
+def appointment_list_fbv(request):
+    """Function-Based View (FBV) - Protected"""
+    page = _history_page(request)
+    context = {
+        'appointments': page,
+        'page': page,
+        'view_type': 'Function-Based View (FBV)' if request.user.is_staff else 'My Appointments (FBV)',
     }
     return render(request, 'appointments/appointment_list.html', context)
 
+
+def _history_page(request):
+    """One page of the visitor's appointments (everyone's for staff), live and archived"""
+    try:
+        return appointment_history(
+            None if request.user.is_staff else request.user, request.GET.get('cursor'), LIST_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        raise Http404('Invalid page cursor')
+
+# On get() rather than dispatch() so the login check runs first
+@method_decorator([
+    cache_control(private=True, no_cache=True),
+    condition(etag_func=appointment_list_etag, last_modified_func=appointment_list_last_modified),
+], name='get')
 class AppointmentListCBV(LoginRequiredMixin, ListView):
     """Class-Based View (CBV) - Protected"""
     login_url = 'appointments:login'
@@ -218,12 +353,12 @@ class AppointmentListCBV(LoginRequiredMixin, ListView):
     context_object_name = 'appointments'
     
     def get_queryset(self):
-        if self.request.user.is_staff:
-            return Appointment.objects.all()
-        return Appointment.objects.filter(user=self.request.user)
+        self.page = _history_page(self.request)
+        return self.page.object_list
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context['page'] = self.page
         context['view_type'] = 'Class-Based View (CBV)' if self.request.user.is_staff else 'My Appointments (CBV)'
         return context
 
@@ -0,0 +1,80 @@
+"""
+Worker pool for the job queue (`manage.py run_workers`).
+
+Each worker thread loops: release expired leases, claim the next due job,
+run it, and sleep POLL_INTERVAL when nothing is due. With --processes
+the pool is that many spawned processes, each running its threads; CPU
+heavy tasks such as image renditions need processes to use more than
+one core.
+
+This module imports nothing from the app at the top level. Spawned
+processes import it to find their entry point before Django is set up,
+and importing models at that point fails.
+"""
+import os
+import socket
+import threading
+import uuid
+
+
+def worker_id():
+    """host:pid:thread plus a random suffix, unique across restarts"""
+    return f'{socket.gethostname()[:30]}:{os.getpid()}:{threading.get_ident() % 10000}:{uuid.uuid4().hex[:6]}'
+
+
+def work(stop, burst=False, poll_interval=None):
+    """One worker loop in the current thread, until `stop` is set (or, with `burst`, nothing is due)"""
+    from django.db import close_old_connections
+
+    from . import jobs
+
+    name = worker_id()
+    poll_interval = jobs.get_setting('POLL_INTERVAL') if poll_interval is None else poll_interval
+    try:
+        while not stop.is_set():
+            jobs.release_expired()
+            job = jobs.claim(name)
+            if job is not None:
+                jobs.run_job(job, name)
+            elif burst:
+                return
+            else:
+                stop.wait(poll_interval)
+            # Long-lived threads must not sit on a connection the database dropped
+            close_old_connections()
+    finally:
+        from django.db import connection
+        connection.close()
+
+
+def run_threads(threads, stop, burst=False, poll_interval=None):
+    """`threads` workers in this process; a single one runs in the calling thread"""
+    if threads == 1:
+        work(stop, burst, poll_interval)
+        return
+    pool = [
+        threading.Thread(target=work, args=(stop, burst, poll_interval), name=f'job-worker-{i}')
+        for i in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    try:
+        for thread in pool:
+            while thread.is_alive():
+                thread.join(timeout=1)
+    finally:
+        stop.set()
+
+
+def process_main(threads, burst, poll_interval):
+    """Entry point of a spawned worker process"""
+    import signal
+
+    import django
+
+    django.setup()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    # Ctrl+C reaches the whole process group; let the parent decide when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_threads(threads, stop, burst, poll_interval)